@@ -1,33 +1,118 @@
 from fastapi import FastAPI
-from .routers import users, chats, messages, migarations, chat_neuro
+from .routers import users, chats, messages, migarations, chat_neuro, stats, bootstrap, metrics, health
+from .responses import FastJSONResponse
+from .middleware import CompressionMiddleware, MetricsMiddleware, RequestMetrics, TracingMiddleware
 
 from database.database import Database
+from database.cache import LRUCache
+from database.write_behind import WriteBehindQueue
+from database.invalidation import InvalidationBus
 from storage.storage import ColdStorage
+from neuro.model_stream import ModelRegistry
+from neuro.backends import BackendPool
+from neuro.warmup import ModelWarmer
+from neuro.turn_stats import TurnStats
+from neuro.response_cache import ResponseCache
+from utils.tracing import Tracer
 from config import Config
 
 root = FastAPI(
     title="GENAI API",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 cfg = Config()
+request_metrics = RequestMetrics()
+tracer = Tracer(**cfg.TRACING)
+root.add_middleware(CompressionMiddleware, **cfg.RESPONSE_COMPRESSION)
+root.add_middleware(MetricsMiddleware, metrics=request_metrics)
+root.add_middleware(TracingMiddleware, tracer=tracer)
 
 db = Database(
     host = cfg.DB_INFO["host"],
     user = cfg.DB_INFO["user"],
     password = cfg.DB_INFO["password"],
-    database = cfg.DB_INFO["database"]
+    database = cfg.DB_INFO["database"],
+    message_cache = LRUCache(**cfg.MESSAGE_CACHE),
+    user_cache = LRUCache(max_size = cfg.USER_CACHE["max_size"]),
+    **cfg.DB_POOL
 )
 cs = ColdStorage(
     host = cfg.COLD_STORAGE["host"],
     user = cfg.COLD_STORAGE["user"],
     password = cfg.COLD_STORAGE["password"],
-    database = cfg.COLD_STORAGE["database"]
+    database = cfg.COLD_STORAGE["database"],
+    db = db,
+    archive_cache = LRUCache(**cfg.ARCHIVE_CACHE),
+    rewarm_after = cfg.ARCHIVE_REWARM_AFTER,
+    **cfg.COLD_STORAGE_POOL
 )
+db.cold_storage = cs
+write_queue = WriteBehindQueue(db, **cfg.WRITE_BEHIND)
+db.write_queue = write_queue
+invalidation = None
+if cfg.CACHE_INVALIDATION["enabled"]:
+    invalidation = InvalidationBus(
+        db,
+        caches = {"messages": db.message_cache, "archive": cs.archive_cache},
+        channel = cfg.CACHE_INVALIDATION["channel"],
+        gap_timeout = cfg.CACHE_INVALIDATION["gap_timeout"]
+    )
+    db.invalidation = invalidation
+
+models = ModelRegistry(
+    pool = BackendPool(**cfg.OLLAMA),
+    response_cache = ResponseCache(**cfg.RESPONSE_CACHE),
+    turn_stats = TurnStats(chars_per_token = cfg.CONTEXT["chars_per_token"]),
+    **cfg.MODELS
+)
+warmer = ModelWarmer(
+    pool = models.pool,
+    keep_alive = cfg.MODELS["keep_alive"],
+    **cfg.WARMUP
+)
+
+root.state.db = db
+root.state.storage = cs
+root.state.write_queue = write_queue
+root.state.invalidation = invalidation
+root.state.models = models
+root.state.warmer = warmer
+root.state.request_metrics = request_metrics
+root.state.tracer = tracer
+root.state.draining = False
+
+def start_draining() -> None:
+    """Report not ready from now on; serve.py calls it as soon as a stop signal arrives."""
+    root.state.draining = True
 
 @root.on_event("startup")
 async def on_startup():
+    await tracer.start()
     await db.init_db()
+    if cfg.USER_CACHE["preload"]:
+        await db.preload_user_cache(cfg.USER_CACHE["preload"])
     await cs.init_tables()
+    if invalidation is not None:
+        await invalidation.start()
+    await write_queue.start()
+    await models.pool.start()
+    await warmer.start()
+
+@root.on_event("shutdown")
+async def on_shutdown():
+    # In-flight requests are already done; wait for generations that outlived them
+    # (shared response-cache generations) so their answers are cached and written
+    start_draining()
+    await models.drain(cfg.SERVER["graceful_timeout"])
+    await warmer.close()
+    await models.pool.close()
+    await write_queue.close()
+    if invalidation is not None:
+        await invalidation.close()
+    await cs.close()
+    await db.close()
+    await tracer.close()
 
 root.include_router(
     users.router
@@ -48,4 +133,20 @@ root.include_router(
 
 root.include_router(
     chat_neuro.router
+)
+
+root.include_router(
+    stats.router
+)
+
+root.include_router(
+    bootstrap.router
+)
+
+root.include_router(
+    metrics.router
+)
+
+root.include_router(
+    health.router
 )
\ No newline at end of file
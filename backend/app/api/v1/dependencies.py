@@ -0,0 +1,45 @@
+from typing import Optional
+
+from fastapi import Request
+
+from database.database import Database
+from database.write_behind import WriteBehindQueue
+from database.invalidation import InvalidationBus
+from storage.storage import ColdStorage
+from neuro.model_stream import ModelRegistry
+from neuro.warmup import ModelWarmer
+from utils.tracing import Tracer
+from .middleware import RequestMetrics
+
+
+def get_db(request: Request) -> Database:
+    """Return the process-wide Database created on application startup."""
+    return request.app.state.db
+
+def get_write_queue(request: Request) -> WriteBehindQueue:
+    """Return the process-wide write-behind queue for chat messages."""
+    return request.app.state.write_queue
+
+def get_invalidation(request: Request) -> Optional[InvalidationBus]:
+    """Return the cache invalidation bus, None when it is disabled."""
+    return request.app.state.invalidation
+
+def get_storage(request: Request) -> ColdStorage:
+    """Return the process-wide ColdStorage created on application startup."""
+    return request.app.state.storage
+
+def get_models(request: Request) -> ModelRegistry:
+    """Return the process-wide ModelRegistry created on application startup."""
+    return request.app.state.models
+
+def get_warmer(request: Request) -> ModelWarmer:
+    """Return the process-wide ModelWarmer created on application startup."""
+    return request.app.state.warmer
+
+def get_request_metrics(request: Request) -> RequestMetrics:
+    """Return the per-route request histograms recorded by MetricsMiddleware."""
+    return request.app.state.request_metrics
+
+def get_tracer(request: Request) -> Tracer:
+    """Return the process-wide request Tracer."""
+    return request.app.state.tracer
@@ -0,0 +1,260 @@
+from typing import Optional
+
+from utils.metrics import Histogram
+from utils.tracing import SamplingProfiler, Tracer, span
+
+import gzip
+import time
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Content types worth compressing; SSE is excluded since every frame must reach the client at once
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/css", "application/javascript")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header by q-value, preferring br on ties.
+
+    Returns:
+        str: Chosen encoding, None to send the body as is
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            weights[name] = quality
+
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_quality = None, 0.0
+    for encoding in supported:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Compress complete responses with brotli or gzip, negotiated per request.
+
+    Only bodies sent in one piece of at least `minimum_size` bytes with a
+    compressible content type are compressed; streaming responses (SSE) and
+    bodies that already carry a Content-Encoding pass through untouched.
+
+    Args:
+        app: ASGI application
+        minimum_size: Smallest body (bytes) worth compressing
+        gzip_level: gzip compression level (1-9)
+        brotli_quality: brotli quality (0-11), used when the brotli package is installed
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            headers = start["headers"] = list(start.get("headers", []))
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._compressible(headers, body):
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            body = self._compress(body, encoding)
+            headers[:] = [(key, value) for key, value in headers if key != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding")
+            ]
+            await send(start)
+            start = None
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, headers: list, body: bytes) -> bool:
+        if len(body) < self.minimum_size:
+            return False
+
+        content_type = b""
+        for key, value in headers:
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+
+class RequestMetrics:
+    """Per-route request duration histograms and the in-flight request gauge.
+
+    Routes are labelled by their path template (`/messages/get_all_messages`,
+    not the concrete URL), so the number of series stays bounded.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.durations = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, str(status))
+        histogram = self.durations.get(key)
+        if histogram is None:
+            histogram = self.durations[key] = Histogram()
+        histogram.observe(seconds)
+
+
+class MetricsMiddleware:
+    """Time every HTTP request until its last body chunk is handed to the server.
+
+    Args:
+        app: ASGI application
+        metrics: Where the durations are recorded
+    """
+
+    def __init__(self, app, metrics: RequestMetrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_timed(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            self.metrics.in_flight -= 1
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started
+            )
+
+
+class TracingMiddleware:
+    """Give every HTTP request a trace and return its ID in the X-Trace-Id header.
+
+    A W3C `traceparent` header continues the caller's trace. Sampled
+    requests record a root span and the spans of Database, ColdStorage,
+    Utils and Model calls made while serving them; `X-Profile: 1` (when
+    profiling is enabled) forces sampling and attaches a CPU profile.
+
+    Args:
+        app: ASGI application
+        tracer: Sampling and export settings
+    """
+
+    def __init__(self, app, tracer: Tracer) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent, profile = None, False
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+            elif key == b"x-profile":
+                profile = self.tracer.profiling and value == b"1"
+
+        trace = self.tracer.start_trace(traceparent, force=profile)
+        trace_header = (b"x-trace-id", trace.trace_id.encode())
+        status = 500
+
+        async def send_traced(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [trace_header]
+            await send(message)
+
+        profiler = SamplingProfiler(self.tracer.profile_interval) if profile else None
+        if profiler is not None:
+            profiler.start()
+
+        tokens = self.tracer.activate(trace)
+        try:
+            with span(f"{scope['method']} {scope['path']}") as root:
+                await self.app(scope, receive, send_traced)
+
+        finally:
+            if trace.sampled:
+                route = getattr(scope.get("route"), "path", None)
+                trace.attributes.update({
+                    "http.method": scope["method"],
+                    "http.target": scope["path"],
+                    "http.route": route,
+                    "http.status_code": status
+                })
+                if root is not None and route is not None:
+                    root.name = f"{scope['method']} {route}"
+            if profiler is not None:
+                trace.profile = profiler.stop()
+            self.tracer.deactivate(tokens)
+            self.tracer.finish(trace)
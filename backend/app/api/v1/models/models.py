@@ -21,9 +21,17 @@ class MessageModelMigration(MessageModel):
     message_id: str
     created_at: int
 
+class ArchiveModel(BaseModel):
+    inactive_days: float = 30
+    batch_size: int = 500
+    max_chats: int | None = None
+
 
 
 class ChatRequest(BaseModel):
     chat_id: str
     messages: list[dict]
-    model: str = 'llama3.1'
\ No newline at end of file
+    model: str = 'llama3.1'
+    stream: bool = False
+    user_id: int | None = None
+    options: dict | None = None
\ No newline at end of file
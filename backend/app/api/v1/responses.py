@@ -0,0 +1,87 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from utils.tracing import current_trace
+
+import asyncpg
+import json
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _default(obj: Any) -> Any:
+    """Convert what the encoders do not handle natively, Records first (the hot case)."""
+    if isinstance(obj, asyncpg.Record):
+        return dict(obj.items())
+    if isinstance(obj, (uuid.UUID, Decimal)):
+        return str(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+ENCODER = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+_msgspec_encoder = msgspec.json.Encoder(enc_hook=_default) if msgspec is not None else None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON with the fastest installed encoder."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    if _msgspec_encoder is not None:
+        return _msgspec_encoder.encode(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson or msgspec when installed, compact stdlib json otherwise.
+
+    The request's trace ID is added to the `meta` of data/meta envelopes.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, dict) and isinstance(content.get("meta"), dict):
+            trace = current_trace()
+            if trace is not None:
+                content["meta"]["trace_id"] = trace.trace_id
+        return dumps(content)
+
+
+def respond(data: Any, meta: dict = None, status_code: int = 200, headers: dict = None) -> FastJSONResponse:
+    """Build the `{"data": ..., "meta": ...}` envelope as a ready response.
+
+    Returning a Response from an endpoint skips FastAPI's jsonable_encoder,
+    which walks and copies every row before serialization; Records, UUIDs
+    and datetimes are converted by the encoder itself instead.
+
+    Args:
+        data: Payload; may hold asyncpg Records, UUIDs and datetimes
+        meta: Pagination cursors and other metadata
+        status_code: HTTP status
+        headers: Extra response headers
+
+    Returns:
+        FastJSONResponse: Serialized response
+    """
+    return FastJSONResponse(
+        content={"data": data, "meta": meta if meta is not None else {}},
+        status_code=status_code,
+        headers=headers
+    )
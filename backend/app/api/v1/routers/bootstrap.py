@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from database.database import Database
+from ..dependencies import get_db
+from ..responses import respond
+from config import Config
+
+
+router = APIRouter(
+    prefix="/bootstrap",
+    tags=["bootstrap"],
+    responses={404: {"description": "Not found"}}
+)
+cfg = Config()
+
+@router.get("")
+async def bootstrap(telegram_id: str = Query(..., description="Telegram ID of the user"),
+                    chat_id: str = Query(None, description="Chat to open instead of the most recent one"),
+                    chats_limit: int = Query(cfg.PAGINATION["default_limit"], ge=1, le=cfg.PAGINATION["max_limit"],
+                                             description="Size of the chats page"),
+                    messages_limit: int = Query(cfg.PAGINATION["default_limit"], ge=1,
+                                                le=cfg.PAGINATION["max_limit"],
+                                                description="Number of newest messages of the active chat"),
+                    db: Database = Depends(get_db)):
+    """Get the user, their newest chats and the tail of the active chat in one request."""
+
+    try:
+        result = await db.bootstrap(
+            telegram_id=telegram_id,
+            chats_limit=chats_limit,
+            messages_limit=messages_limit,
+            chat_id=chat_id
+        )
+        if result:
+            return respond(
+                {"user_id": result["user_id"],
+                "chats": result["chats"],
+                "active_chat_id": result["active_chat_id"],
+                "messages": result["messages"],
+                "status": "found"},
+                meta={
+                    "chats_next_cursor": result["chats_next_cursor"],
+                    "messages_next_cursor": result["messages_next_cursor"]
+                }
+            )
+        else:
+            raise HTTPException(404, detail="User not found")
+
+    except ValueError as e:
+        raise HTTPException(409, detail=str(e))
+
+    except RuntimeError as e:
+        raise HTTPException(500, detail="Internal server error")
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from ..models.models import ChatRequest
-from neuro.model_stream import Model, UnsupportedModelError
-from database.database import Database
+from neuro.model_stream import Model, ModelRegistry, UnsupportedModelError
+from neuro.scheduler import QueueFullError
+from neuro.backends import BackendUnavailableError
+from neuro.warmup import ModelWarmer
+from neuro.context import ContextBuilder
+from database.database import ChatNotFoundError, Database
+from database.write_behind import WriteBehindQueue
+from ..dependencies import get_db, get_models, get_warmer, get_write_queue
+from ..responses import FastJSONResponse
 
 from config import Config
 
+import anyio
+import json
+import math
 import uuid
 
 router = APIRouter(
@@ -14,49 +24,153 @@ router = APIRouter(
 )
 
 cfg = Config()
-db = Database(
-    host=cfg.DB_INFO["host"],
-    user=cfg.DB_INFO["user"],
-    password=cfg.DB_INFO["password"],
-    database=cfg.DB_INFO["database"]
-)
+context_builder = ContextBuilder(**cfg.CONTEXT)
+
+def _sse_event(payload: dict) -> str:
+    """Format a payload as a Server-Sent Events `data:` frame."""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def _stream_answer(writes: WriteBehindQueue, model: Model, chat_id: str, context_messages: list, user_key,
+                         options: dict = None):
+    """Relay model deltas as SSE and persist the assistant message once.
+
+    The message is written after the stream finishes, fails or is cancelled
+    by a client disconnect, so partial answers are kept as well.
+    """
+    message_id = str(uuid.uuid4())
+    parts = []
+
+    try:
+        async for delta in model.stream_answer(messages=context_messages, user_key=user_key, options=options,
+                                               chat_id=chat_id):
+            parts.append(delta)
+            yield _sse_event({"delta": delta})
+
+        yield _sse_event({"done": True, "message_id": message_id})
+
+    except Exception as e:
+        yield _sse_event({"error": str(e)})
+
+    finally:
+        if parts:
+            with anyio.CancelScope(shield=True):
+                await writes.add_message(
+                    message_id=message_id,
+                    chat_id=chat_id,
+                    role="assistant",
+                    content="".join(parts)
+                )
+
+@router.get("/stats")
+async def model_stats(models: ModelRegistry = Depends(get_models)):
+    return {"data": models.stats()}
+
+@router.get("/models")
+async def get_models_list(models: ModelRegistry = Depends(get_models)):
+    """List models discovered on the Ollama backends."""
+    return {"data": sorted(models.pool.models())}
+
+@router.get("/backends")
+async def backend_stats(models: ModelRegistry = Depends(get_models)):
+    """Get health, load and model state of every Ollama backend."""
+    return {"data": models.pool.stats()}
+
+@router.get("/warmup")
+async def warmup_state(warmer: ModelWarmer = Depends(get_warmer)):
+    """Get the load state of the warmed models on every backend."""
+    return {"data": warmer.stats(), "meta": {"warm": warmer.is_warm()}}
+
+@router.get("/prompt_stats")
+async def prompt_stats(
+    chat_id: str = Query(None, description="Return the recorded turns of this chat"),
+    models: ModelRegistry = Depends(get_models)
+):
+    """Get prompt-eval counts and durations: per-model totals or the turns of one chat."""
+    if chat_id is not None:
+        return {"data": models.turn_stats.chat(chat_id)}
+    return {"data": models.turn_stats.stats()}
+
+@router.get("/cache_stats")
+async def cache_stats(models: ModelRegistry = Depends(get_models)):
+    """Get hit, miss and coalescing counters of the model response cache."""
+    return {"data": models.response_cache.stats() if models.response_cache else {}}
 
 @router.post("/chat")
-async def chat_stream(chat_request: ChatRequest):
+async def chat_stream(
+    chat_request: ChatRequest,
+    db: Database = Depends(get_db),
+    writes: WriteBehindQueue = Depends(get_write_queue),
+    models: ModelRegistry = Depends(get_models)
+):
     try:
-        message_id = str(uuid.uuid4())
-        previous_messages = await db.get_all_messages(chat_id=chat_request.chat_id) or []
+        model = models.get(chat_request.model)
+        user_key = chat_request.user_id or chat_request.chat_id
+        model.scheduler.ensure_capacity(user_key)
 
-        context_messages = [
-            {"role": msg["role"], "content": msg["content"]}
+        previous_messages = await db.get_recent_messages(
+            chat_id=chat_request.chat_id,
+            limit=context_builder.max_messages
+        ) or []
+
+        history = [
+            {"message_id": msg["message_id"], "role": msg["role"], "content": msg["content"]}
             for msg in previous_messages
         ]
+        new_messages = [
+            {"role": message["role"], "content": message["context"]}
+            for message in chat_request.messages
+        ]
 
-        for message in chat_request.messages:
-            await db.add_message(
-                message_id=message_id,
-                chat_id=chat_request.chat_id,
-                role=message["role"],
-                content=message["context"]
+        await writes.add_messages(
+            chat_id=chat_request.chat_id,
+            messages=[
+                {"message_id": str(uuid.uuid4()), **message}
+                for message in new_messages
+            ]
+        )
+
+        context_messages = context_builder.build(
+            model_name=chat_request.model,
+            history=history,
+            new_messages=new_messages,
+            chat_id=chat_request.chat_id
+        )
+
+        if chat_request.stream:
+            return StreamingResponse(
+                _stream_answer(writes, model, chat_request.chat_id, context_messages, user_key,
+                               chat_request.options),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
             )
-            context_messages.append({
-                "role": message["role"],
-                "content": message["context"]
-            })
 
-        model = Model(chat_request.model)
-        answer = await model.generate_answer(messages=context_messages)
+        answer = await model.generate_answer(
+            messages=context_messages,
+            user_key=user_key,
+            options=chat_request.options,
+            chat_id=chat_request.chat_id
+        )
         
-        await db.add_message(
+        await writes.add_message(
             message_id=str(uuid.uuid4()),
             chat_id=chat_request.chat_id,
             role="assistant",
             content=answer
         )
 
-        return JSONResponse(content={"data": answer.strip()})
+        return FastJSONResponse(content={"data": answer.strip()})
 
     except UnsupportedModelError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ChatNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    except BackendUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from database.database import Database
+from ..dependencies import get_db
+from ..responses import respond
 from config import Config
 
 from ..models.models import ChatModel
@@ -13,14 +15,7 @@ router = APIRouter(
     tags=["chats"],
     responses={404: {"description": "Not found"}}
 )
-
 cfg = Config()
-db = Database(
-    host=cfg.DB_INFO['host'],
-    user=cfg.DB_INFO['user'],
-    password=cfg.DB_INFO['password'],
-    database=cfg.DB_INFO['database']
-)
 
 @router.get("/")
 async def root_chats():
@@ -28,18 +23,20 @@ async def root_chats():
     return ({"message": "Hello from chats!"})
 
 @router.get("/get_all_chats")
-async def get_chats(user_id: int = Query(..., description="User ID of the user")):
-    """Get all chats from the database."""
+async def get_chats(user_id: int = Query(..., description="User ID of the user"),
+                    limit: int = Query(cfg.PAGINATION["default_limit"], ge=1, le=cfg.PAGINATION["max_limit"],
+                                       description="Page size"),
+                    cursor: str = Query(None, description="next_cursor of the previous page"),
+                    db: Database = Depends(get_db)):
+    """Get a page of the user's chats, newest first."""
     
     try:
-        chats = await db.get_all_chats(user_id=user_id)
+        chats, next_cursor = await db.get_chats_page(user_id=user_id, limit=limit, cursor=cursor)
         if chats:
-            return (
-                {"data": {
-                    "chats": chats,
-                    "status": "found"
-                },
-                "meta": {}}
+            return respond(
+                {"chats": chats,
+                "status": "found"},
+                meta={"next_cursor": next_cursor}
             )
         else:
             raise HTTPException(404, detail="No chats found")
@@ -51,7 +48,7 @@ async def get_chats(user_id: int = Query(..., description="User ID of the user")
         raise HTTPException(500, detail="Internal server error")
     
 @router.post("/create")
-async def create_chat(chat: ChatModel):
+async def create_chat(chat: ChatModel, db: Database = Depends(get_db)):
     """Create a new chat in the database."""
     
     try:
@@ -79,7 +76,8 @@ async def create_chat(chat: ChatModel):
         raise HTTPException(500, detail="Internal server error")
     
 @router.delete("/delete")
-async def delete_chat(chat_id: str = Query(..., description="Chat ID of the chat")):
+async def delete_chat(chat_id: str = Query(..., description="Chat ID of the chat"),
+                      db: Database = Depends(get_db)):
     """Delete a chat from the database."""
     
     try:
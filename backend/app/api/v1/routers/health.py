@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, Request
+
+from typing import Optional
+
+from database.database import Database
+from database.invalidation import InvalidationBus
+from storage.storage import ColdStorage
+from neuro.model_stream import ModelRegistry
+from neuro.warmup import ModelWarmer
+from ..dependencies import get_db, get_storage, get_models, get_warmer, get_invalidation
+from ..responses import respond
+
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"]
+)
+
+@router.get("/live")
+async def live():
+    """Liveness: the worker's event loop answers."""
+    return respond({"status": "ok"})
+
+@router.get("/ready")
+async def ready(request: Request,
+                db: Database = Depends(get_db),
+                storage: ColdStorage = Depends(get_storage),
+                models: ModelRegistry = Depends(get_models),
+                warmer: ModelWarmer = Depends(get_warmer),
+                invalidation: Optional[InvalidationBus] = Depends(get_invalidation)):
+    """Readiness: 200 once both pools are open, cache invalidation listens and every warm-up model
+    has been loaded on some backend; 503 otherwise and while draining."""
+    checks = {
+        "db_pool": db.pool is not None,
+        "cold_storage_pool": storage.pool is not None,
+        "cache_invalidation": invalidation is None or invalidation.listening.is_set(),
+        "models_warm": warmer.warmed.is_set(),
+        "accepting": not request.app.state.draining
+    }
+    is_ready = all(checks.values())
+    return respond(
+        {"ready": is_ready, "checks": checks},
+        meta={"in_flight_generations": models.in_flight(), "cold_models": warmer.cold_models()},
+        status_code=200 if is_ready else 503
+    )
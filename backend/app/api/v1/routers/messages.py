@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from ..models.models import MessageModel
 from database.database import Database
+from database.write_behind import WriteBehindQueue
+from ..dependencies import get_db, get_write_queue
+from ..responses import respond
 from config import Config
 
 import uuid
@@ -13,31 +16,43 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 cfg = Config()
-db = Database(
-    host=cfg.DB_INFO['host'],
-    user=cfg.DB_INFO['user'],
-    password=cfg.DB_INFO['password'],
-    database=cfg.DB_INFO['database']
-)
 
 @router.get("/")
 async def root_messages():
     """Get all messages from the database."""
     return ({"message": "Hello from messages!"})
 
+@router.get("/cache_stats")
+async def cache_stats(db: Database = Depends(get_db)):
+    """Get hit, miss and eviction counters of the message history cache."""
+    return (
+        {"data": db.message_cache.stats(),
+        "meta": {}}
+    )
+
+@router.get("/write_stats")
+async def write_stats(writes: WriteBehindQueue = Depends(get_write_queue)):
+    """Get depth, batch and failure counters of the write-behind message queue."""
+    return (
+        {"data": writes.stats(),
+        "meta": {}}
+    )
+
 @router.get("/get_all_messages")
-async def get_all_messages(chat_id: str = Query(..., title="Chat ID", description="ID of the chat to get messages from")):
-    """Get all messages from a chat."""
+async def get_all_messages(chat_id: str = Query(..., title="Chat ID", description="ID of the chat to get messages from"),
+                           limit: int = Query(cfg.PAGINATION["default_limit"], ge=1, le=cfg.PAGINATION["max_limit"],
+                                              description="Page size"),
+                           cursor: str = Query(None, description="next_cursor of the previous (newer) page"),
+                           db: Database = Depends(get_db)):
+    """Get a page of messages from a chat, walking back from the newest."""
 
     try:
-        messages = await db.get_all_messages(chat_id=chat_id)
+        messages, next_cursor = await db.get_messages_page(chat_id=chat_id, limit=limit, cursor=cursor)
         if messages:
-            return (
-                {"data": {
-                    "messages": messages,
-                    "status": "found"
-                },
-                "meta": {}}
+            return respond(
+                {"messages": messages,
+                "status": "found"},
+                meta={"next_cursor": next_cursor}
             )
         else:
             raise HTTPException(404, detail="No messages found")
@@ -49,7 +64,7 @@ async def get_all_messages(chat_id: str = Query(..., title="Chat ID", descriptio
         raise HTTPException(500, detail="Internal server error")
     
 @router.post("/add")
-async def message_add(message: MessageModel):
+async def message_add(message: MessageModel, db: Database = Depends(get_db)):
     """Add a new message to a chat."""
 
     chat_id=str(message.chat_id)
@@ -85,7 +100,8 @@ async def message_add(message: MessageModel):
     
 @router.put("/edit")
 async def message_edit(message: MessageModel, 
-                       message_id: uuid.UUID = Query(..., title="Message ID", description="ID of the message to edit")):
+                       message_id: uuid.UUID = Query(..., title="Message ID", description="ID of the message to edit"),
+                       db: Database = Depends(get_db)):
     """Edit a message in a chat."""
     chat_id=str(message.chat_id)
     content=message.content
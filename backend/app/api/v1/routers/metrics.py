@@ -0,0 +1,144 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from database.database import Database
+from database.statements import LATENCY_BUCKETS
+from database.write_behind import WriteBehindQueue
+from database.invalidation import InvalidationBus
+from storage.storage import ColdStorage
+from neuro.model_stream import ModelRegistry
+from utils.metrics import CONTENT_TYPE, Exposition
+from ..middleware import RequestMetrics
+from ..dependencies import get_db, get_storage, get_models, get_write_queue, get_request_metrics, get_invalidation
+
+
+router = APIRouter(
+    tags=["metrics"]
+)
+
+def _http(out: Exposition, requests: RequestMetrics) -> None:
+    out.metric("http_requests_in_flight", "gauge", "HTTP requests being served", [({}, requests.in_flight)])
+    out.histograms("http_request_duration_seconds", "HTTP request duration by route template", (
+        ({"method": method, "route": route, "status": status}, histogram)
+        for (method, route, status), histogram in sorted(requests.durations.items())
+    ))
+
+def _databases(out: Exposition, databases: dict) -> None:
+    out.histogram("db_query_duration_seconds", "Duration of the named queries of queries.py", (
+        ({"db": db_name, "query": name}, LATENCY_BUCKETS, stats.buckets, stats.total, stats.calls)
+        for db_name, db in databases.items()
+        for name, stats in sorted(db.statements.stats.items())
+        if stats.calls
+    ))
+    out.metric("db_query_errors_total", "counter", "Failed executions of the named queries", (
+        ({"db": db_name, "query": name}, stats.errors)
+        for db_name, db in databases.items()
+        for name, stats in sorted(db.statements.stats.items())
+        if stats.errors
+    ))
+    out.histograms("db_pool_wait_seconds", "Time spent waiting for a pooled connection", (
+        ({"db": db_name}, db.pool_wait) for db_name, db in databases.items()
+    ))
+    out.metric("db_pool_connections", "gauge", "Open pool connections by state", (
+        sample
+        for db_name, db in databases.items() if db.pool is not None
+        for sample in (
+            ({"db": db_name, "state": "idle"}, db.pool.get_idle_size()),
+            ({"db": db_name, "state": "busy"}, db.pool.get_size() - db.pool.get_idle_size())
+        )
+    ))
+
+def _caches(out: Exposition, caches: dict) -> None:
+    stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    out.metric("cache_lookups_total", "counter", "Cache lookups by result", (
+        sample
+        for name, cache in stats.items()
+        for sample in (({"cache": name, "result": "hit"}, cache["hits"]),
+                       ({"cache": name, "result": "miss"}, cache["misses"]))
+    ))
+    out.metric("cache_entries", "gauge", "Entries held by the cache", (
+        ({"cache": name}, cache["size"]) for name, cache in stats.items()
+    ))
+
+def _write_queue(out: Exposition, writes: WriteBehindQueue) -> None:
+    stats = writes.stats()
+    out.metric("write_queue_depth", "gauge", "Writes queued in the write-behind queue", [({}, stats["depth"])])
+    out.metric("write_queue_rows_total", "counter", "Rows flushed by the write-behind queue", [
+        ({"result": "flushed"}, stats["flushed_rows"]),
+        ({"result": "failed"}, stats["failed_rows"])
+    ])
+    out.metric("write_queue_batches_total", "counter", "Batches flushed by the write-behind queue",
+               [({}, stats["batches"])])
+
+def _invalidation(out: Exposition, bus: InvalidationBus) -> None:
+    stats = bus.stats()
+    out.metric("cache_invalidation_listening", "gauge", "Whether the LISTEN connection is open",
+               [({}, int(stats["listening"]))])
+    out.metric("cache_invalidation_events_total", "counter", "Cache invalidation events by outcome", [
+        ({"event": name}, stats[name])
+        for name in ("published", "publish_failed", "received", "evicted", "reordered")
+    ])
+    out.metric("cache_invalidation_resyncs_total", "counter", "Cache clears after lost invalidation events",
+               [({}, stats["resyncs"])])
+
+def _models(out: Exposition, models: ModelRegistry) -> None:
+    schedulers = sorted(models.schedulers().items())
+    out.metric("llm_generations_in_flight", "gauge", "Generations running per model", (
+        ({"model": name}, scheduler.active) for name, scheduler in schedulers
+    ))
+    out.metric("llm_generations_queued", "gauge", "Generations waiting for a slot per model", (
+        ({"model": name}, scheduler.queued) for name, scheduler in schedulers
+    ))
+    out.metric("llm_generations_total", "counter", "Finished generations per model", (
+        ({"model": name}, scheduler.completed) for name, scheduler in schedulers
+    ))
+    out.metric("llm_rejected_total", "counter", "Requests rejected with 429 per model", (
+        ({"model": name}, scheduler.rejected) for name, scheduler in schedulers
+    ))
+    out.histograms("llm_queue_wait_seconds", "Time waiting for a generation slot", (
+        ({"model": name}, scheduler.queue_wait) for name, scheduler in schedulers
+    ))
+
+    if models.turn_stats is None:
+        return
+
+    histograms = sorted(models.turn_stats.histograms.items())
+    for key, name, help_text in (
+        ("time_to_first_token", "llm_time_to_first_token_seconds", "Time from the request to the first token"),
+        ("load_duration", "llm_load_duration_seconds", "Ollama load_duration"),
+        ("prompt_eval_duration", "llm_prompt_eval_duration_seconds", "Ollama prompt_eval_duration"),
+        ("eval_duration", "llm_eval_duration_seconds", "Ollama eval_duration"),
+        ("tokens_per_second", "llm_tokens_per_second", "Generated tokens per second of eval_duration")
+    ):
+        out.histograms(name, help_text, (({"model": model_name}, model[key]) for model_name, model in histograms))
+
+    totals = sorted(models.turn_stats.totals.items())
+    out.metric("llm_prompt_tokens_total", "counter", "Prompt tokens evaluated (KV cache hits excluded)", (
+        ({"model": model_name}, model["prompt_eval_count"]) for model_name, model in totals
+    ))
+    out.metric("llm_generated_tokens_total", "counter", "Generated tokens", (
+        ({"model": model_name}, model["eval_count"]) for model_name, model in totals
+    ))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(db: Database = Depends(get_db),
+                  storage: ColdStorage = Depends(get_storage),
+                  writes: WriteBehindQueue = Depends(get_write_queue),
+                  models: ModelRegistry = Depends(get_models),
+                  requests: RequestMetrics = Depends(get_request_metrics),
+                  invalidation: InvalidationBus = Depends(get_invalidation)):
+    """Prometheus scrape of request, database, cache, queue and model metrics."""
+    out = Exposition()
+    _http(out, requests)
+    _databases(out, {"hot": db, "cold": storage})
+    _caches(out, {
+        "messages": db.message_cache,
+        "users": db.user_cache,
+        "archive": storage.archive_cache,
+        "responses": models.response_cache.cache if models.response_cache else None
+    })
+    _write_queue(out, writes)
+    if invalidation is not None:
+        _invalidation(out, invalidation)
+    _models(out, models)
+    return PlainTextResponse(out.render(), media_type=CONTENT_TYPE)
@@ -1,8 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from storage.storage import ColdStorage
-from config import Config
+from ..dependencies import get_storage
 
-from ..models.models import ChatModelMigration, MessageModelMigration
+from ..models.models import ChatModelMigration, MessageModelMigration, ArchiveModel
 
 router = APIRouter(
     prefix="/migrate",
@@ -10,14 +10,6 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-cfg = Config()
-storage = ColdStorage(
-    host = cfg.COLD_STORAGE["host"],
-    user = cfg.COLD_STORAGE["user"],
-    password = cfg.COLD_STORAGE["password"],
-    database = cfg.COLD_STORAGE["database"]
-)
-
 @router.get("/")
 async def root_migrations():
     """Check connection to migrations"""
@@ -25,7 +17,8 @@ async def root_migrations():
 
 
 @router.post("/migrate_chats")
-async def migrate_chats(chat_model: ChatModelMigration):
+async def migrate_chats(chat_model: ChatModelMigration,
+                        storage: ColdStorage = Depends(get_storage)):
     result = await storage.migrate_chats(
         chat_id = chat_model.chat_id
     )
@@ -46,7 +39,8 @@ async def migrate_chats(chat_model: ChatModelMigration):
         )
     
 @router.post("/migrate_messages")
-async def migrate_messages(message_model: MessageModelMigration):
+async def migrate_messages(message_model: MessageModelMigration,
+                           storage: ColdStorage = Depends(get_storage)):
     messages_data = {
         "message_id": message_model.message_id,
         "chat_id": message_model.chat_id,
@@ -72,4 +66,37 @@ async def migrate_messages(message_model: MessageModelMigration):
                 "status": "no-no-no"
             },
             "meta": {}}
-        )
\ No newline at end of file
+        )
+
+@router.post("/archive")
+async def archive_inactive_chats(archive_model: ArchiveModel,
+                                 storage: ColdStorage = Depends(get_storage)):
+    """Move chats inactive for longer than `inactive_days` to cold storage in bulk."""
+    report = await storage.archive_inactive_chats(
+        inactive_days = archive_model.inactive_days,
+        batch_size = archive_model.batch_size,
+        max_chats = archive_model.max_chats
+    )
+
+    return (
+        {"data": {
+            "report": report,
+            "status": "completed" if report["finished"] else "paused"
+        },
+        "meta": {}}
+    )
+
+@router.post("/rewarm")
+async def rewarm_chat(chat_model: ChatModelMigration,
+                      storage: ColdStorage = Depends(get_storage)):
+    """Move an archived chat back to hot storage."""
+    result = await storage.rewarm_chat(
+        chat_id = chat_model.chat_id
+    )
+
+    return (
+        {"data": {
+            "status": "completed" if result else "not-archived"
+        },
+        "meta": {}}
+    )
\ No newline at end of file
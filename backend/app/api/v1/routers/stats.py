@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+
+from database.database import Database
+from storage.storage import ColdStorage
+from utils.tracing import Tracer
+from ..dependencies import get_db, get_storage, get_tracer
+
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+    responses={404: {"description": "Not found"}}
+)
+
+@router.get("/statements")
+async def statement_stats(db: Database = Depends(get_db), storage: ColdStorage = Depends(get_storage)):
+    """Get call counts and latency histograms of the prepared statements, most expensive first."""
+    return (
+        {"data": {
+            "hot": db.statements.snapshot(),
+            "cold": storage.statements.snapshot()
+        },
+        "meta": {
+            "statement_cache_size": {
+                "hot": db.statements.cache_size(db.statement_cache_size),
+                "cold": storage.statements.cache_size(storage.statement_cache_size)
+            }
+        }}
+    )
+
+@router.get("/tracing")
+async def tracing_stats(tracer: Tracer = Depends(get_tracer)):
+    """Get the sampling rate and export counters of request tracing."""
+    return {"data": tracer.stats(), "meta": {}}
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from database.database import Database
-from config import Config
+from ..dependencies import get_db
 
 from ..models.models import UserModel
 
@@ -11,13 +11,6 @@ router = APIRouter(
     tags=["users"],
     responses={404: {"description": "Not found"}}
 )
-cfg = Config()
-db = Database(
-    host=cfg.DB_INFO['host'],
-    user=cfg.DB_INFO['user'],
-    password=cfg.DB_INFO['password'],
-    database=cfg.DB_INFO['database']
-)
 
 @router.get("/")
 async def root_users():
@@ -25,31 +18,35 @@ async def root_users():
     return ({"message": "Hello from users!"})
 
 
+@router.get("/cache_stats")
+async def cache_stats(db: Database = Depends(get_db)):
+    """Get hit, miss and eviction counters of the telegram_id -> user_id cache."""
+    return (
+        {"data": db.user_cache.stats(),
+        "meta": {}}
+    )
+
 @router.post("/add")
-async def create_user(user: UserModel):
-    """Create a new user in the database using a Telegram ID as a query parameter."""
+async def create_user(user: UserModel, db: Database = Depends(get_db)):
+    """Create a user from a Telegram ID; registering an existing user returns it unchanged."""
 
     try:
-        result = await db.register_user(telegram_id=user.telegram_id)
-        if result:
-            return (
-                {"data": {
-                    "telegram_id": user.telegram_id,
-                    "status": "created"
-                },
-                "meta": {}}
-            )
-        else:
-            raise HTTPException(409, detail="User already exists")
-        
-    except ValueError as e:
-        raise HTTPException(409, detail=str(e))
+        user_id, created = await db.register_user(telegram_id=user.telegram_id)
+        return (
+            {"data": {
+                "telegram_id": user.telegram_id,
+                "user_id": user_id,
+                "status": "created" if created else "exists"
+            },
+            "meta": {}}
+        )
     
     except RuntimeError as e:
         raise HTTPException(500, detail="Internal server error")
     
 @router.get("/get")
-async def get(telegram_id: str = Query(..., description="Telegram ID of the user")):
+async def get(telegram_id: str = Query(..., description="Telegram ID of the user"),
+              db: Database = Depends(get_db)):
     """Get a user from the database using a Telegram ID as a query parameter."""
 
     try:
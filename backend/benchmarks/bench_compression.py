@@ -0,0 +1,115 @@
+"""Compression ratio and throughput of the cold-storage codecs on chat-like content.
+
+Generates a synthetic corpus of user/assistant messages (Russian and English
+prose, markdown lists, code blocks), then measures every codec/level in
+Utils: ratio, single-thread MB/s for compress and decompress, and batch
+throughput through the process pool.
+
+Usage (from backend/):
+    python -m benchmarks.bench_compression --messages 20000
+"""
+from utils.utils import Utils, zstandard
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+SENTENCES = [
+    "Привет! Чем я могу помочь сегодня?",
+    "Расскажи, как работает асинхронность в Python.",
+    "Конечно, вот краткое объяснение с примером кода.",
+    "Event loop выполняет корутины по очереди, переключаясь на await.",
+    "Can you explain the difference between a process and a thread?",
+    "Sure! A process has its own memory space, while threads share memory.",
+    "Here is a step-by-step plan for your project:",
+    "Не забудьте добавить обработку ошибок и логирование.",
+    "The GIL prevents two threads from executing Python bytecode at once.",
+    "Спасибо, это очень помогло!",
+]
+CODE = '''```python
+async def fetch_all(urls):
+    async with httpx.AsyncClient() as client:
+        return await asyncio.gather(*(client.get(url) for url in urls))
+```'''
+
+
+def make_message(rng: random.Random) -> str:
+    parts = rng.choices(SENTENCES, k=rng.randint(1, 12))
+    if rng.random() < 0.3:
+        parts.append("\n".join(f"{index}. {rng.choice(SENTENCES)}" for index in range(1, rng.randint(2, 6))))
+    if rng.random() < 0.2:
+        parts.append(CODE)
+    return " ".join(parts) + f" ({rng.randint(0, 10 ** 6)})"
+
+
+def measure(utils: Utils, corpus: list) -> dict:
+    raw_size = sum(len(json.dumps(message).encode()) for message in corpus)
+
+    started = time.perf_counter()
+    blobs = [utils._compress_data(message) for message in corpus]
+    compress_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for blob in blobs:
+        utils._decompress_data(blob)
+    decompress_time = time.perf_counter() - started
+
+    compressed_size = sum(len(blob) for blob in blobs)
+    return {
+        "ratio": raw_size / compressed_size,
+        "compress_mb_s": raw_size / compress_time / 1e6,
+        "decompress_mb_s": raw_size / decompress_time / 1e6
+    }
+
+
+async def measure_batch(utils: Utils, corpus: list) -> float:
+    raw_size = sum(len(json.dumps(message).encode()) for message in corpus)
+    await utils.async_compress_batch(corpus[:utils.min_parallel_batch])
+
+    started = time.perf_counter()
+    await utils.async_compress_batch(corpus)
+    return raw_size / (time.perf_counter() - started) / 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_message(rng) for _ in range(args.messages)]
+    training = [make_message(rng) for _ in range(5_000)]
+
+    configs = [("lzma", 9), ("lzma", 6), ("lzma", 1), ("zlib", 9), ("zlib", 6), ("zlib", 1)]
+    if zstandard is not None:
+        configs += [("zstd", 19), ("zstd", 3), ("zstd", 1)]
+
+    results = {}
+    for codec, level in configs:
+        utils = Utils(codec=codec, level=level)
+        results[f"{codec}-{level}"] = measure(utils, corpus)
+
+        try:
+            results[f"{codec}-{level}"]["batch_compress_mb_s"] = await measure_batch(utils, corpus)
+        finally:
+            utils.shutdown()
+
+    if zstandard is not None:
+        dictionary = Utils(codec="zstd").train_zstd_dictionary(training)
+        for level in (19, 3):
+            utils = Utils(codec="zstd", level=level, zstd_dict=dictionary)
+            results[f"zstd-dict-{level}"] = measure(utils, corpus)
+
+            try:
+                results[f"zstd-dict-{level}"]["batch_compress_mb_s"] = await measure_batch(utils, corpus)
+            finally:
+                utils.shutdown()
+
+    print(json.dumps({"messages": args.messages, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
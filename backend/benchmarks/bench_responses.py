@@ -0,0 +1,145 @@
+"""Response time of a 5,000-message chat page: FastAPI's default path vs respond().
+
+Builds the rows the messages endpoint gets from asyncpg (real Records when
+the asyncpg build exposes a constructor, dicts otherwise) and measures:
+
+* serialization alone: jsonable_encoder + JSONResponse vs respond()
+  (orjson/msgspec when installed, compact json otherwise);
+* end to end through the ASGI stack (httpx ASGITransport) for an endpoint
+  returning the envelope dict and one returning respond(), each without
+  and with CompressionMiddleware (gzip, and brotli when installed).
+
+Usage (from backend/):
+    python -m benchmarks.bench_responses --messages 5000 --repeat 50
+"""
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.v1.middleware import CompressionMiddleware, brotli
+from app.api.v1.responses import ENCODER, respond
+from benchmarks.bench_compression import make_message
+
+import argparse
+import asyncio
+import httpx
+import json
+import random
+import statistics
+import time
+import uuid
+
+try:
+    from asyncpg.protocol.protocol import _create_record
+except ImportError:
+    _create_record = None
+
+COLUMNS = {"message_id": 0, "role": 1, "content": 2, "created_at": 3}
+
+
+def make_rows(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for index in range(count):
+        values = (
+            uuid.UUID(int=rng.getrandbits(128), version=4),
+            "user" if index % 2 == 0 else "assistant",
+            make_message(rng),
+            started + timedelta(seconds=index * 7, microseconds=rng.randint(0, 999_999))
+        )
+        rows.append(_create_record(COLUMNS, values) if _create_record else dict(zip(COLUMNS, values)))
+    return rows
+
+
+def timed(function, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return {"median_ms": statistics.median(samples) * 1e3, "min_ms": min(samples) * 1e3}
+
+
+def build_app(rows: list, compress: bool) -> FastAPI:
+    app = FastAPI()
+    if compress:
+        app.add_middleware(CompressionMiddleware)
+
+    @app.get("/default")
+    async def default():
+        return {"data": {"messages": rows, "status": "found"}, "meta": {"next_cursor": None}}
+
+    @app.get("/fast")
+    async def fast():
+        return respond({"messages": rows, "status": "found"}, meta={"next_cursor": None})
+
+    return app
+
+
+async def measure_http(app: FastAPI, path: str, accept_encoding: str, repeat: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Accept-Encoding": accept_encoding}
+        response = await client.get(path, headers=headers)
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            samples.append(time.perf_counter() - started)
+
+    return {
+        "median_ms": statistics.median(samples) * 1e3,
+        "p95_ms": sorted(samples)[int(len(samples) * 0.95) - 1] * 1e3,
+        "wire_bytes": int(response.headers.get("content-length", len(response.content))),
+        "content_encoding": response.headers.get("content-encoding", "identity")
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_rows(args.messages, args.seed)
+    envelope = {"data": {"messages": rows, "status": "found"}, "meta": {"next_cursor": None}}
+
+    before = JSONResponse(jsonable_encoder(envelope)).body
+    after = respond({"messages": rows, "status": "found"}, meta={"next_cursor": None}).body
+    assert json.loads(before) == json.loads(after), "respond() output differs from the default path"
+
+    results = {
+        "serialize": {
+            "jsonable_encoder+JSONResponse": timed(lambda: JSONResponse(jsonable_encoder(envelope)), args.repeat),
+            f"respond ({ENCODER})": timed(
+                lambda: respond({"messages": rows, "status": "found"}, meta={"next_cursor": None}), args.repeat
+            ),
+            "body_bytes": {"before": len(before), "after": len(after)}
+        },
+        "http": {}
+    }
+
+    encodings = [("identity", "identity"), ("gzip", "gzip")]
+    if brotli is not None:
+        encodings.append(("br", "br, gzip"))
+
+    plain, compressed = build_app(rows, compress=False), build_app(rows, compress=True)
+    for path in ("/default", "/fast"):
+        results["http"][path] = {"identity": await measure_http(plain, path, "identity", args.repeat)}
+        for name, accept_encoding in encodings[1:]:
+            results["http"][path][name] = await measure_http(compressed, path, accept_encoding, args.repeat)
+
+    print(json.dumps({
+        "messages": args.messages,
+        "records": "asyncpg.Record" if _create_record else "dict",
+        "encoder": ENCODER,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
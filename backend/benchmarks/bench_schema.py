@@ -0,0 +1,150 @@
+"""Query plans and latencies of the hot-path queries before/after SCHEMA_MIGRATIONS.
+
+Seeds a throw-away schema (default `bench_schema`) in the configured database
+with synthetic users, chats and messages, then runs EXPLAIN ANALYZE and timed
+executions of the chat/message queries without and with the migration indexes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_schema --messages 10000000
+"""
+from queries import CREATE_TABLES, SCHEMA_MIGRATIONS, QUERY_GET_ALL_MESSAGES, QUERY_GET_RECENT_MESSAGES, \
+    QUERY_GET_ALL_CHATS, QUERY_DELETE_CHAT
+from database.database import apply_migration_steps
+from config import Config
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import time
+
+import asyncpg
+
+SEED_USERS = """
+    INSERT INTO users (telegram_id_hash)
+    SELECT md5('user' || g) FROM generate_series(1, $1) AS g
+"""
+SEED_CHATS = """
+    INSERT INTO chats (chat_id, user_id, title, model, created_at)
+    SELECT md5('chat' || g)::uuid, (g % $1) + 1, 'chat ' || g, 'llama3.2',
+           NOW() - make_interval(secs => g)
+    FROM generate_series(1, $2) AS g
+"""
+SEED_MESSAGES = """
+    INSERT INTO messages (message_id, chat_id, role, content, created_at)
+    SELECT md5('message' || g)::uuid, md5('chat' || ((g % $1) + 1))::uuid,
+           CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END,
+           repeat('lorem ipsum dolor sit amet ', 4),
+           NOW() - make_interval(secs => g / 1000.0)
+    FROM generate_series($2, $3) AS g
+"""
+
+
+async def seed(connection: asyncpg.Connection, users: int, chats: int, messages: int, batch: int) -> None:
+    await connection.execute(CREATE_TABLES)
+    await connection.execute(SEED_USERS, users)
+    await connection.execute(SEED_CHATS, users, chats)
+
+    for start in range(1, messages + 1, batch):
+        await connection.execute(SEED_MESSAGES, chats, start, min(start + batch - 1, messages))
+        print(f"seeded {min(start + batch - 1, messages)}/{messages} messages", flush=True)
+
+    await connection.execute("ANALYZE")
+
+
+async def measure(connection: asyncpg.Connection, query: str, args: tuple, runs: int) -> dict:
+    """Get the plan of a query and its latency percentiles over several runs."""
+    is_write = query.lstrip().upper().startswith(("DELETE", "WITH"))
+
+    transaction = connection.transaction()
+    await transaction.start()
+    try:
+        plan = await connection.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {query}", *args)
+    finally:
+        await transaction.rollback()
+
+    timings = []
+    for _ in range(runs):
+        transaction = connection.transaction()
+        await transaction.start()
+        started = time.perf_counter()
+        try:
+            if is_write:
+                await connection.execute(query, *args)
+            else:
+                await connection.fetch(query, *args)
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            await transaction.rollback()
+
+    timings.sort()
+    return {
+        "plan": [row[0] for row in plan],
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[math.ceil(len(timings) * 0.95) - 1],
+        "max_ms": timings[-1]
+    }
+
+
+async def run_queries(connection: asyncpg.Connection, runs: int) -> dict:
+    chat_id, user_id = await connection.fetchrow("SELECT chat_id, user_id FROM chats ORDER BY random() LIMIT 1")
+    queries = {
+        "QUERY_GET_ALL_MESSAGES": (QUERY_GET_ALL_MESSAGES, (chat_id,)),
+        "QUERY_GET_RECENT_MESSAGES": (QUERY_GET_RECENT_MESSAGES, (chat_id, 50)),
+        "QUERY_GET_ALL_CHATS": (QUERY_GET_ALL_CHATS, (user_id,)),
+        "QUERY_DELETE_CHAT": (QUERY_DELETE_CHAT, (chat_id,)),
+    }
+
+    return {
+        name: await measure(connection, query, args, runs)
+        for name, (query, args) in queries.items()
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default="bench_schema")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--chats", type=int, default=1_000_000)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark schema afterwards")
+    args = parser.parse_args()
+
+    db_info = Config.DB_INFO
+    connection = await asyncpg.connect(
+        dsn=f"postgresql://{db_info['user']}:{db_info['password']}@{db_info['host']}/{db_info['database']}"
+    )
+
+    try:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        await connection.execute(f"CREATE SCHEMA {args.schema}")
+        await connection.execute(f"SET search_path TO {args.schema}")
+
+        await seed(connection, args.users, args.chats, args.messages, args.batch)
+        before = await run_queries(connection, args.runs)
+
+        for _, steps in SCHEMA_MIGRATIONS:
+            await apply_migration_steps(connection, steps)
+        await connection.execute("ANALYZE")
+        after = await run_queries(connection, args.runs)
+
+        report = {
+            "messages": args.messages,
+            "chats": args.chats,
+            "users": args.users,
+            "before": before,
+            "after": after
+        }
+        print(json.dumps(report, indent=2))
+
+    finally:
+        if not args.keep:
+            await connection.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""Check the named queries against a real Postgres (the DB_* and COLD_STORAGE_* settings).
+
+Each pool has a single connection, so every call reuses the connection of
+the previous one: a registered query must work on its second call through
+the pool, and the staging merge of the archive job must run on the cold
+side. Tables are created if missing; no rows are written.
+
+Usage (from backend/):
+    python -m benchmarks.check_statements
+"""
+from database.database import Database
+from storage.storage import ColdStorage
+from queries import QUERY_GET_USER, COLD_STORAGE_CREATE_STAGING, COLD_STORAGE_MERGE_STAGING_CHATS, \
+    COLD_STORAGE_MERGE_STAGING_MESSAGES
+from config import Config
+
+import asyncio
+
+
+async def main() -> None:
+    cfg = Config()
+    pool = {"min_size": 1, "max_size": 1}
+    db = Database(**cfg.DB_INFO, **pool)
+    cs = ColdStorage(**{key: cfg.COLD_STORAGE[key] for key in ("host", "user", "password", "database")},
+                     db=db, **pool)
+
+    try:
+        await db.init_db()
+        await cs.init_tables()
+
+        for attempt in (1, 2):
+            async with db.acquire() as connection:
+                await connection.fetchval(QUERY_GET_USER, "check_statements")
+            print(f"QUERY_GET_USER call {attempt}: ok")
+
+        for attempt in (1, 2):
+            async with cs.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute(COLD_STORAGE_CREATE_STAGING)
+                    await connection.execute(COLD_STORAGE_MERGE_STAGING_CHATS)
+                    await connection.execute(COLD_STORAGE_MERGE_STAGING_MESSAGES)
+            print(f"Staging merge run {attempt}: ok")
+
+        stats = {**db.statements.stats, **cs.statements.stats}
+        calls = {name: stats[name].calls for name in
+                 ("QUERY_GET_USER", "COLD_STORAGE_MERGE_STAGING_CHATS", "COLD_STORAGE_MERGE_STAGING_MESSAGES")}
+        assert set(calls.values()) == {2}, calls
+        print(f"Timed calls: {calls}")
+
+    finally:
+        await cs.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,221 @@
+"""Fake Ollama HTTP server for load tests without a GPU or network.
+
+Speaks the parts of the Ollama API the app uses (/api/tags, /api/ps,
+/api/pull, /api/generate, /api/chat with and without streaming) on a local
+port. Answers are lorem tokens produced at a configurable pace: a fixed
+load delay, prompt evaluation at `prompt_tokens_per_second` (so growing
+histories cost more), then one token every 1/`tokens_per_second` seconds.
+The final chunk carries the usual timing fields (prompt_eval_count,
+eval_duration, ...).
+
+Usage (from backend/):
+    python -m benchmarks.fake_ollama --port 11434 --tokens-per-second 40
+"""
+from datetime import datetime, timedelta, timezone
+
+import argparse
+import asyncio
+import json
+import math
+import random
+
+WORDS = ("Конечно", "вот", "краткий", "ответ", "the", "event", "loop", "runs", "coroutines", "one", "at",
+         "a", "time", "и", "переключается", "на", "await", "so", "I/O", "overlaps", ".")
+
+
+class FakeOllama:
+    """Asyncio HTTP/1.1 server imitating an Ollama host.
+
+    Args:
+        models: Model names reported by /api/tags and /api/ps
+        load_seconds: Delay before the first token of every request
+        prompt_tokens_per_second: Prompt evaluation speed
+        tokens_per_second: Generation speed
+        answer_tokens: Tokens per answer
+        chars_per_token: Characters per token to count prompt tokens
+        seed: Seed of the token generator
+    """
+
+    def __init__(self, models=("llama3.1",), load_seconds: float = 0.0, prompt_tokens_per_second: float = 2000.0,
+                 tokens_per_second: float = 50.0, answer_tokens: int = 64, chars_per_token: float = 4.0,
+                 seed: int = 42) -> None:
+        self.models = list(models)
+        self.load_seconds = load_seconds
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.chars_per_token = chars_per_token
+        self.rng = random.Random(seed)
+        self.requests = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._server = None
+        self._connections = set()
+
+    @property
+    def host(self) -> str:
+        address, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{address}:{port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Listen on host:port (0 picks a free port) and return the base URL."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self.host
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                self.requests[path] = self.requests.get(path, 0) + 1
+                await self._route(method, path.split("?", 1)[0], body, writer)
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: dict, writer: asyncio.StreamWriter) -> None:
+        if path == "/api/tags":
+            await self._json(writer, {"models": [self._model(name) for name in self.models]})
+        elif path == "/api/ps":
+            expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            await self._json(writer, {"models": [{**self._model(name), "expires_at": expires_at}
+                                                 for name in self.models]})
+        elif path == "/api/version":
+            await self._json(writer, {"version": "0.0.0-fake"})
+        elif path == "/api/pull":
+            await self._json(writer, {"status": "success"})
+        elif path in ("/api/chat", "/api/generate"):
+            if body.get("model") not in self.models and f"{body.get('model')}:latest" not in self.models:
+                await self._json(writer, {"error": f"model '{body.get('model')}' not found"}, status=404)
+            else:
+                await self._generate(path, body, writer)
+        else:
+            await self._json(writer, {"error": "not found"}, status=404)
+
+    @staticmethod
+    def _model(name: str) -> dict:
+        return {"name": name, "model": name, "digest": "0" * 64, "size": 1, "details": {}}
+
+    async def _json(self, writer: asyncio.StreamWriter, payload: dict, status: int = 200) -> None:
+        data = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+    async def _generate(self, path: str, body: dict, writer: asyncio.StreamWriter) -> None:
+        is_chat = path == "/api/chat"
+        if is_chat:
+            prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        else:
+            prompt_chars = len(body.get("prompt") or "")
+        prompt_tokens = math.ceil(prompt_chars / self.chars_per_token)
+        answer_tokens = self.answer_tokens if prompt_chars or is_chat else 0
+        prompt_seconds = prompt_tokens / self.prompt_tokens_per_second
+        delay = 1 / self.tokens_per_second
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.load_seconds + prompt_seconds)
+            tokens = [self.rng.choice(WORDS) + " " for _ in range(answer_tokens)]
+            final = {
+                "model": body.get("model"),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True,
+                "done_reason": "stop",
+                "load_duration": int(self.load_seconds * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_seconds * 1e9),
+                "eval_count": answer_tokens,
+                "eval_duration": int(answer_tokens * delay * 1e9),
+                "total_duration": int((self.load_seconds + prompt_seconds + answer_tokens * delay) * 1e9)
+            }
+
+            if not body.get("stream", True):
+                await asyncio.sleep(answer_tokens * delay)
+                text = "".join(tokens)
+                content = {"message": {"role": "assistant", "content": text}} if is_chat else {"response": text}
+                await self._json(writer, {**final, **content})
+                return
+
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for token in tokens:
+                await asyncio.sleep(delay)
+                content = {"message": {"role": "assistant", "content": token}} if is_chat else {"response": token}
+                self._chunk(writer, {"model": body.get("model"), "done": False, **content})
+                await writer.drain()
+
+            content = {"message": {"role": "assistant", "content": ""}} if is_chat else {"response": ""}
+            self._chunk(writer, {**final, **content})
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+        finally:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _chunk(writer: asyncio.StreamWriter, payload: dict) -> None:
+        data = json.dumps(payload).encode() + b"\n"
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def stats(self) -> dict:
+        return {"requests": dict(self.requests), "max_in_flight": self.max_in_flight}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="llama3.1,llama3.2,deepseek-r1:14b")
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    server = FakeOllama(
+        models=[name.strip() for name in args.models.split(",") if name.strip()],
+        load_seconds=args.load_seconds,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens
+    )
+    print(f"Fake Ollama listening on {await server.start(args.host, args.port)}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
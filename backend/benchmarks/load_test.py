@@ -0,0 +1,381 @@
+"""Load test of the API with a fake Ollama server and mixed workloads.
+
+Starts the app in-process (httpx ASGITransport, full startup/shutdown) with
+its model backends pointed at benchmarks.fake_ollama, so no GPU or network
+is needed. By default it runs against the Postgres databases configured in
+.env (DB_*/COLD_STORAGE_*): use this mode to check a change, since it is
+the only one that executes the real SQL, asyncpg pools and the statement
+registry.
+
+--stand-in replaces Database and ColdStorage with in-memory subclasses
+(benchmarks.stand_in:install or any `module:callable` that swaps the app's
+storage). It skips the whole data layer: no SQL runs, and the per-query
+counts in the report are emulated calls, not executed statements. It only
+measures the HTTP, cache, queue and model paths on a machine without
+Postgres.
+
+After seeding users, chats and history through the API, `--users` virtual
+users run for `--duration` seconds, each picking the next operation by
+weight from `--mix`:
+
+* bootstrap: GET /bootstrap (mini-app open)
+* chat: POST /neuro/chat on the user's chat, streamed for `--stream-ratio`
+  of the turns; the history grows with every turn
+* paginate: the chats page, then up to `--pages` message pages walking back
+  with the cursor (sometimes on an archived chat)
+* archive: POST /migrate/archive over the dormant chats seeded first
+
+The JSON report has p50/p95/p99 latency, RPS, status codes and DB round
+trips per request (named queries executed on the request's own task; COPY
+flushes of the write-behind queue are reported separately) per operation.
+Time to first token comes from the app's TurnStats, since ASGITransport
+hands over response bodies only once they are complete.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --users 20 --duration 30 --output report.json
+    python -m benchmarks.load_test --stand-in --users 20 --duration 30   # no Postgres, data layer skipped
+"""
+from contextvars import ContextVar
+
+from benchmarks.fake_ollama import FakeOllama
+
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import random
+import sys
+import time
+
+import httpx
+
+ROUND_TRIPS = ContextVar("round_trips", default=None)
+
+
+def percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(len(samples) * q) - 1)]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def count_round_trips(registry) -> None:
+    """Count the registry's observed queries on the ROUND_TRIPS counter of the running request."""
+    observe = registry.observe
+
+    def counted(name: str, started: float, failed: bool) -> None:
+        counter = ROUND_TRIPS.get()
+        if counter is not None:
+            counter[0] += 1
+        observe(name, started, failed)
+
+    registry.observe = counted
+
+
+class Recorder:
+    """Latency samples, status codes and round trips per operation."""
+
+    def __init__(self) -> None:
+        self.samples = {}
+
+    def record(self, operation: str, seconds: float, status: int, round_trips: int) -> None:
+        entry = self.samples.setdefault(operation, {"latency": [], "status": {}, "round_trips": 0})
+        entry["latency"].append(seconds)
+        entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+        entry["round_trips"] += round_trips
+
+    def report(self, elapsed: float) -> dict:
+        operations = {}
+        for operation, entry in sorted(self.samples.items()):
+            latency = sorted(entry["latency"])
+            count = len(latency)
+            operations[operation] = {
+                "requests": count,
+                "rps": count / elapsed,
+                "errors": sum(n for status, n in entry["status"].items() if int(status) >= 500),
+                "status": entry["status"],
+                "p50_ms": percentile(latency, 0.50) * 1e3,
+                "p95_ms": percentile(latency, 0.95) * 1e3,
+                "p99_ms": percentile(latency, 0.99) * 1e3,
+                "mean_ms": sum(latency) / count * 1e3,
+                "max_ms": latency[-1] * 1e3,
+                "db_round_trips_per_request": entry["round_trips"] / count
+            }
+
+        total = sum(op["requests"] for op in operations.values())
+        return {
+            "requests": total,
+            "rps": total / elapsed,
+            "db_round_trips_per_request": (
+                sum(entry["round_trips"] for entry in self.samples.values()) / total if total else 0.0
+            ),
+            "operations": operations
+        }
+
+
+class VirtualUser:
+    """One mini-app user: a Telegram ID, a few chats and a chat with a growing history."""
+
+    def __init__(self, test: "LoadTest", telegram_id: int, rng: random.Random) -> None:
+        self.test = test
+        self.telegram_id = telegram_id
+        self.rng = rng
+        self.user_id = None
+        self.chat_id = None
+
+    async def request(self, operation: str, method: str, url: str, **kwargs) -> httpx.Response:
+        counter = [0]
+        token = ROUND_TRIPS.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.test.client.request(method, url, **kwargs)
+        finally:
+            ROUND_TRIPS.reset(token)
+
+        if self.test.measuring:
+            self.test.recorder.record(operation, time.perf_counter() - started, response.status_code, counter[0])
+        return response
+
+    async def setup(self, chats: int, history: int) -> None:
+        response = await self.request("setup", "POST", "/users/add", json={"telegram_id": self.telegram_id})
+        self.user_id = response.json()["data"]["user_id"]
+
+        for index in range(chats):
+            await self.request("setup", "POST", "/chats/create", json={
+                "user_id": self.user_id, "chat_title": f"chat {index}", "model": self.test.args.model
+            })
+
+        response = await self.request("setup", "GET", "/bootstrap", params={"telegram_id": self.telegram_id})
+        self.chat_id = response.json()["data"]["active_chat_id"]
+        for index in range(history):
+            await self.request("setup", "POST", "/messages/add", json={
+                "chat_id": self.chat_id,
+                "role": "user" if index % 2 == 0 else "assistant",
+                "content": self.test.text(self.rng)
+            })
+
+    async def bootstrap(self) -> None:
+        await self.request("bootstrap", "GET", "/bootstrap", params={"telegram_id": self.telegram_id})
+
+    async def chat(self) -> None:
+        stream = self.rng.random() < self.test.args.stream_ratio
+        body = {
+            "chat_id": self.chat_id,
+            "model": self.test.args.model,
+            "user_id": self.user_id,
+            "stream": stream,
+            "options": {"temperature": 0.7},
+            "messages": [{"role": "user", "context": self.test.text(self.rng)}]
+        }
+        await self.request("chat_stream" if stream else "chat", "POST", "/neuro/chat", json=body)
+
+    async def paginate(self) -> None:
+        await self.request("chats_page", "GET", "/chats/get_all_chats",
+                           params={"user_id": self.user_id, "limit": self.test.args.page_size})
+
+        archived = self.test.dormant_chats and self.rng.random() < self.test.args.archived_read_ratio
+        chat_id = self.rng.choice(self.test.dormant_chats) if archived else self.chat_id
+        cursor = None
+        for _ in range(self.test.args.pages):
+            params = {"chat_id": chat_id, "limit": self.test.args.page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = await self.request("messages_page_archived" if archived else "messages_page",
+                                          "GET", "/messages/get_all_messages", params=params)
+            if response.status_code != 200:
+                break
+            cursor = response.json()["meta"]["next_cursor"]
+            if cursor is None:
+                break
+
+    async def archive(self) -> None:
+        await self.request("archive", "POST", "/migrate/archive", json={
+            "inactive_days": (time.time() - self.test.dormant_before) / 86400,
+            "batch_size": 50,
+            "max_chats": self.test.args.archive_batch
+        })
+
+    async def run(self, deadline: float) -> None:
+        operations = list(self.test.mix)
+        weights = [self.test.mix[name] for name in operations]
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            await getattr(self, operation)()
+            if self.test.args.think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / self.test.args.think_time))
+
+
+class LoadTest:
+    """Seeds the app through its API, then runs the virtual users and builds the report."""
+
+    def __init__(self, api, client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+        self.api = api
+        self.client = client
+        self.args = args
+        self.mix = parse_mix(args.mix)
+        self.recorder = Recorder()
+        self.measuring = False
+        self.dormant_chats = []
+        self.dormant_before = time.time()
+        self.words = ("привет", "как", "работает", "asyncio", "event", "loop", "и", "await", "в", "Python",
+                      "explain", "the", "difference", "between", "threads", "processes", "пример", "кода")
+
+    def text(self, rng: random.Random) -> str:
+        return " ".join(rng.choices(self.words, k=rng.randint(5, 60)))
+
+    async def seed(self) -> dict:
+        started = time.perf_counter()
+        rng = random.Random(self.args.seed)
+        base = self.args.telegram_id_base
+
+        dormant = [VirtualUser(self, base + self.args.users + index, random.Random(rng.random()))
+                   for index in range(self.args.dormant_chats)]
+        for user in dormant:
+            await user.setup(chats=1, history=self.args.history)
+            self.dormant_chats.append(user.chat_id)
+        await asyncio.sleep(0.01)
+        self.dormant_before = time.time()
+
+        users = [VirtualUser(self, base + index, random.Random(rng.random())) for index in range(self.args.users)]
+        for user in users:
+            await user.setup(chats=self.args.chats_per_user, history=self.args.history)
+        await self.api.write_queue.wait()
+
+        self.users = users
+        return {"seconds": time.perf_counter() - started, "users": len(users), "dormant_chats": len(dormant)}
+
+    async def run(self) -> dict:
+        setup = await self.seed()
+
+        calls_before = {name: stats.calls for name, stats in self.api.db.statements.stats.items()}
+        batches_before = self.api.write_queue.batches
+        self.measuring = True
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        await asyncio.gather(*(user.run(deadline) for user in self.users))
+        await self.api.write_queue.wait()
+        elapsed = time.perf_counter() - started
+        self.measuring = False
+
+        calls = {
+            name: stats.calls - calls_before[name]
+            for name, stats in self.api.db.statements.stats.items()
+            if stats.calls > calls_before[name]
+        }
+        ttft = [histogram["time_to_first_token"] for histogram in self.api.models.turn_stats.histograms.values()]
+        rates = [histogram["tokens_per_second"] for histogram in self.api.models.turn_stats.histograms.values()]
+        return {
+            "config": vars(self.args),
+            "setup": setup,
+            "elapsed_seconds": elapsed,
+            **self.recorder.report(elapsed),
+            "database": {
+                "backend": "stand-in (emulated, no SQL executed)" if self.args.stand_in else "postgres",
+                "hot_queries": sum(calls.values()),
+                "write_behind_flushes": self.api.write_queue.batches - batches_before,
+                "calls": dict(sorted(calls.items(), key=lambda item: item[1], reverse=True))
+            },
+            "models": {
+                # ASGITransport buffers bodies, so time to first token comes from the app's own recorder
+                "time_to_first_token_avg_ms": (
+                    sum(h.sum for h in ttft) / sum(h.count for h in ttft) * 1e3 if any(h.count for h in ttft) else 0.0
+                ),
+                "tokens_per_second_avg": (
+                    sum(h.sum for h in rates) / sum(h.count for h in rates) if any(h.count for h in rates) else 0.0
+                ),
+                "schedulers": self.api.models.stats()
+            }
+        }
+
+
+def load_app(args: argparse.Namespace, ollama_host: str):
+    """Import the app and point its model backends at the fake Ollama server."""
+    from neuro.backends import BackendPool
+
+    api = importlib.import_module("app.api.v1.api")
+    if args.stand_in:
+        module_name, _, function_name = args.stand_in.partition(":")
+        getattr(importlib.import_module(module_name), function_name or "install")(api)
+        print("Storage stand-in: the data layer (SQL, asyncpg, statement registry) is not exercised; "
+              "run without --stand-in to check a change", file=sys.stderr)
+
+    models = api.models
+    models.pool = BackendPool([ollama_host], health_interval=5, timeout=5)
+    models.default_concurrency = args.model_concurrency
+    models.concurrency = {}
+    models.max_queue = args.max_queue
+    api.warmer.pool = models.pool
+    api.warmer.models = [args.model]
+
+    count_round_trips(api.db.statements)
+    count_round_trips(api.cs.statements)
+    return api
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stand-in", nargs="?", const="benchmarks.stand_in:install", default=None,
+                        help="In-memory storage as module:callable (default benchmarks.stand_in:install); "
+                             "skips the data layer, query counts are emulated")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument("--mix", default="bootstrap=2,chat=3,paginate=4,archive=0.1")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between operations (s)")
+    parser.add_argument("--chats-per-user", type=int, default=5)
+    parser.add_argument("--history", type=int, default=20, help="Seeded messages per chat")
+    parser.add_argument("--dormant-chats", type=int, default=20, help="Chats seeded for the archive workload")
+    parser.add_argument("--archive-batch", type=int, default=5, help="max_chats of one archive call")
+    parser.add_argument("--archived-read-ratio", type=float, default=0.1)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--model", default="llama3.1")
+    parser.add_argument("--model-concurrency", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=32)
+    parser.add_argument("--telegram-id-base", type=int, default=900_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    ollama = FakeOllama(
+        models=[args.model],
+        load_seconds=args.load_seconds,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        seed=args.seed
+    )
+    api = load_app(args, await ollama.start())
+
+    try:
+        async with api.root.router.lifespan_context(api.root):
+            transport = httpx.ASGITransport(app=api.root)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+                report = await LoadTest(api, client, args).run()
+    finally:
+        await ollama.close()
+
+    report["ollama"] = ollama.stats()
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,371 @@
+"""In-memory stand-in for Postgres, for load tests on machines without a database.
+
+MemoryDatabase and MemoryColdStorage keep users, chats and messages in
+dicts and override every query method and acquire(); caches, the
+write-behind queue and the routers run unchanged. The data layer itself
+does not: no SQL, asyncpg pool or TimedConnection is involved, so a
+regression there passes unnoticed. Check storage changes with the load
+test against Postgres (the default) or benchmarks.check_statements.
+
+Every emulated query sleeps `round_trip` seconds and is recorded in the
+StatementRegistry under the name of the query it stands for. Round-trip
+counts and /stats/statements therefore show the calls the real methods
+are expected to make, not statements that were executed.
+
+Plug another stand-in into benchmarks.load_test with `--stand-in module:callable`;
+the callable receives the app.api.v1.api module and swaps its storage.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from database.database import ChatNotFoundError, Database, utils
+from database.write_behind import WriteBehindQueue
+from storage.storage import ColdStorage
+
+import asyncio
+import itertools
+import time
+import uuid
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _newest_first(rows: list, key: str) -> list:
+    return sorted(rows, key=lambda row: (row["created_at"], str(row[key])), reverse=True)
+
+
+def _before(rows: list, key: str, cursor: str) -> list:
+    created_at, row_id = utils.decode_cursor(cursor)
+    return [row for row in rows if (row["created_at"], str(row[key])) < (created_at, row_id)]
+
+
+class MemoryConnection:
+    """What WriteBehindQueue needs from a connection: a transaction and COPY."""
+
+    def __init__(self, db: "MemoryDatabase") -> None:
+        self.db = db
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def copy_records_to_table(self, table: str, records: list, columns: list) -> None:
+        await asyncio.sleep(self.db.round_trip)
+        self.db.copies += 1
+        for row in records:
+            self.db._insert_message(**dict(zip(columns, row)))
+
+    async def executemany(self, query: str, rows: list) -> None:
+        await self.db._query("QUERY_ADD_MESSAGE")
+        for message_id, chat_id, role, content in rows:
+            self.db._insert_message(message_id, chat_id, role, content)
+
+
+class MemoryDatabase(Database):
+    """Database stand-in holding its tables in dicts.
+
+    Args:
+        round_trip: Seconds every emulated query takes
+        **kwargs: Cache and pool arguments of Database
+    """
+
+    def __init__(self, round_trip: float = 0.0005, **kwargs) -> None:
+        super().__init__(host="stand-in", user="", password="", database="", **kwargs)
+        self.round_trip = round_trip
+        self.copies = 0
+        self.users = {}
+        self.chats = {}
+        self.messages = {}
+        self._user_ids = itertools.count(1)
+
+    async def _query(self, name: str) -> None:
+        started = time.perf_counter()
+        await asyncio.sleep(self.round_trip)
+        self.statements.observe(name, started, False)
+
+    def _insert_message(self, message_id, chat_id, role: str, content: str, created_at: datetime = None) -> None:
+        self.messages.setdefault(str(chat_id), []).append({
+            "message_id": uuid.UUID(str(message_id)),
+            "role": role,
+            "content": content,
+            "created_at": created_at or _now()
+        })
+
+    async def connect(self):
+        return None
+
+    async def close(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.pool_wait.observe(0.0)
+        yield MemoryConnection(self)
+
+    async def init_db(self) -> bool:
+        return True
+
+    async def preload_user_cache(self, limit: int) -> int:
+        return 0
+
+    async def register_user(self, telegram_id: int) -> tuple:
+        telegram_id_hash = utils.hash_value(str(telegram_id))
+        await self._query("QUERY_ADD_USER")
+        created = telegram_id_hash not in self.users
+        if created:
+            self.users[telegram_id_hash] = next(self._user_ids)
+        self.user_cache.set(telegram_id_hash, self.users[telegram_id_hash])
+        return self.users[telegram_id_hash], created
+
+    async def get_user(self, telegram_id: str) -> int:
+        telegram_id_hash = utils.hash_value(str(telegram_id))
+        user_id = self.user_cache.get(telegram_id_hash)
+        if user_id is None:
+            await self._query("QUERY_GET_USER")
+            user_id = self.users.get(telegram_id_hash)
+            if user_id is not None:
+                self.user_cache.set(telegram_id_hash, user_id)
+        return user_id
+
+    async def bootstrap(self, telegram_id: str, chats_limit: int, messages_limit: int,
+                        chat_id: str = None) -> dict:
+        telegram_id_hash = utils.hash_value(str(telegram_id))
+        await self._query("QUERY_BOOTSTRAP")
+        user_id = self.users.get(telegram_id_hash)
+        if user_id is None:
+            return None
+
+        chats = _newest_first([chat for chat in self.chats.values() if chat["user_id"] == user_id], "chat_id")
+        chats_next_cursor = None
+        if len(chats) > chats_limit:
+            chats_next_cursor = utils.encode_cursor(chats[chats_limit - 1]["created_at"],
+                                                    chats[chats_limit - 1]["chat_id"])
+
+        active = next((chat for chat in chats if str(chat["chat_id"]) == chat_id), chats[0] if chats else None)
+        active_chat_id = str(active["chat_id"]) if active else None
+        messages, messages_next_cursor = [], None
+        if active_chat_id is not None:
+            messages, messages_next_cursor = self._page(active_chat_id, messages_limit, None)
+
+        return {
+            "user_id": user_id,
+            "chats": [{**chat, "chat_id": str(chat["chat_id"]), "created_at": chat["created_at"].isoformat()}
+                      for chat in chats[:chats_limit]],
+            "chats_next_cursor": chats_next_cursor,
+            "active_chat_id": active_chat_id,
+            "messages": [{**msg, "message_id": str(msg["message_id"]), "created_at": msg["created_at"].isoformat()}
+                         for msg in messages],
+            "messages_next_cursor": messages_next_cursor
+        }
+
+    async def add_chat(self, user_id: int, chat_id: str, title: str, model: str = "tyt bydet modelka") -> bool:
+        await self._query("QUERY_ADD_CHAT")
+        self.chats[str(chat_id)] = {
+            "chat_id": uuid.UUID(str(chat_id)),
+            "user_id": user_id,
+            "title": title,
+            "model": model,
+            "created_at": _now(),
+            "is_active": True
+        }
+        return True
+
+    async def get_chats_page(self, user_id: int, limit: int, cursor: str = None) -> tuple:
+        await self._query("QUERY_GET_CHATS_PAGE" if cursor is None else "QUERY_GET_CHATS_PAGE_BEFORE")
+        chats = _newest_first([chat for chat in self.chats.values() if chat["user_id"] == user_id], "chat_id")
+        if cursor is not None:
+            chats = _before(chats, "chat_id", cursor)
+
+        next_cursor = None
+        if len(chats) > limit:
+            chats = chats[:limit]
+            next_cursor = utils.encode_cursor(chats[-1]["created_at"], chats[-1]["chat_id"])
+        return chats, next_cursor
+
+    async def delete_chat(self, chat_id: str) -> bool:
+        await self.wait_writes(chat_id)
+        await self._query("QUERY_DELETE_CHAT")
+        self.chats.pop(str(chat_id), None)
+        self.messages.pop(str(chat_id), None)
+        self.message_cache.invalidate(str(chat_id))
+        return True
+
+    def _page(self, chat_id: str, limit: int, cursor: str = None) -> tuple:
+        messages = _newest_first(self.messages.get(str(chat_id), []), "message_id")
+        if cursor is not None:
+            messages = _before(messages, "message_id", cursor)
+
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = utils.encode_cursor(messages[-1]["created_at"], messages[-1]["message_id"])
+        return messages[::-1], next_cursor
+
+    async def get_messages_page(self, chat_id: str, limit: int, cursor: str = None) -> tuple:
+        if cursor is not None:
+            utils.decode_cursor(cursor)
+
+        await self.wait_writes(chat_id)
+        await self._query("QUERY_GET_MESSAGES_PAGE" if cursor is None else "QUERY_GET_MESSAGES_PAGE_BEFORE")
+        if str(chat_id) not in self.chats and self.cold_storage is not None:
+            archived = (await self.cold_storage.get_archived_messages(chat_id))[::-1]
+            if cursor is not None:
+                archived = _before(archived, "message_id", cursor)
+            next_cursor = None
+            if len(archived) > limit:
+                archived = archived[:limit]
+                next_cursor = utils.encode_cursor(archived[-1]["created_at"], archived[-1]["message_id"])
+            return archived[::-1], next_cursor
+
+        return self._page(chat_id, limit, cursor)
+
+    async def get_all_messages(self, chat_id: str) -> list:
+        key = str(chat_id)
+        cached = self.message_cache.get(key)
+        if cached is not None:
+            return cached
+
+        token = self.message_cache.reserve(key)
+        try:
+            await self.wait_writes(chat_id)
+            await self._query("QUERY_GET_ALL_MESSAGES")
+            messages = [
+                {"message_id": str(msg["message_id"]), "role": msg["role"], "content": msg["content"]}
+                for msg in self.messages.get(key, [])
+            ]
+            self.message_cache.fill(key, messages, token)
+            return messages
+
+        finally:
+            self.message_cache.release(key, token)
+
+    async def get_recent_messages(self, chat_id: str, limit: int) -> list:
+        if str(chat_id) not in self.chats:
+            await self._query("QUERY_CHAT_EXISTS")
+            if self.cold_storage is None or not await self.cold_storage.rewarm_chat(chat_id):
+                raise ChatNotFoundError(f"Chat {chat_id} not found")
+
+        messages = await self.get_all_messages(chat_id)
+        first = len(messages) - limit
+        return [msg for index, msg in enumerate(messages) if index >= first or msg["role"] == "system"]
+
+    async def add_message(self, message_id: str, chat_id: str, role: str, content: str) -> bool:
+        await self.wait_writes(chat_id)
+        await self._query("QUERY_ADD_MESSAGE")
+        self._insert_message(message_id, chat_id, role, content)
+
+        message = {"message_id": str(message_id), "role": role, "content": content}
+        self.message_cache.update(str(chat_id), lambda messages: messages + [message])
+        return True
+
+    async def add_messages(self, chat_id: str, messages: list) -> bool:
+        if not messages:
+            return True
+
+        await self.wait_writes(chat_id)
+        await self._query("QUERY_ADD_MESSAGE")
+        for msg in messages:
+            self._insert_message(msg["message_id"], chat_id, msg["role"], msg["content"])
+
+        added = [
+            {"message_id": str(msg["message_id"]), "role": msg["role"], "content": msg["content"]}
+            for msg in messages
+        ]
+        self.message_cache.update(str(chat_id), lambda cached: cached + added)
+        return True
+
+
+class MemoryColdStorage(ColdStorage):
+    """ColdStorage stand-in: archived chats move from MemoryDatabase into a dict."""
+
+    def __init__(self, db: MemoryDatabase, **kwargs) -> None:
+        super().__init__(host="stand-in", user="", password="", database="", db=db, **kwargs)
+        self.archived = {}
+
+    async def _query(self, name: str) -> None:
+        started = time.perf_counter()
+        await asyncio.sleep(self.db.round_trip)
+        self.statements.observe(name, started, False)
+
+    async def init_tables(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    async def archive_inactive_chats(self, inactive_days: float = 30, batch_size: int = 500,
+                                     max_chats: int = None, job: str = "archive_inactive_chats") -> dict:
+        started = time.perf_counter()
+        cutoff = _now() - timedelta(days=inactive_days)
+        report = {"chats": 0, "messages": 0, "batches": 0}
+
+        await self._query("COLD_STORAGE_START_CHECKPOINT")
+        await self.db._query("QUERY_GET_INACTIVE_CHATS")
+        inactive = [
+            chat_id for chat_id, chat in self.db.chats.items()
+            if chat["created_at"] < cutoff
+            and all(msg["created_at"] < cutoff for msg in self.db.messages.get(chat_id, ()))
+            and not self.db.write_queue.pending(chat_id)
+        ]
+        finished = max_chats is None or len(inactive) <= max_chats
+        inactive = inactive[:max_chats]
+
+        for first in range(0, len(inactive), batch_size):
+            batch = inactive[first:first + batch_size]
+            await self.db._query("QUERY_GET_MESSAGES_FOR_CHATS")
+            await self._query("COLD_STORAGE_MERGE_STAGING_CHATS")
+            await self._query("COLD_STORAGE_MERGE_STAGING_MESSAGES")
+            await self.db._query("QUERY_DELETE_ARCHIVED_CHATS")
+            for chat_id in batch:
+                messages = self.db.messages.pop(chat_id, [])
+                self.archived[chat_id] = {"chat": self.db.chats.pop(chat_id), "messages": messages}
+                self.db.message_cache.invalidate(chat_id)
+                report["messages"] += len(messages)
+            report["chats"] += len(batch)
+            report["batches"] += 1
+
+        elapsed = time.perf_counter() - started
+        report["finished"] = finished
+        report["elapsed"] = elapsed
+        report["rows_per_sec"] = (report["chats"] + report["messages"]) / elapsed if elapsed else 0.0
+        return report
+
+    async def get_archived_messages(self, chat_id: str) -> list:
+        cached = self.archive_cache.get(str(chat_id))
+        if cached is None:
+            await self._query("COLD_STORAGE_GET_MESSAGES")
+            archived = self.archived.get(str(chat_id))
+            cached = archived["messages"] if archived else []
+            self.archive_cache.set(str(chat_id), cached)
+        return cached
+
+    async def rewarm_chat(self, chat_id: str) -> bool:
+        archived = self.archived.pop(str(chat_id), None)
+        if archived is None:
+            return False
+
+        await self.db._query("QUERY_RESTORE_CHAT")
+        self.db.chats[str(chat_id)] = archived["chat"]
+        self.db.messages[str(chat_id)] = archived["messages"]
+        self.archive_cache.invalidate(str(chat_id))
+        return True
+
+
+def install(api, round_trip: float = 0.0005) -> None:
+    """Swap the app's Database, ColdStorage and write-behind queue for the in-memory stand-ins."""
+    db = MemoryDatabase(
+        round_trip=round_trip,
+        message_cache=api.db.message_cache,
+        user_cache=api.db.user_cache
+    )
+    cs = MemoryColdStorage(db, archive_cache=api.cs.archive_cache)
+    db.cold_storage = cs
+    write_queue = WriteBehindQueue(db, **api.cfg.WRITE_BEHIND)
+    db.write_queue = write_queue
+
+    api.db, api.cs, api.write_queue = db, cs, write_queue
+    api.root.state.db = db
+    api.root.state.storage = cs
+    api.root.state.write_queue = write_queue
@@ -1,8 +1,26 @@
-from os import getenv
+from os import cpu_count, getenv
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path='.env', override=True)
 
+def _keep_alive(value: str):
+    """Ollama accepts keep_alive as a duration string ('30m') or seconds (-1 pins the model)."""
+    return int(value) if value.lstrip('-').isdigit() else value
+
+def _switch(value: str, auto: bool) -> bool:
+    """Parse an on/off setting that also accepts 'auto'."""
+    value = value.lower()
+    return auto if value == 'auto' else value in ('1', 'true', 'yes')
+
+def _pool_bounds(min_size: int, max_size: int, budget: int, workers: int, reserved: int = 0) -> dict:
+    """Cap one worker's pool at its share of a Postgres connection budget (0 = no budget).
+
+    `reserved` connections per worker are opened outside the pool (LISTEN).
+    """
+    if budget:
+        max_size = max(1, min(max_size, budget // workers - reserved))
+    return {'min_size': min(min_size, max_size), 'max_size': max_size}
+
 class Config:
     DB_INFO = {
         'host': getenv('DB_HOST'),
@@ -18,3 +36,142 @@ class Config:
         'database': getenv('COLD_STORAGE_DBNAME')
     }
 
+    SERVER = {
+        'host': getenv('SERVER_HOST', '0.0.0.0'),
+        'port': int(getenv('SERVER_PORT', 8000)),
+        'workers': int(getenv('SERVER_WORKERS', 0)) or cpu_count() or 1,
+        # Set by serve.py for the worker processes it starts side by side; a plain
+        # uvicorn process, a test or a script is the only process of its kind
+        'multi_worker': getenv('SERVER_MULTI_WORKER', '') == '1',
+        'backlog': int(getenv('SERVER_BACKLOG', 2048)),
+        'keep_alive': int(getenv('SERVER_KEEP_ALIVE', 5)),
+        'graceful_timeout': float(getenv('SERVER_GRACEFUL_TIMEOUT', 120)),
+        'limit_concurrency': int(getenv('SERVER_LIMIT_CONCURRENCY')) if getenv('SERVER_LIMIT_CONCURRENCY') else None,
+        'forwarded_allow_ips': getenv('SERVER_FORWARDED_ALLOW_IPS', '127.0.0.1'),
+        'access_log': getenv('SERVER_ACCESS_LOG', 'false').lower() in ('1', 'true', 'yes'),
+        'log_level': getenv('SERVER_LOG_LEVEL', 'info')
+    }
+
+    # Processes of this service sharing the connection budgets and the cores:
+    # the workers serve.py started, or this process alone
+    PROCESSES = SERVER['workers'] if SERVER['multi_worker'] else 1
+
+    # Connections each database may give this service across all workers (0 = no limit)
+    DB_MAX_CONNECTIONS = int(getenv('DB_MAX_CONNECTIONS', 0))
+    COLD_STORAGE_MAX_CONNECTIONS = int(getenv('COLD_STORAGE_MAX_CONNECTIONS', 0))
+
+    # Evict message and archive cache entries changed by other workers (LISTEN/NOTIFY);
+    # 'auto' turns it on in the workers of a multi-worker serve.py run
+    CACHE_INVALIDATION = {
+        'enabled': _switch(getenv('CACHE_INVALIDATION', 'auto'), SERVER['multi_worker']),
+        'channel': getenv('CACHE_INVALIDATION_CHANNEL', 'genai_cache_invalidation'),
+        'gap_timeout': float(getenv('CACHE_INVALIDATION_GAP_TIMEOUT', 5))
+    }
+
+    DB_POOL = {
+        **_pool_bounds(int(getenv('DB_POOL_MIN_SIZE', 2)), int(getenv('DB_POOL_MAX_SIZE', 20)),
+                       DB_MAX_CONNECTIONS, PROCESSES, int(CACHE_INVALIDATION['enabled'])),
+        'statement_cache_size': int(getenv('DB_STATEMENT_CACHE_SIZE', 100)),
+        'acquire_timeout': float(getenv('DB_POOL_ACQUIRE_TIMEOUT', 10))
+    }
+
+    COLD_STORAGE_POOL = {
+        **_pool_bounds(int(getenv('COLD_STORAGE_POOL_MIN_SIZE', 1)), int(getenv('COLD_STORAGE_POOL_MAX_SIZE', 5)),
+                       COLD_STORAGE_MAX_CONNECTIONS, PROCESSES),
+        'statement_cache_size': int(getenv('DB_STATEMENT_CACHE_SIZE', 100)),
+        'acquire_timeout': float(getenv('DB_POOL_ACQUIRE_TIMEOUT', 10))
+    }
+
+    CONTEXT = {
+        'max_messages': int(getenv('CONTEXT_MAX_MESSAGES', 50)),
+        'chars_per_token': float(getenv('CONTEXT_CHARS_PER_TOKEN', 4)),
+        'default_token_budget': int(getenv('CONTEXT_TOKEN_BUDGET', 3072)),
+        'low_watermark': float(getenv('CONTEXT_LOW_WATERMARK', 0.5)),
+        'token_budgets': {
+            'llama3.2': 6144,
+            'llama3.1:8b': 6144,
+            'deepseek-r1:14b': 3072
+        }
+    }
+
+    MESSAGE_CACHE = {
+        'max_size': int(getenv('MESSAGE_CACHE_SIZE', 1024)),
+        'ttl': float(getenv('MESSAGE_CACHE_TTL', 300))
+    }
+
+    WRITE_BEHIND = {
+        'durability': getenv('WRITE_BEHIND_DURABILITY', 'sync'),
+        'max_batch': int(getenv('WRITE_BEHIND_MAX_BATCH', 500)),
+        'max_latency': float(getenv('WRITE_BEHIND_MAX_LATENCY', 0.05)),
+        'max_depth': int(getenv('WRITE_BEHIND_MAX_DEPTH', 10000))
+    }
+
+    USER_CACHE = {
+        'max_size': int(getenv('USER_CACHE_SIZE', 100_000)),
+        'preload': int(getenv('USER_CACHE_PRELOAD', 0))
+    }
+
+    PAGINATION = {
+        'default_limit': int(getenv('PAGE_DEFAULT_LIMIT', 50)),
+        'max_limit': int(getenv('PAGE_MAX_LIMIT', 200))
+    }
+
+    RESPONSE_COMPRESSION = {
+        'minimum_size': int(getenv('RESPONSE_COMPRESS_MIN_SIZE', 1024)),
+        'gzip_level': int(getenv('RESPONSE_GZIP_LEVEL', 6)),
+        'brotli_quality': int(getenv('RESPONSE_BROTLI_QUALITY', 4))
+    }
+
+    TRACING = {
+        'sample_rate': float(getenv('TRACE_SAMPLE_RATE', 0.01)),
+        'exporter': getenv('TRACE_EXPORTER', 'jsonl'),
+        'path': getenv('TRACE_PATH', 'traces.jsonl'),
+        'otlp_endpoint': getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+        'service_name': getenv('TRACE_SERVICE_NAME', 'genai-api'),
+        'profiling': getenv('TRACE_PROFILING', 'false').lower() in ('1', 'true', 'yes'),
+        'profile_interval': float(getenv('TRACE_PROFILE_INTERVAL', 0.005))
+    }
+
+    COMPRESSION = {
+        'codec': getenv('COMPRESSION_CODEC', 'zlib'),
+        'level': int(getenv('COMPRESSION_LEVEL')) if getenv('COMPRESSION_LEVEL') else None,
+        'zstd_dict_path': getenv('COMPRESSION_ZSTD_DICT'),
+        # Per process: each worker gets its share of the cores
+        'workers': int(getenv('COMPRESSION_WORKERS', 0)) or max(1, (cpu_count() or 1) // PROCESSES)
+    }
+
+    ARCHIVE_CACHE = {
+        'max_size': int(getenv('ARCHIVE_CACHE_SIZE', 256)),
+        'ttl': float(getenv('ARCHIVE_CACHE_TTL', 600))
+    }
+    ARCHIVE_REWARM_AFTER = int(getenv('ARCHIVE_REWARM_AFTER', 0))
+
+    MODELS = {
+        'default_concurrency': int(getenv('MODEL_CONCURRENCY', 2)),
+        'concurrency': {
+            'deepseek-r1:14b': int(getenv('MODEL_CONCURRENCY_DEEPSEEK', 1))
+        },
+        'max_queue': int(getenv('MODEL_MAX_QUEUE', 32)),
+        'max_queue_per_user': int(getenv('MODEL_MAX_QUEUE_PER_USER', 2)),
+        'keep_alive': _keep_alive(getenv('OLLAMA_KEEP_ALIVE', '30m'))
+    }
+
+    RESPONSE_CACHE = {
+        'max_size': int(getenv('RESPONSE_CACHE_SIZE', 512)),
+        'ttl': float(getenv('RESPONSE_CACHE_TTL', 3600)),
+        'max_temperature': float(getenv('RESPONSE_CACHE_MAX_TEMPERATURE', 0.2))
+    }
+
+    OLLAMA = {
+        'hosts': [host.strip() for host in getenv('OLLAMA_HOSTS', 'http://localhost:11434').split(',') if host.strip()],
+        'health_interval': float(getenv('OLLAMA_HEALTH_INTERVAL', 15)),
+        'timeout': float(getenv('OLLAMA_HEALTH_TIMEOUT', 5)),
+        'pin_slack': int(getenv('OLLAMA_PIN_SLACK', 4))
+    }
+
+    WARMUP = {
+        'models': [name.strip() for name in getenv('WARMUP_MODELS', 'deepseek-r1:14b').split(',') if name.strip()],
+        'interval': float(getenv('WARMUP_INTERVAL', 60)),
+        'margin': float(getenv('WARMUP_MARGIN', 120)),
+        'pull': getenv('WARMUP_PULL', 'true').lower() in ('1', 'true', 'yes')
+    }
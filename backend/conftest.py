@@ -0,0 +1,9 @@
+import pytest
+
+# Benchmarks are scripts (load_test.py only looks like a test module)
+collect_ignore = ["benchmarks"]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import time
+
+
+class LRUCache:
+    """In-process LRU cache with optional TTL and hit/miss/eviction counters.
+
+    Reads that fill the cache take a token with reserve() first; any write to
+    the key in the meantime (update/invalidate) cancels the token, so a fill
+    with data read before that write is dropped instead of cached. A read
+    that ends without filling (error, nothing to cache) release()s its token.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if self.ttl is not None and self.clock() - entry[1] > self.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value and mark it as recently used.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            Any: Cached value or default
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries."""
+        self._pending.pop(key, None)
+        self._entries[key] = [value, self.clock()]
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def reserve(self, key: Hashable) -> object:
+        """Take a fill token for a key before reading it from the database."""
+        token = object()
+        self._pending[key] = token
+        return token
+
+    def fill(self, key: Hashable, value: Any, token: object) -> bool:
+        """Store a value read after reserve() unless the key was written since.
+
+        Returns:
+            bool: True if the value was cached
+        """
+        if self._pending.get(key) is not token:
+            return False
+
+        self.set(key, value)
+        return True
+
+    def release(self, key: Hashable, token: object) -> None:
+        """Drop a fill token that will not be used; a token taken since by another read is kept."""
+        if self._pending.get(key) is token:
+            del self._pending[key]
+
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> bool:
+        """Apply a write-through change to a cached value, if present.
+
+        Args:
+            key: Cache key
+            func: Receives the cached value and returns the new one
+
+        Returns:
+            bool: True if a cached value was updated
+        """
+        self._pending.pop(key, None)
+        entry = self._lookup(key)
+        if entry is None:
+            return False
+
+        entry[0] = func(entry[0])
+        self._entries.move_to_end(key)
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a key from the cache."""
+        self._pending.pop(key, None)
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        self._pending.clear()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get cache counters.
+
+        Returns:
+            dict: size, max_size, hits, misses, evictions and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,34 +1,142 @@
 from utils.utils import Utils
-from queries import CREATE_TABLES, QUERY_ADD_USER, \
-    QUERY_GET_USER, QUERY_ADD_CHAT, QUERY_DELETE_CHAT, QUERY_GET_ALL_CHATS, QUERY_GET_CHAT_TITLE, QUERY_GET_CHAT_BY_ID, \
-    QUERY_GET_ALL_MESSAGES, QUERY_ADD_MESSAGE, QUERY_EDIT_MESSAGE, QUERY_DELETE_MESSAGE
+from database.cache import LRUCache
+from queries import CREATE_TABLES, SCHEMA_MIGRATIONS, QUERY_CREATE_SCHEMA_VERSION, QUERY_GET_SCHEMA_VERSION, \
+    QUERY_SET_SCHEMA_VERSION, QUERY_TRY_LOCK_SCHEMA, QUERY_UNLOCK_SCHEMA, QUERY_INDEX_VALID, QUERY_ADD_USER, \
+    QUERY_GET_USER, QUERY_GET_RECENT_USERS, QUERY_BOOTSTRAP, QUERY_ADD_CHAT, QUERY_DELETE_CHAT, QUERY_GET_ALL_CHATS, QUERY_GET_CHATS_PAGE, QUERY_GET_CHATS_PAGE_BEFORE, QUERY_GET_CHAT_TITLE, QUERY_GET_CHAT_BY_ID, QUERY_CHAT_EXISTS, \
+    QUERY_GET_ALL_MESSAGES, QUERY_GET_MESSAGES_PAGE, QUERY_GET_MESSAGES_PAGE_BEFORE, \
+    QUERY_ADD_MESSAGE, QUERY_EDIT_MESSAGE, QUERY_DELETE_MESSAGE
 
+from database.statements import StatementRegistry, named_queries
+from utils.metrics import Histogram
+from utils.tracing import trace_methods
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import asyncio
 import asyncpg
+import json
+import re
+import time
 
 utils = Utils()
 
+
+class ChatNotFoundError(LookupError):
+    """The chat is neither in hot nor in cold storage."""
+    pass
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a timestamptz rendered by Postgres JSON, which trims trailing zeros of the fraction."""
+    return datetime.fromisoformat(re.sub(r"\.(\d+)", lambda m: "." + m.group(1).ljust(6, "0"), value, count=1))
+
+
+async def apply_migration_steps(connection: asyncpg.Connection, steps: list) -> None:
+    """Run the steps of one SCHEMA_MIGRATIONS version, each in its own implicit transaction."""
+    for kind, *args in steps:
+        if kind == "batch":
+            while await connection.execute(args[0]) != "UPDATE 0":
+                pass
+
+        elif kind == "index":
+            name, query = args
+            if await connection.fetchval(QUERY_INDEX_VALID, name) is False:
+                await connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            await connection.execute(query)
+
+        else:
+            await connection.execute(args[0])
+
+
+@trace_methods("db")
 class Database:
-    def __init__(self, host: str, user: str, password: str, database: str) -> None:
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 min_size: int = 2, max_size: int = 20,
+                 statement_cache_size: int = 100, acquire_timeout: float = 10.0,
+                 message_cache: LRUCache = None, user_cache: LRUCache = None) -> None:
         self.dsn = f"postgresql://{user}:{password}@{host}/{database}"
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.acquire_timeout = acquire_timeout
+        self.statements = StatementRegistry(named_queries("QUERY_"))
+        self.message_cache = message_cache if message_cache is not None else LRUCache()
+        self.user_cache = user_cache if user_cache is not None else LRUCache(max_size=100_000)
+        self.cold_storage = None
+        self.write_queue = None
+        self.invalidation = None
+        self.pool_wait = Histogram()
+        self.pool = None
+
+    async def connect(self) -> asyncpg.Pool:
+        """Create the connection pool for the PostgreSQL database.
+
+        The pool is created once per process (on application startup) and
+        shared by every request, so queries no longer pay for a new
+        connection each time.
 
-    async def connect(self) -> asyncpg.Connection:
-        """Connect to the PostgreSQL database.
-        
         Returns:
-            asyncpg.Connection: Active database connection
+            asyncpg.Pool: Active connection pool
         """
-        self.connection = await asyncpg.connect(dsn=self.dsn)
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                dsn=self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statements.cache_size(self.statement_cache_size),
+                connection_class=self.statements.connection_class
+            )
 
-        if not self.connection:
+        if not self.pool:
             raise ConnectionError("Failed to connect to the database")
-        
-        return self.connection
+
+        return self.pool
     
     async def close(self) -> None:
-        """Close the connection to the PostgreSQL database."""
-        if self.connection:
-            await self.connection.close()
-            self.connection = None
+        """Close the connection pool (on application shutdown)."""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Acquire a connection from the pool, recording the wait in `pool_wait`.
+
+        Usage:
+            async with db.acquire() as connection:
+                ...
+
+        Raises:
+            ConnectionError: If the pool was not created with connect()
+        """
+        if self.pool is None:
+            raise ConnectionError("Database pool is not initialized")
+
+        started = time.perf_counter()
+        async with self.pool.acquire(timeout=self.acquire_timeout) as connection:
+            self.pool_wait.observe(time.perf_counter() - started)
+            yield connection
+
+    async def publish_invalidation(self, cache: str, keys: list, connection: asyncpg.Connection = None) -> None:
+        """Tell the other workers to evict `keys` of a cache (no-op without an invalidation bus).
+
+        Args:
+            cache: Cache name known to the InvalidationBus ('messages', 'archive')
+            keys: Cache keys that changed; the write must be committed already
+            connection: Connection that made the write, to skip another pool acquire
+        """
+        if self.invalidation is not None and keys:
+            await self.invalidation.publish(cache, keys, connection)
+
+    async def wait_writes(self, chat_id: str = None) -> None:
+        """Wait until messages queued in the write-behind queue for a chat are committed.
+
+        Called before reading or changing a chat's messages in the database,
+        so queued writes are never missed or reordered.
+        """
+        if self.write_queue is not None:
+            await self.write_queue.wait(chat_id)
 
     async def create_tables(self) -> bool:
         """Create tables in the PostgreSQL database (users, chats, messages).
@@ -40,10 +148,9 @@ class Database:
             ValueError: If tables already exist
             RuntimeError: For other database errors
         """
-        await self.connect()
-
         try:
-            await self.connection.execute(CREATE_TABLES)
+            async with self.acquire() as connection:
+                await connection.execute(CREATE_TABLES)
             return True
         
         except asyncpg.exceptions.DuplicateTableError as e:
@@ -51,10 +158,51 @@ class Database:
         
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-
-        finally:
-            await self.close()
     
+    async def migrate_schema(self, lock_poll: float = 1.0) -> int:
+        """Apply pending versioned schema migrations (indexes, constraints).
+        
+        Steps run outside a transaction (see SCHEMA_MIGRATIONS), so the
+        tables stay writable while a migration backfills, validates and
+        builds indexes. A session advisory lock lets one of several workers
+        starting at once apply each version; the others poll for it rather
+        than block, since a blocked statement keeps a snapshot open that
+        CREATE INDEX CONCURRENTLY in the migrating worker would wait for.
+        
+        Args:
+            lock_poll: Seconds between attempts to take the migration lock
+        
+        Returns:
+            int: Schema version after migration
+            
+        Raises:
+            RuntimeError: For database errors during migration
+        """
+        try:
+            async with self.acquire() as connection:
+                while not await connection.fetchval(QUERY_TRY_LOCK_SCHEMA):
+                    await asyncio.sleep(lock_poll)
+
+                try:
+                    await connection.execute(QUERY_CREATE_SCHEMA_VERSION)
+                    current = await connection.fetchval(QUERY_GET_SCHEMA_VERSION)
+
+                    for version, steps in SCHEMA_MIGRATIONS:
+                        if version <= current:
+                            continue
+
+                        await apply_migration_steps(connection, steps)
+                        await connection.execute(QUERY_SET_SCHEMA_VERSION, version)
+                        current = version
+
+                finally:
+                    await connection.execute(QUERY_UNLOCK_SCHEMA)
+
+            return current
+        
+        except Exception as e:
+            raise RuntimeError(f"Schema migration error: {e}") from e
+
     async def init_db(self) -> bool:
         """Initialize the PostgreSQL database.
         
@@ -68,74 +216,171 @@ class Database:
         
         try:
             result = await self.create_tables()
-            return result
         
         except ValueError as _:
-            pass
+            result = False
+
+        try:
+            await self.migrate_schema()
+            return result
 
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-        
-        finally:
-            await self.close()
     
     # USER FUNCTIONS
-    async def register_user(self, telegram_id: int) -> bool:
-        """Add a user to the database.
+    async def register_user(self, telegram_id: int) -> tuple:
+        """Add a user to the database unless it already exists.
+
+        One round trip: the insert and the lookup of an existing user are a
+        single statement (INSERT ... ON CONFLICT DO NOTHING plus a SELECT
+        fallback), so calling it again for the same user is harmless.
         
         Args:
             telegram_id: Telegram user ID
             
         Returns:
-            bool: True if user was added successfully
+            tuple: (user_id, created) - created is False if the user already existed
 
         Raises:
-            asyncpg.UniqueViolationError: If user already exists
-            asyncpg.PostgresError: For other database errors
+            RuntimeError: For database errors
         """
-        await self.connect()
         telegram_id_hash = utils.hash_value(str(telegram_id))
 
         try:
-            await self.connection.execute(
-               QUERY_ADD_USER,
-                telegram_id_hash
-            )
-            return True
-        
-        except asyncpg.exceptions.UniqueViolationError as e:
-            raise ValueError("User already exists") from e
-        
+            async with self.acquire() as connection:
+                row = await connection.fetchrow(QUERY_ADD_USER, telegram_id_hash)
+                if row is None:
+                    # A concurrent registration committed after this statement's snapshot
+                    row = await connection.fetchrow(QUERY_ADD_USER, telegram_id_hash)
+
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-        
-        finally:
-            await self.close()
+
+        self.user_cache.set(telegram_id_hash, row["id"])
+        return row["id"], row["created"]
 
     async def get_user(self, telegram_id: str) -> int:
-        """Get user ID from the database.
+        """Get user ID, from the user cache or the database.
+
+        User IDs never change, so cached entries have no TTL and are only
+        evicted by LRU; unknown users are not cached.
         
         Args:
             telegram_id: Telegram user ID
             
         Returns:
-            int: User ID from table 'users'
+            int: User ID from table 'users', None if the user does not exist
             
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-        telegram_id_hash = utils.hash_value(telegram_id)
+        telegram_id_hash = utils.hash_value(str(telegram_id))
+        user_id = self.user_cache.get(telegram_id_hash)
+        if user_id is not None:
+            return user_id
 
-        try:
-            result = await self.connection.fetchrow(
+        async with self.acquire() as connection:
+            user_id = await connection.fetchval(
                 QUERY_GET_USER,
                 telegram_id_hash
             )
-            return result
+
+        if user_id is not None:
+            self.user_cache.set(telegram_id_hash, user_id)
+        return user_id
+
+    async def preload_user_cache(self, limit: int) -> int:
+        """Fill the user cache with the most recently registered users.
+
+        Args:
+            limit: Number of users to load
+
+        Returns:
+            int: Number of users loaded
+        """
+        async with self.acquire() as connection:
+            rows = await connection.fetch(QUERY_GET_RECENT_USERS, limit)
+
+        for row in reversed(rows):
+            self.user_cache.set(row["telegram_id_hash"], row["id"])
+        return len(rows)
+
+
+    async def bootstrap(self, telegram_id: str, chats_limit: int, messages_limit: int,
+                        chat_id: str = None) -> dict:
+        """Get everything the mini-app shows on open in one query.
+
+        Resolves the user, the first page of their chats and the newest
+        messages of the active chat (`chat_id` if it belongs to the user,
+        otherwise the most recent chat) with a single multi-CTE statement.
         
-        finally:
-            await self.close()
+        Args:
+            telegram_id: Telegram user ID
+            chats_limit: Size of the chats page
+            messages_limit: Number of newest messages of the active chat
+            chat_id: Chat to open instead of the most recent one
+            
+        Returns:
+            dict: user_id, chats, chats_next_cursor, active_chat_id, messages
+            (chronological) and messages_next_cursor; None if the user does not exist
+            
+        Raises:
+            asyncpg.PostgresError: For other database errors
+        """
+        telegram_id_hash = utils.hash_value(str(telegram_id))
+
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(
+                QUERY_BOOTSTRAP,
+                telegram_id_hash,
+                chats_limit + 1,
+                messages_limit + 1,
+                chat_id
+            )
+
+        if row["user_id"] is None:
+            return None
+        self.user_cache.set(telegram_id_hash, row["user_id"])
+
+        chats = json.loads(row["chats"]) if row["chats"] else []
+        chats_next_cursor = None
+        if len(chats) > chats_limit:
+            chats = chats[:chats_limit]
+            chats_next_cursor = utils.encode_cursor(
+                _parse_timestamp(chats[-1]["created_at"]), chats[-1]["chat_id"]
+            )
+
+        active_chat_id = row["active_chat_id"]
+        archived = None
+        if chat_id is not None and str(active_chat_id) != str(chat_id) and self.cold_storage is not None:
+            # The requested chat is not in hot storage; open it from the archive if it is the user's
+            archived = await self.cold_storage.get_archived_chat(chat_id)
+            if archived is not None and archived["chat"]["user_id"] == row["user_id"]:
+                active_chat_id = archived["chat"]["chat_id"]
+            else:
+                archived = None
+
+        if archived is not None or (active_chat_id is not None and self.write_queue is not None
+                                    and self.write_queue.pending(active_chat_id)):
+            messages, messages_next_cursor = await self.get_messages_page(active_chat_id, messages_limit)
+        else:
+            messages = json.loads(row["messages"]) if row["messages"] else []
+            messages_next_cursor = None
+            if len(messages) > messages_limit:
+                messages = messages[:messages_limit]
+                messages_next_cursor = utils.encode_cursor(
+                    _parse_timestamp(messages[-1]["created_at"]), messages[-1]["message_id"]
+                )
+            messages = messages[::-1]
+
+        return {
+            "user_id": row["user_id"],
+            "chats": chats,
+            "chats_next_cursor": chats_next_cursor,
+            "active_chat_id": active_chat_id,
+            "messages": messages,
+            "messages_next_cursor": messages_next_cursor
+        }
 
 
     # CHAT'S FUNCTIONS
@@ -155,16 +400,15 @@ class Database:
             asyncpg.UniqueViolationError: If chat already exists
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-
         try:
-            await self.connection.execute(
-                QUERY_ADD_CHAT,
-                chat_id,
-                user_id,
-                title,
-                model
-            )
+            async with self.acquire() as connection:
+                await connection.execute(
+                    QUERY_ADD_CHAT,
+                    chat_id,
+                    user_id,
+                    title,
+                    model
+                )
             return True
         
         except asyncpg.exceptions.UniqueViolationError as e:
@@ -172,9 +416,6 @@ class Database:
         
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-        
-        finally:
-            await self.close()
 
     async def get_chat_title(self, chat_id: str) -> str:
         """Get chat title from the database.
@@ -188,17 +429,12 @@ class Database:
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-
-        try:
-            result = await self.connection.fetchrow(
+        async with self.acquire() as connection:
+            result = await connection.fetchrow(
                 QUERY_GET_CHAT_TITLE,
                 chat_id
             )
             return result[0]
-        
-        finally:
-            await self.close()
 
     async def get_all_chats(self, user_id: int) -> list:
         """Get all chats for a user from the database.
@@ -212,18 +448,43 @@ class Database:
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-        
-
-        try:
-            result = await self.connection.fetch(
+        async with self.acquire() as connection:
+            result = await connection.fetch(
                 QUERY_GET_ALL_CHATS,
                 user_id
             )
             return result
+
+    async def get_chats_page(self, user_id: int, limit: int, cursor: str = None) -> tuple:
+        """Get one page of a user's chats, newest first (keyset pagination).
         
-        finally:
-            await self.close()
+        Args:
+            user_id: User ID
+            limit: Page size
+            cursor: Cursor returned with the previous page (None for the first page)
+            
+        Returns:
+            tuple: (chats, next_cursor); next_cursor is None on the last page
+            
+        Raises:
+            ValueError: If the cursor is malformed
+            asyncpg.PostgresError: For other database errors
+        """
+        if cursor is None:
+            query, args = QUERY_GET_CHATS_PAGE, (user_id, limit + 1)
+        else:
+            created_at, chat_id = utils.decode_cursor(cursor)
+            query, args = QUERY_GET_CHATS_PAGE_BEFORE, (user_id, created_at, chat_id, limit + 1)
+
+        async with self.acquire() as connection:
+            result = await connection.fetch(query, *args)
+
+        next_cursor = None
+        if len(result) > limit:
+            result = result[:limit]
+            next_cursor = utils.encode_cursor(result[-1]["created_at"], result[-1]["chat_id"])
+
+        return result, next_cursor
 
     async def delete_chat(self, chat_id: str) -> bool:
         """Delete a chat from the database.
@@ -237,26 +498,24 @@ class Database:
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-
         try:
-            await self.connection.execute(
-                QUERY_DELETE_CHAT,
-                chat_id
-            )
+            await self.wait_writes(chat_id)
+            async with self.acquire() as connection:
+                await connection.execute(
+                    QUERY_DELETE_CHAT,
+                    chat_id
+                )
+                await self.publish_invalidation("messages", [str(chat_id)], connection)
+            self.message_cache.invalidate(str(chat_id))
             return True
         
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-        
-        finally:
-            await self.close()
 
     async def get_chat_by_id(self, chat_id: str) -> dict:
-        await self.connect()
-
         try:
-            result = await self.connection.fetch(QUERY_GET_CHAT_BY_ID, chat_id)
+            async with self.acquire() as connection:
+                result = await connection.fetch(QUERY_GET_CHAT_BY_ID, chat_id)
             
             if not result:
                 return {}
@@ -266,13 +525,47 @@ class Database:
         
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-        
-        finally:
-            await self.close()
 
     # MESSAGE'S FUNCTIONS
+    async def _chat_in_hot(self, connection: asyncpg.Connection, chat_id: str) -> bool:
+        return await connection.fetchval(QUERY_CHAT_EXISTS, chat_id)
+
+    async def _load_history(self, chat_id: str) -> list:
+        """Read a chat's messages from hot storage through the message cache.
+
+        Returns:
+            list: Messages in chronological order, None if the chat is not in hot storage
+        """
+        key = str(chat_id)
+        cached = self.message_cache.get(key)
+        if cached is not None:
+            return cached
+
+        token = self.message_cache.reserve(key)
+        try:
+            await self.wait_writes(chat_id)
+            async with self.acquire() as connection:
+                result = await connection.fetch(
+                    QUERY_GET_ALL_MESSAGES,
+                    chat_id
+                )
+                if not result and not await self._chat_in_hot(connection, chat_id):
+                    return None
+
+            messages = [
+                {"message_id": str(row["message_id"]), "role": row["role"], "content": row["content"]}
+                for row in result
+            ]
+            self.message_cache.fill(key, messages, token)
+            return messages
+
+        finally:
+            self.message_cache.release(key, token)
+
     async def get_all_messages(self, chat_id: str) -> list:
-        """Get all messages for a chat from the database.
+        """Get all messages for a chat (served from the message cache when possible).
+        
+        Chats that are not in hot storage are read from cold storage.
         
         Args:
             chat_id: Chat ID
@@ -283,17 +576,97 @@ class Database:
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
+        messages = await self._load_history(chat_id)
+        if messages is not None:
+            return messages
 
-        try:
-            result = await self.connection.fetch(
-                QUERY_GET_ALL_MESSAGES,
-                chat_id
-            )
-            return result
+        if self.cold_storage is None:
+            return []
+
+        return [
+            {"message_id": str(msg["message_id"]), "role": msg["role"], "content": msg["content"]}
+            for msg in await self.cold_storage.get_archived_messages(chat_id)
+        ]
+
+    async def get_messages_page(self, chat_id: str, limit: int, cursor: str = None) -> tuple:
+        """Get one page of a chat's messages, walking back from the newest (keyset pagination).
         
-        finally:
-            await self.close()
+        Chats that are not in hot storage are read from cold storage.
+        
+        Args:
+            chat_id: Chat ID
+            limit: Page size
+            cursor: Cursor returned with the previous page (None for the newest page)
+            
+        Returns:
+            tuple: (messages in chronological order, next_cursor to older messages);
+                next_cursor is None on the last page
+            
+        Raises:
+            ValueError: If the cursor is malformed
+            asyncpg.PostgresError: For other database errors
+        """
+        if cursor is None:
+            query, args = QUERY_GET_MESSAGES_PAGE, (chat_id, limit + 1)
+        else:
+            created_at, message_id = utils.decode_cursor(cursor)
+            query, args = QUERY_GET_MESSAGES_PAGE_BEFORE, (chat_id, created_at, message_id, limit + 1)
+
+        await self.wait_writes(chat_id)
+        async with self.acquire() as connection:
+            result = await connection.fetch(query, *args)
+            archived = (not result and self.cold_storage is not None
+                        and not await self._chat_in_hot(connection, chat_id))
+
+        if archived:
+            result = (await self.cold_storage.get_archived_messages(chat_id))[::-1]
+            if cursor is not None:
+                result = [
+                    msg for msg in result
+                    if (msg["created_at"], str(msg["message_id"])) < (created_at, message_id)
+                ]
+            result = result[:limit + 1]
+
+        next_cursor = None
+        if len(result) > limit:
+            result = result[:limit]
+            next_cursor = utils.encode_cursor(result[-1]["created_at"], result[-1]["message_id"])
+
+        return result[::-1], next_cursor
+
+    async def get_recent_messages(self, chat_id: str, limit: int) -> list:
+        """Get the newest messages of a chat plus all of its system messages, before writing to it.
+        
+        Reads through the message cache: a miss loads and caches the whole
+        history, so the next turns of the chat, whose messages the write
+        paths append to the cached entry, are served from memory. A chat
+        that was archived is moved back to hot storage first, so the new
+        messages can reference it.
+        
+        Args:
+            chat_id: Chat ID
+            limit: Maximum number of newest messages to fetch
+            
+        Returns:
+            list: Messages in chronological order
+            
+        Raises:
+            ChatNotFoundError: If the chat is neither in hot nor in cold storage
+            RuntimeError: If the archived chat could not be moved back
+            asyncpg.PostgresError: For other database errors
+        """
+        messages = await self._load_history(chat_id)
+        if messages is None:
+            if self.cold_storage is not None and await self.cold_storage.rewarm_chat(chat_id):
+                messages = await self._load_history(chat_id)
+            if messages is None:
+                raise ChatNotFoundError(f"Chat {chat_id} not found")
+
+        first = len(messages) - limit
+        return [
+            msg for index, msg in enumerate(messages)
+            if index >= first or msg["role"] == "system"
+        ]
 
     async def add_message(self, message_id: str, chat_id: str, role: str, content: str) -> bool:
         """Add a message to the database.
@@ -311,20 +684,56 @@ class Database:
             asyncpg.UniqueViolationError: If message already exists
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-
-        try:
-            await self.connection.execute(
+        await self.wait_writes(chat_id)
+        async with self.acquire() as connection:
+            await connection.execute(
                 QUERY_ADD_MESSAGE,
                 message_id,
                 chat_id,
                 role,
                 content
             )
-            return True
+            await self.publish_invalidation("messages", [str(chat_id)], connection)
+
+        message = {"message_id": str(message_id), "role": role, "content": content}
+        self.message_cache.update(str(chat_id), lambda messages: messages + [message])
+        return True
+
+    async def add_messages(self, chat_id: str, messages: list) -> bool:
+        """Add several messages of one chat in a single transaction.
         
-        finally:
-            await self.close()
+        Args:
+            chat_id: Chat ID (UUID)
+            messages: Dicts with 'message_id' (UUID), 'role' and 'content', in order
+
+        Returns:
+            bool: True if messages were added successfully
+            
+        Raises:
+            asyncpg.UniqueViolationError: If a message already exists
+            asyncpg.PostgresError: For other database errors
+        """
+        if not messages:
+            return True
+
+        await self.wait_writes(chat_id)
+        async with self.acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(
+                    QUERY_ADD_MESSAGE,
+                    [
+                        (msg["message_id"], chat_id, msg["role"], msg["content"])
+                        for msg in messages
+                    ]
+                )
+            await self.publish_invalidation("messages", [str(chat_id)], connection)
+
+        added = [
+            {"message_id": str(msg["message_id"]), "role": msg["role"], "content": msg["content"]}
+            for msg in messages
+        ]
+        self.message_cache.update(str(chat_id), lambda cached: cached + added)
+        return True
 
     async def edit_message(self, chat_id: str, message_id: str, content: str) -> bool:
         """Edit a message in the database.
@@ -340,19 +749,21 @@ class Database:
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-
-        try:
-            await self.connection.execute(
+        await self.wait_writes(chat_id)
+        async with self.acquire() as connection:
+            await connection.execute(
                 QUERY_EDIT_MESSAGE,
                 content,
                 message_id,
                 chat_id
             )
-            return True
+            await self.publish_invalidation("messages", [str(chat_id)], connection)
 
-        finally:
-            await self.close()
+        self.message_cache.update(str(chat_id), lambda messages: [
+            {**msg, "content": content} if msg["message_id"] == str(message_id) else msg
+            for msg in messages
+        ])
+        return True
 
     async def delete_message(self, message_id: str, chat_id: str) -> bool:
         """Delete a message from the database.
@@ -367,15 +778,16 @@ class Database:
         Raises:
             asyncpg.PostgresError: For other database errors
         """
-        await self.connect()
-
-        try:
-            await self.connection.execute(
+        await self.wait_writes(chat_id)
+        async with self.acquire() as connection:
+            await connection.execute(
                 QUERY_DELETE_MESSAGE,
                 message_id,
                 chat_id
             )
-            return True
-        
-        finally:
-            await self.close()
\ No newline at end of file
+            await self.publish_invalidation("messages", [str(chat_id)], connection)
+
+        self.message_cache.update(str(chat_id), lambda messages: [
+            msg for msg in messages if msg["message_id"] != str(message_id)
+        ])
+        return True
\ No newline at end of file
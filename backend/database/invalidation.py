@@ -0,0 +1,196 @@
+from typing import Dict, List
+
+from database.cache import LRUCache
+from queries import QUERY_NOTIFY_INVALIDATION
+
+import asyncio
+import asyncpg
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+    Write paths publish `origin:seq:cache:key` events on the hot database
+    once their change is committed; every worker listens on one dedicated
+    connection and evicts the key from its own cache. A worker skips its
+    own events, since it already updated its caches write-through.
+
+    Events are evictions, so applying one twice or late is harmless. `seq`
+    numbers every event of a worker: events published on different pool
+    connections can arrive out of order, so a missing number is held as a
+    gap for `gap_timeout` seconds; if it never shows up (the publish
+    failed) or the LISTEN connection drops, the caches are cleared, since
+    the lost event cannot be replayed. Eviction also cancels fills in
+    progress (LRUCache.reserve), so a read that started before the remote
+    write cannot cache the old value afterwards.
+
+    Args:
+        db: Hot database the events go through
+        caches: Evictable caches by event name ('messages', 'archive', ...)
+        channel: NOTIFY channel
+        gap_timeout: Seconds to wait for a missing sequence number before clearing the caches
+        reconnect_delay: Seconds between attempts to reopen the LISTEN connection
+        max_gaps: Missing sequence numbers tracked before clearing the caches right away
+    """
+
+    def __init__(self, db, caches: Dict[str, LRUCache], channel: str = "genai_cache_invalidation",
+                 gap_timeout: float = 5.0, reconnect_delay: float = 1.0, max_gaps: int = 10000) -> None:
+        self.db = db
+        self.caches = caches
+        self.channel = channel
+        self.gap_timeout = gap_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_gaps = max_gaps
+        self.origin = os.urandom(4).hex()
+        self.listening = asyncio.Event()
+        self._seq = 0
+        self._last_seq = {}
+        self._gaps = {}
+        self._task = None
+        self.published = 0
+        self.publish_failed = 0
+        self.received = 0
+        self.evicted = 0
+        self.reordered = 0
+        self.resyncs = 0
+
+    async def start(self, timeout: float = 10.0) -> None:
+        """Open the LISTEN connection in the background and wait until it listens."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self.listening.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cache invalidation is not listening yet; retrying in the background")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, cache: str, keys: List[str], connection: asyncpg.Connection = None) -> None:
+        """Send eviction events for `keys` of a cache in one round trip.
+
+        Call it after the write is committed, on the connection that made it
+        when there is one. A failed publish is logged, not raised: the write
+        itself succeeded, and listeners notice the missing sequence numbers
+        and clear their caches.
+        """
+        payloads = []
+        for key in keys:
+            self._seq += 1
+            payloads.append(f"{self.origin}:{self._seq}:{cache}:{key}")
+
+        try:
+            if connection is not None:
+                await connection.execute(QUERY_NOTIFY_INVALIDATION, self.channel, payloads)
+            else:
+                async with self.db.acquire() as connection:
+                    await connection.execute(QUERY_NOTIFY_INVALIDATION, self.channel, payloads)
+            self.published += len(payloads)
+        except Exception as e:
+            self.publish_failed += len(payloads)
+            logger.warning("Could not publish %d cache invalidations: %s", len(payloads), e)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            origin, seq, cache, key = payload.split(":", 3)
+            seq = int(seq)
+        except ValueError:
+            logger.warning("Malformed cache invalidation: %r", payload)
+            return
+
+        if origin == self.origin:
+            return
+
+        self.received += 1
+        self._track(origin, seq)
+        target = self.caches.get(cache)
+        if target is not None:
+            target.invalidate(key)
+            self.evicted += 1
+
+    def _track(self, origin: str, seq: int) -> None:
+        """Advance the sequence of an origin, remembering skipped numbers as gaps."""
+        last = self._last_seq.get(origin)
+        if last is None:
+            self._last_seq[origin] = seq
+            return
+
+        if seq > last:
+            if seq - last - 1 + len(self._gaps) > self.max_gaps:
+                self._resync("too many missing events")
+            else:
+                now = time.monotonic()
+                for missing in range(last + 1, seq):
+                    self._gaps[(origin, missing)] = now
+            self._last_seq[origin] = seq
+        elif self._gaps.pop((origin, seq), None) is not None:
+            self.reordered += 1
+
+    def _check_gaps(self) -> None:
+        deadline = time.monotonic() - self.gap_timeout
+        if any(seen < deadline for seen in self._gaps.values()):
+            self._resync("missing events")
+
+    def _resync(self, reason: str) -> None:
+        """Clear every cache after events were lost; they refill from the database."""
+        for cache in self.caches.values():
+            cache.clear()
+        self._gaps.clear()
+        self.resyncs += 1
+        logger.warning("Cleared the invalidated caches: %s", reason)
+
+    async def _run(self) -> None:
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn=self.db.dsn)
+                await connection.add_listener(self.channel, self._on_notify)
+                if connected_before:
+                    # Events published while the connection was down are lost
+                    self._last_seq.clear()
+                    self._resync("LISTEN connection was reopened")
+                connected_before = True
+                self.listening.set()
+
+                while True:
+                    await asyncio.sleep(self.gap_timeout / 2)
+                    self._check_gaps()
+                    await connection.execute("SELECT 1")
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.warning("Cache invalidation LISTEN connection failed: %s", e)
+
+            finally:
+                self.listening.clear()
+                if connection is not None:
+                    connection.terminate()
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    def stats(self) -> dict:
+        return {
+            "origin": self.origin,
+            "listening": self.listening.is_set(),
+            "published": self.published,
+            "publish_failed": self.publish_failed,
+            "received": self.received,
+            "evicted": self.evicted,
+            "reordered": self.reordered,
+            "pending_gaps": len(self._gaps),
+            "resyncs": self.resyncs
+        }
@@ -0,0 +1,133 @@
+from typing import Dict, Tuple
+
+import asyncpg
+import bisect
+import logging
+import time
+
+import queries
+from utils.metrics import LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+DML_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def named_queries(*prefixes: str) -> Dict[str, str]:
+    """Collect the single-statement DML queries of queries.py whose names start with a prefix.
+
+    DDL (CREATE TABLE, migrations) and multi-statement scripts are left out:
+    they cannot be prepared and run through the simple query protocol.
+    """
+    return {
+        name: sql for name, sql in vars(queries).items()
+        if name.startswith(prefixes) and isinstance(sql, str)
+        and sql.lstrip().split(None, 1)[0].upper() in DML_KEYWORDS
+        and ";" not in sql.strip().rstrip(";")
+    }
+
+
+class StatementStats:
+    """Call count, total time and latency histogram of one statement."""
+
+    __slots__ = ("calls", "errors", "total", "buckets")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, elapsed: float, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.total += elapsed
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+
+class StatementRegistry:
+    """Named queries of queries.py with per-statement timings.
+
+    Connections of a pool created with `connection_class` time every
+    registered query text, so callers keep writing
+    `connection.fetch(QUERY_GET_USER, ...)`. Plans are reused by asyncpg's
+    per-connection statement cache (`statement_cache_size`), which is sized
+    to hold every registered statement; no statement handle is kept across
+    pool acquisitions, since asyncpg invalidates it on release.
+
+    Args:
+        statements: Query name -> SQL text
+    """
+
+    def __init__(self, statements: Dict[str, str]) -> None:
+        self.statements = statements
+        self.names = {sql: name for name, sql in statements.items()}
+        self.stats = {name: StatementStats() for name in statements}
+        self.connection_class = type("TimedConnection", (TimedConnection,), {"registry": self})
+
+    def cache_size(self, configured: int) -> int:
+        """asyncpg statement_cache_size holding every registered statement (0 keeps caching off)."""
+        return max(configured, len(self.statements)) if configured else 0
+
+    def observe(self, name: str, started: float, failed: bool) -> None:
+        self.stats[name].observe(time.perf_counter() - started, failed)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Per-statement calls, errors, total/avg seconds and cumulative histogram.
+
+        Returns:
+            dict: Statements ordered by total time, most expensive first
+        """
+        result = {}
+        for name, stats in sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True):
+            cumulative, histogram = 0, {}
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.buckets):
+                cumulative += count
+                histogram["+Inf" if bound == float("inf") else str(bound)] = cumulative
+
+            result[name] = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "total_seconds": stats.total,
+                "avg_seconds": stats.total / stats.calls if stats.calls else 0.0,
+                "histogram": histogram
+            }
+        return result
+
+
+class TimedConnection(asyncpg.Connection):
+    """Connection that records the timings of registered queries."""
+
+    registry: StatementRegistry = None
+
+    async def _timed(self, query: str, call):
+        name = self.registry.names[query]
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await call
+            failed = False
+            return result
+
+        finally:
+            self.registry.observe(name, started, failed)
+
+    async def fetch(self, query, *args, timeout=None, record_class=None):
+        call = super().fetch(query, *args, timeout=timeout, record_class=record_class)
+        return await (self._timed(query, call) if query in self.registry.names else call)
+
+    async def fetchrow(self, query, *args, timeout=None, record_class=None):
+        call = super().fetchrow(query, *args, timeout=timeout, record_class=record_class)
+        return await (self._timed(query, call) if query in self.registry.names else call)
+
+    async def fetchval(self, query, *args, column=0, timeout=None):
+        call = super().fetchval(query, *args, column=column, timeout=timeout)
+        return await (self._timed(query, call) if query in self.registry.names else call)
+
+    async def execute(self, query: str, *args, timeout=None) -> str:
+        call = super().execute(query, *args, timeout=timeout)
+        return await (self._timed(query, call) if query in self.registry.names else call)
+
+    async def executemany(self, command: str, args, *, timeout=None):
+        call = super().executemany(command, args, timeout=timeout)
+        return await (self._timed(command, call) if command in self.registry.names else call)
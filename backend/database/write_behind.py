@@ -0,0 +1,231 @@
+from typing import Dict, List, Optional
+
+from queries import QUERY_ADD_MESSAGE
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COLUMNS = ["message_id", "chat_id", "role", "content"]
+
+
+class WriteBehindQueue:
+    """Write-behind queue for chat messages.
+
+    Messages are put on an asyncio queue and inserted by one background task
+    in batches (COPY, one transaction) as soon as `max_batch` rows are waiting
+    or `max_latency` seconds after the first one. The message cache is updated
+    on enqueue; readers of a chat with queued rows wait for them through
+    Database before going to the database, so reads never miss a write.
+
+    In 'sync' mode (the default) a write returns once its batch is committed
+    and raises if its rows were rejected, so callers only acknowledge stored
+    messages; batching still amortizes concurrent writes. 'async' returns as
+    soon as the rows are queued: a rejected write (e.g. its chat was deleted
+    meanwhile) is then only logged, counted in `failed_rows` and evicted
+    from the message cache.
+
+    Args:
+        db: Database the messages are written to
+        durability: 'sync' to return once committed, 'async' to return once queued
+        max_batch: Rows per flush
+        max_latency: Seconds a row may wait for its batch to fill
+        max_depth: Queued writes before enqueueing blocks (backpressure)
+    """
+
+    def __init__(self, db, durability: str = "sync", max_batch: int = 500,
+                 max_latency: float = 0.05, max_depth: int = 10000) -> None:
+        if durability not in ("async", "sync"):
+            raise ValueError(f"Unknown durability mode: {durability}")
+
+        self.db = db
+        self.durability = durability
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self._queue = asyncio.Queue(maxsize=max_depth)
+        self._task = None
+        self._enqueue_lock = asyncio.Lock()
+        self._seq = 0
+        self._committed = 0
+        self._chat_seq = {}
+        self._committed_event = asyncio.Event()
+        self.flushed_rows = 0
+        self.batches = 0
+        self.failed_rows = 0
+        self.blocked = 0
+        self.flush_time = 0.0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            # Wake wait() if the task dies, so callers fail instead of hanging
+            self._task.add_done_callback(lambda _: self._committed_event.set())
+
+    async def close(self) -> None:
+        """Flush everything queued and stop the background task."""
+        if self._task is not None:
+            if not self._task.done():
+                await self._queue.put(None)
+            await self._task
+            self._task = None
+
+    async def add_message(self, message_id: str, chat_id: str, role: str, content: str) -> None:
+        await self.add_messages(chat_id, [{"message_id": message_id, "role": role, "content": content}])
+
+    async def add_messages(self, chat_id: str, messages: List[Dict[str, str]]) -> None:
+        """Queue messages of one chat, in order.
+
+        In 'sync' mode this returns once the batch holding them is committed.
+
+        Args:
+            chat_id: Chat ID (UUID)
+            messages: Dicts with 'message_id' (UUID), 'role' and 'content', in order
+
+        Raises:
+            RuntimeError: If the flush task is not running, or in 'sync' mode
+                if the messages could not be written
+        """
+        if not messages:
+            return
+
+        if self._task is None or self._task.done():
+            raise RuntimeError("Write-behind queue is not running")
+
+        waiter = asyncio.get_running_loop().create_future() if self.durability == "sync" else None
+        rows = [(msg["message_id"], chat_id, msg["role"], msg["content"]) for msg in messages]
+        added = [
+            {"message_id": str(msg["message_id"]), "role": msg["role"], "content": msg["content"]}
+            for msg in messages
+        ]
+
+        # Numbering and enqueueing under one lock keeps the queue in seq order even
+        # when producers block on a full queue, so a flushed batch never skips a seq
+        async with self._enqueue_lock:
+            self._seq += 1
+            seq = self._seq
+            self._chat_seq[str(chat_id)] = seq
+            self.db.message_cache.update(str(chat_id), lambda cached: cached + added)
+
+            if self._queue.full():
+                self.blocked += 1
+            await self._queue.put((seq, str(chat_id), rows, waiter))
+
+        if waiter is not None:
+            await waiter
+
+    def pending(self, chat_id: str) -> bool:
+        """Whether a chat has queued messages that are not committed yet."""
+        return str(chat_id) in self._chat_seq
+
+    async def wait(self, chat_id: Optional[str] = None) -> None:
+        """Wait until the queued writes of a chat (of every chat if None) are committed.
+
+        Raises:
+            RuntimeError: If the flush task is not running, so the writes never commit
+        """
+        target = self._seq if chat_id is None else self._chat_seq.get(str(chat_id), 0)
+        while self._committed < target:
+            if self._task is None or self._task.done():
+                raise RuntimeError("Write-behind queue is not running")
+            self._committed_event.clear()
+            await self._committed_event.wait()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            rows = len(item[2])
+            deadline = loop.time() + self.max_latency
+
+            while rows < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is None:
+                    stopping = True
+                    break
+
+                batch.append(item)
+                rows += len(item[2])
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list) -> None:
+        started = time.perf_counter()
+        rows = [row for _, _, item_rows, _ in batch for row in item_rows]
+
+        try:
+            async with self.db.acquire() as connection:
+                async with connection.transaction():
+                    await connection.copy_records_to_table("messages", records=rows, columns=MESSAGE_COLUMNS)
+            errors = {}
+
+        except Exception as e:
+            logger.warning("Write-behind batch of %d rows failed (%s), retrying row by row", len(rows), e)
+            errors = await self._flush_rows(batch)
+
+        failed = 0
+        for seq, chat_id, item_rows, waiter in batch:
+            error = errors.get(seq)
+            if error is not None:
+                failed += len(item_rows)
+                self.db.message_cache.invalidate(chat_id)
+
+            if waiter is not None and not waiter.done():
+                if error is None:
+                    waiter.set_result(True)
+                else:
+                    waiter.set_exception(RuntimeError(f"Database error: {error}"))
+
+            if self._chat_seq.get(chat_id) == seq:
+                del self._chat_seq[chat_id]
+
+        self._committed = batch[-1][0]
+        self._committed_event.set()
+        self.flushed_rows += len(rows) - failed
+        self.failed_rows += failed
+        self.batches += 1
+        self.flush_time += time.perf_counter() - started
+
+        await self.db.publish_invalidation("messages", list(dict.fromkeys(chat_id for _, chat_id, _, _ in batch)))
+
+    async def _flush_rows(self, batch: list) -> dict:
+        """Insert each queued write on its own, so one bad write does not drop the batch."""
+        errors = {}
+        for seq, _, item_rows, _ in batch:
+            try:
+                async with self.db.acquire() as connection:
+                    async with connection.transaction():
+                        await connection.executemany(QUERY_ADD_MESSAGE, item_rows)
+            except Exception as e:
+                logger.error("Write-behind dropped %d rows: %s", len(item_rows), e)
+                errors[seq] = e
+        return errors
+
+    def stats(self) -> dict:
+        return {
+            "durability": self.durability,
+            "depth": self._queue.qsize(),
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "batches": self.batches,
+            "avg_batch": self.flushed_rows / self.batches if self.batches else 0.0,
+            "avg_flush_seconds": self.flush_time / self.batches if self.batches else 0.0,
+            "blocked": self.blocked
+        }
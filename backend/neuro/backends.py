@@ -0,0 +1,212 @@
+from contextlib import asynccontextmanager
+from typing import List, Set
+
+from ollama import AsyncClient, ResponseError
+
+from database.cache import LRUCache
+
+import asyncio
+import httpx
+import time
+
+
+class BackendUnavailableError(RuntimeError):
+    """No healthy Ollama backend can serve the model."""
+    pass
+
+
+def _model_names(name: str) -> Set[str]:
+    """Names a model can be requested by: `llama3.2:latest` is also `llama3.2`."""
+    if name.endswith(":latest"):
+        return {name, name[:-len(":latest")]}
+    return {name}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed call may succeed on another backend.
+
+    Connection problems and 5xx errors are retried elsewhere, and so is 404
+    (the model is not pulled on that host). Other 4xx errors are the
+    request's fault and would fail everywhere.
+    """
+    if isinstance(error, ResponseError):
+        return error.status_code == 404 or error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+
+class OllamaBackend:
+    """One Ollama host with its client, load and last known model state."""
+
+    def __init__(self, host: str, **client_kwargs) -> None:
+        self.host = host
+        self.client = AsyncClient(host=host, **client_kwargs)
+        self.healthy = False
+        self.outstanding = 0
+        self.models = set()
+        self.loaded = set()
+        self.failures = 0
+        self.last_error = None
+        self.last_check = None
+
+    async def refresh(self, timeout: float) -> None:
+        """Health check: read available (/api/tags) and loaded (/api/ps) models."""
+        try:
+            tags, running = await asyncio.wait_for(
+                asyncio.gather(self.client.list(), self.client.ps()),
+                timeout=timeout
+            )
+
+        except Exception as e:
+            self.mark_failed(e)
+
+        else:
+            self.models = {name for model in tags.models for name in _model_names(model.model)}
+            self.loaded = {name for model in running.models for name in _model_names(model.model)}
+            self.healthy = True
+            self.last_error = None
+
+        finally:
+            self.last_check = time.time()
+
+    def mark_failed(self, error: Exception) -> None:
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "models": sorted(self.models),
+            "loaded": sorted(self.loaded),
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_check": self.last_check
+        }
+
+
+class BackendPool:
+    """Pool of Ollama hosts with health checks and model-aware routing.
+
+    Requests go to the healthy host that has the model with the fewest
+    outstanding requests, preferring hosts where the model is already loaded
+    to avoid a cold load. Failed hosts are taken out of rotation until the
+    next successful health check.
+
+    A chat is pinned to the host that served it last, where its prompt prefix
+    is still in the KV cache, unless that host is `pin_slack` requests busier
+    than the best one.
+
+    Args:
+        hosts: Ollama base URLs
+        health_interval: Seconds between health checks
+        timeout: Timeout of a health check in seconds
+        max_pins: Number of chats remembered for pinning
+        pin_slack: Extra outstanding requests tolerated on a pinned host
+    """
+
+    def __init__(self, hosts: List[str], health_interval: float = 15.0, timeout: float = 5.0,
+                 max_pins: int = 10000, pin_slack: int = 4) -> None:
+        self.backends = [OllamaBackend(host) for host in hosts]
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.pins = LRUCache(max_size=max_pins)
+        self.pin_slack = pin_slack
+        self.discovered = False
+        self._health_task = None
+
+    async def start(self) -> None:
+        """Discover models of every host and start periodic health checks."""
+        await self.check()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    async def check(self) -> None:
+        """Refresh every host; models are known once at least one host answered."""
+        await asyncio.gather(*(backend.refresh(self.timeout) for backend in self.backends))
+        if any(backend.healthy for backend in self.backends):
+            self.discovered = True
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    def models(self) -> Set[str]:
+        """Models available on any host, as last discovered."""
+        return set().union(*(backend.models for backend in self.backends))
+
+    def supports(self, model_name: str) -> bool:
+        """Whether the model exists on some host; True until a host first answered a health check."""
+        return not self.discovered or model_name in self.models()
+
+    def candidates(self, model_name: str, exclude: tuple = ()) -> List[OllamaBackend]:
+        """Healthy hosts with the model, best first: loaded model, then fewest outstanding."""
+        backends = [
+            backend for backend in self.backends
+            if backend not in exclude
+            and (not self.discovered or backend.healthy and model_name in backend.models)
+        ]
+        return sorted(backends, key=lambda backend: (model_name not in backend.loaded, backend.outstanding))
+
+    def pick(self, model_name: str, exclude: tuple = (), pin_key: str = None) -> OllamaBackend:
+        """Get the best backend for a model.
+
+        Args:
+            model_name: Model to run
+            exclude: Backends that already failed this request
+            pin_key: Chat to keep on the same backend, None to not pin
+
+        Raises:
+            BackendUnavailableError: If no healthy backend has the model
+        """
+        candidates = self.candidates(model_name, exclude)
+        if not candidates:
+            raise BackendUnavailableError(f"No healthy Ollama backend for model {model_name}")
+
+        best = candidates[0]
+        if pin_key is None:
+            return best
+
+        pinned = self.pins.get((pin_key, model_name))
+        for backend in candidates:
+            if backend.host == pinned and backend.outstanding <= best.outstanding + self.pin_slack:
+                return backend
+
+        self.pins.set((pin_key, model_name), best.host)
+        return best
+
+    @asynccontextmanager
+    async def lease(self, backend: OllamaBackend, model_name: str):
+        """Count a request as outstanding on a backend for the duration of the block."""
+        backend.outstanding += 1
+        try:
+            yield backend.client
+            backend.loaded.add(model_name)
+
+        except ResponseError as e:
+            if e.status_code == 404:
+                backend.models -= _model_names(model_name)
+                backend.loaded -= _model_names(model_name)
+            elif e.status_code >= 500:
+                backend.mark_failed(e)
+            raise
+
+        except Exception as e:
+            if is_retryable(e):
+                backend.mark_failed(e)
+            raise
+
+        finally:
+            backend.outstanding -= 1
+
+    def stats(self) -> dict:
+        return {backend.host: backend.stats() for backend in self.backends}
@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional
+
+from database.cache import LRUCache
+
+import math
+
+
+class ContextBuilder:
+    """Assemble the chat history sent to the model within a token budget.
+
+    System messages and the messages of the current turn are always kept;
+    older turns are dropped, newest first kept, once the budget is spent.
+
+    For a known chat the window start is anchored to a message and only moves
+    when the window overflows, and then jumps forward to `low_watermark` of
+    the budget. Between jumps every prompt extends the previous one, so
+    Ollama can reuse the KV cache of the shared prefix instead of
+    re-evaluating the whole history each turn.
+    """
+
+    def __init__(self, max_messages: int = 50, default_token_budget: int = 3072,
+                 token_budgets: Optional[Dict[str, int]] = None, chars_per_token: float = 4,
+                 low_watermark: float = 0.5, max_chats: int = 4096) -> None:
+        self.max_messages = max_messages
+        self.default_token_budget = default_token_budget
+        self.token_budgets = token_budgets or {}
+        self.chars_per_token = chars_per_token
+        self.low_watermark = low_watermark
+        self.anchors = LRUCache(max_size=max_chats)
+
+    def estimate_tokens(self, message: Dict[str, str]) -> int:
+        """Approximate the token count of a message from its length.
+
+        Args:
+            message: Message with 'role' and 'content'
+
+        Returns:
+            int: Estimated number of tokens (including role overhead)
+        """
+        return math.ceil(len(message["content"]) / self.chars_per_token) + 4
+
+    def token_budget(self, model_name: str) -> int:
+        """Get the prompt token budget for a model."""
+        return self.token_budgets.get(model_name, self.default_token_budget)
+
+    def _window_start(self, history: List[Dict[str, str]], budget: float, max_messages: float) -> int:
+        """Index of the oldest non-system message that fits, filling from the newest."""
+        start = len(history)
+        kept = 0
+        for index in range(len(history) - 1, -1, -1):
+            if history[index]["role"] == "system":
+                continue
+
+            tokens = self.estimate_tokens(history[index])
+            if tokens > budget or kept >= max_messages:
+                break
+
+            budget -= tokens
+            kept += 1
+            start = index
+        return start
+
+    def _anchored_start(self, chat_id: str, history: List[Dict[str, str]], budget: int) -> Optional[int]:
+        """Index of the chat's anchor message if the window from it still fits."""
+        anchor = self.anchors.get(chat_id)
+        if anchor is None:
+            return None
+
+        for index, msg in enumerate(history):
+            if str(msg.get("message_id")) == anchor:
+                tokens = sum(
+                    self.estimate_tokens(msg) for msg in history[index:]
+                    if msg["role"] != "system"
+                )
+                return index if tokens <= budget else None
+        return None
+
+    def build(self, model_name: str, history: List[Dict[str, str]],
+              new_messages: List[Dict[str, str]], chat_id: Optional[str] = None) -> List[Dict[str, str]]:
+        """Build the context for one turn.
+
+        Args:
+            model_name: Model the context is built for
+            history: Previous messages in chronological order (with message_id to anchor the window)
+            new_messages: Messages of the current turn
+            chat_id: Chat the window is anchored for, None to always take the newest that fit
+
+        Returns:
+            list: Messages (role, content) in chronological order that fit the budget
+        """
+        budget = self.token_budget(model_name)
+        budget -= sum(self.estimate_tokens(msg) for msg in new_messages)
+        budget -= sum(self.estimate_tokens(msg) for msg in history if msg["role"] == "system")
+
+        if chat_id is None:
+            start = self._window_start(history, budget, self.max_messages)
+        else:
+            start = self._anchored_start(str(chat_id), history, budget)
+            if start is None:
+                start = self._window_start(
+                    history,
+                    budget * self.low_watermark,
+                    self.max_messages * self.low_watermark
+                )
+                if start < len(history) and "message_id" in history[start]:
+                    self.anchors.set(str(chat_id), str(history[start]["message_id"]))
+
+        context = [
+            {"role": msg["role"], "content": msg["content"]}
+            for index, msg in enumerate(history)
+            if msg["role"] == "system" or index >= start
+        ]
+        return context + [{"role": msg["role"], "content": msg["content"]} for msg in new_messages]
@@ -1,34 +1,244 @@
-from typing import AsyncGenerator, List, Dict
-from ollama import AsyncClient
-
-import asyncio
-
-class UnsupportedModelError(Exception):
-    pass
-
-class Model:
-    def __init__(self, model_name: str = 'llama3.2'):
-        self.model_name = model_name
-        self.client = AsyncClient()
-        self._validate_model()
-
-    def _validate_model(self):
-        supported_models = ['llama3.2', 'llama3.1:8b', "deepseek-r1:14b"]
-        if self.model_name not in supported_models:
-            raise UnsupportedModelError(f"Model {self.model_name} not supported")
-
-    async def generate_answer(
-        self, 
-        messages: List[Dict[str, str]]
-    ):
-        try:
-            response = await self.client.chat(
-                model=self.model_name,
-                messages=messages,
-                stream=False
-            )
-
-            return response.message.content
-                
-        except Exception as e:
-            raise Exception(e)
+from typing import AsyncGenerator, Hashable, List, Dict, Union
+
+from .backends import BackendPool, BackendUnavailableError, is_retryable
+from .scheduler import ModelScheduler, QueueFullError
+from .response_cache import ResponseCache
+from .turn_stats import TurnStats
+from utils.tracing import set_attribute, traced
+
+import asyncio
+import contextlib
+import time
+
+class UnsupportedModelError(Exception):
+    pass
+
+class Model:
+    def __init__(self, model_name: str = 'llama3.2', pool: BackendPool = None,
+                 scheduler: ModelScheduler = None, response_cache: ResponseCache = None,
+                 keep_alive: Union[str, int] = None, turn_stats: TurnStats = None):
+        self.model_name = model_name
+        self.pool = pool or BackendPool([None])
+        self._validate_model()
+        self.scheduler = scheduler
+        self.response_cache = response_cache
+        self.keep_alive = keep_alive
+        self.turn_stats = turn_stats
+
+    def _validate_model(self):
+        if not self.pool.supports(self.model_name):
+            raise UnsupportedModelError(f"Model {self.model_name} not supported")
+
+    def _slot(self, user_key: Hashable):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(user_key)
+
+    def _record(self, chat_id: str, backend, messages: List[Dict[str, str]], response) -> None:
+        if self.turn_stats is not None:
+            self.turn_stats.record(self.model_name, chat_id, backend.host, messages, response)
+
+    def _first_token(self, started: float) -> None:
+        if self.turn_stats is not None:
+            self.turn_stats.observe_first_token(self.model_name, time.perf_counter() - started)
+
+    @traced("model.generate")
+    async def generate_answer(
+        self, 
+        messages: List[Dict[str, str]],
+        user_key: Hashable = None,
+        options: dict = None,
+        chat_id: str = None
+    ):
+        set_attribute("model", self.model_name)
+        if self.response_cache is not None:
+            return await self.response_cache.get_or_generate(
+                self.model_name, messages, options,
+                lambda: self._generate(messages, user_key, options, chat_id)
+            )
+        return await self._generate(messages, user_key, options, chat_id)
+
+    async def _generate(
+        self,
+        messages: List[Dict[str, str]],
+        user_key: Hashable = None,
+        options: dict = None,
+        chat_id: str = None
+    ):
+        started = time.perf_counter()
+        try:
+            async with self._slot(user_key):
+                tried = ()
+                while True:
+                    backend = self.pool.pick(self.model_name, exclude=tried, pin_key=chat_id)
+                    set_attribute("host", backend.host)
+                    try:
+                        async with self.pool.lease(backend, self.model_name) as client:
+                            response = await client.chat(
+                                model=self.model_name,
+                                messages=messages,
+                                stream=False,
+                                options=options,
+                                keep_alive=self.keep_alive
+                            )
+                        # Not streamed: the first token came eval_duration before the answer
+                        self._first_token(started + (response.eval_duration or 0) / 1e9)
+                        self._record(chat_id, backend, messages, response)
+                        break
+
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        tried += (backend,)
+
+            return response.message.content
+
+        except (QueueFullError, BackendUnavailableError):
+            raise
+        except Exception as e:
+            raise Exception(e)
+
+    @traced("model.stream")
+    async def stream_answer(
+        self,
+        messages: List[Dict[str, str]],
+        user_key: Hashable = None,
+        options: dict = None,
+        chat_id: str = None
+    ) -> AsyncGenerator[str, None]:
+        """Stream the answer token by token.
+
+        The scheduler slot is held until the stream is exhausted or closed. A
+        backend that fails before the first chunk is skipped for the next one;
+        after that the error is raised, since the client has a partial answer.
+
+        Args:
+            messages: Chat history in Ollama format (role, content)
+            user_key: Fairness key for the model queue (user or chat id)
+            options: Ollama generation options (temperature, top_p, ...)
+            chat_id: Chat to keep on the same backend, whose KV cache holds its prefix
+
+        Yields:
+            str: Content delta as soon as Ollama produces it
+
+        Raises:
+            BackendUnavailableError: If no healthy backend can serve the model
+        """
+        set_attribute("model", self.model_name)
+        requested = time.perf_counter()
+        first_token = True
+        async with self._slot(user_key):
+            tried = ()
+            while True:
+                backend = self.pool.pick(self.model_name, exclude=tried, pin_key=chat_id)
+                set_attribute("host", backend.host)
+                started = False
+
+                try:
+                    async with self.pool.lease(backend, self.model_name) as client:
+                        stream = await client.chat(
+                            model=self.model_name,
+                            messages=messages,
+                            stream=True,
+                            options=options,
+                            keep_alive=self.keep_alive
+                        )
+
+                        try:
+                            async for chunk in stream:
+                                started = True
+                                if chunk.done:
+                                    self._record(chat_id, backend, messages, chunk)
+                                if chunk.message.content:
+                                    if first_token:
+                                        first_token = False
+                                        self._first_token(requested)
+                                    yield chunk.message.content
+
+                        finally:
+                            await stream.aclose()
+                    return
+
+                except Exception as e:
+                    if started or not is_retryable(e):
+                        raise
+                    tried += (backend,)
+
+
+class ModelRegistry:
+    """Process-wide registry of models: one scheduler per model over a shared backend pool.
+
+    Args:
+        pool: Ollama hosts serving the models
+        default_concurrency: Parallel generations per model unless overridden
+        concurrency: Per-model overrides of the concurrency limit
+        max_queue: Waiting requests per model before 429
+        max_queue_per_user: Waiting requests per user and model before 429
+        response_cache: Answer cache shared by all models, None to disable
+        keep_alive: How long Ollama keeps a model loaded after a request
+        turn_stats: Recorder of per-turn prompt-eval timings, None to disable
+    """
+
+    def __init__(self, pool: BackendPool = None, default_concurrency: int = 2, concurrency: dict = None,
+                 max_queue: int = 32, max_queue_per_user: int = 2,
+                 response_cache: ResponseCache = None, keep_alive: Union[str, int] = None,
+                 turn_stats: TurnStats = None):
+        self.pool = pool or BackendPool([None])
+        self.default_concurrency = default_concurrency
+        self.concurrency = concurrency or {}
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.response_cache = response_cache
+        self.keep_alive = keep_alive
+        self.turn_stats = turn_stats
+        self._models = {}
+
+    def get(self, model_name: str) -> Model:
+        """Get the shared Model for a name, creating its scheduler on first use.
+
+        Raises:
+            UnsupportedModelError: If no backend has the model
+        """
+        model = self._models.get(model_name)
+        if model is None:
+            scheduler = ModelScheduler(
+                model_name,
+                concurrency=self.concurrency.get(model_name, self.default_concurrency),
+                max_queue=self.max_queue,
+                max_queue_per_user=self.max_queue_per_user
+            )
+            model = Model(
+                model_name,
+                pool=self.pool,
+                scheduler=scheduler,
+                response_cache=self.response_cache,
+                keep_alive=self.keep_alive,
+                turn_stats=self.turn_stats
+            )
+            self._models[model_name] = model
+        return model
+
+    def schedulers(self) -> Dict[str, ModelScheduler]:
+        """Schedulers of every model used so far, by model name."""
+        return {name: model.scheduler for name, model in self._models.items()}
+
+    def in_flight(self) -> int:
+        """Generations running or queued across all models."""
+        return sum(model.scheduler.active + model.scheduler.queued for model in self._models.values())
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for running and queued generations to finish, at most `timeout` seconds.
+
+        Returns:
+            bool: True if every model went idle in time
+        """
+        deadline = time.monotonic() + timeout
+        while self.in_flight():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    def stats(self) -> dict:
+        """Get scheduler metrics of every model used so far."""
+        return {name: model.scheduler.stats() for name, model in self._models.items()}
@@ -0,0 +1,87 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from database.cache import LRUCache
+
+import asyncio
+import hashlib
+import json
+
+
+class ResponseCache:
+    """Cache of full model answers for deterministic requests.
+
+    Only requests whose temperature is at or below `max_temperature` are
+    cached; sampling at higher temperatures is expected to give different
+    answers. Concurrent identical requests are coalesced into one in-flight
+    generation (single-flight).
+
+    Args:
+        max_size: Number of cached answers
+        ttl: Seconds an answer stays valid
+        max_temperature: Highest temperature a request may use to be cached
+    """
+
+    def __init__(self, max_size: int = 512, ttl: Optional[float] = 3600,
+                 max_temperature: float = 0.2) -> None:
+        self.cache = LRUCache(max_size=max_size, ttl=ttl)
+        self.max_temperature = max_temperature
+        self._inflight = {}
+        self.coalesced = 0
+        self.bypassed = 0
+
+    def key(self, model_name: str, messages: List[Dict[str, str]], options: Optional[dict]) -> Optional[str]:
+        """Get the cache key of a request, or None if it must not be cached.
+
+        Roles are lower-cased and content whitespace is collapsed, so trivial
+        formatting differences hit the same entry.
+        """
+        temperature = (options or {}).get("temperature")
+        if temperature is None or temperature > self.max_temperature:
+            return None
+
+        normalized = [
+            [message["role"].strip().lower(), " ".join(message["content"].split())]
+            for message in messages
+        ]
+        payload = json.dumps([model_name, normalized, options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get_or_generate(self, model_name: str, messages: List[Dict[str, str]], options: Optional[dict],
+                              generate: Callable[[], Awaitable[str]]) -> str:
+        """Return a cached answer, join an identical in-flight generation, or start one.
+
+        The generation runs as its own task, so a waiter that disconnects does
+        not cancel it for the others; its answer is cached when it completes.
+        """
+        key = self.key(model_name, messages, options)
+        if key is None:
+            self.bypassed += 1
+            return await generate()
+
+        answer = self.cache.get(key)
+        if answer is not None:
+            return answer
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(generate())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._complete(key, done))
+
+        return await asyncio.shield(task)
+
+    def _complete(self, key: str, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache.set(key, task.result())
+
+    def stats(self) -> dict:
+        """Get hit/miss counters of the cache plus coalesced and uncacheable requests."""
+        return {
+            **self.cache.stats(),
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "inflight": len(self._inflight)
+        }
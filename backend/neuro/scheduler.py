@@ -0,0 +1,153 @@
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Hashable
+
+from utils.metrics import Histogram, LLM_LATENCY_BUCKETS
+from utils.tracing import span
+
+import asyncio
+import math
+import time
+
+
+class QueueFullError(Exception):
+    """The model's queue (or the user's share of it) is full."""
+
+    def __init__(self, model_name: str, retry_after: float) -> None:
+        super().__init__(f"Model {model_name} is busy, retry in {math.ceil(retry_after)}s")
+        self.model_name = model_name
+        self.retry_after = retry_after
+
+
+class ModelScheduler:
+    """Concurrency limit with fair per-user FIFO queues for one model.
+
+    At most `concurrency` generations run at once. Waiting requests are
+    queued per user and served round-robin across users, so one user's
+    burst cannot starve everybody else. When the queue is full new requests
+    are rejected with QueueFullError carrying a Retry-After estimate.
+    """
+
+    def __init__(self, model_name: str, concurrency: int = 2, max_queue: int = 32,
+                 max_queue_per_user: int = 2) -> None:
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.active = 0
+        self.queued = 0
+        self._queues = OrderedDict()
+        self._service_time = 10.0
+        self._queue_times = deque(maxlen=1000)
+        self.queue_wait = Histogram(LLM_LATENCY_BUCKETS)
+        self.completed = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        """Estimate when a slot frees up, from the average generation time."""
+        return max(1.0, (self.queued / self.concurrency + 1) * self._service_time)
+
+    def ensure_capacity(self, user_key: Hashable) -> None:
+        """Reject early (before a response is started) if the request could not be queued.
+
+        Raises:
+            QueueFullError: If the model or user queue is full
+        """
+        if self.active < self.concurrency and not self.queued:
+            return
+
+        if self.queued >= self.max_queue or len(self._queues.get(user_key, ())) >= self.max_queue_per_user:
+            self.rejected += 1
+            raise QueueFullError(self.model_name, self.retry_after())
+
+    async def acquire(self, user_key: Hashable) -> None:
+        """Wait for a generation slot.
+
+        Raises:
+            QueueFullError: If the model or user queue is full
+        """
+        started = time.monotonic()
+        self.ensure_capacity(user_key)
+
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            self._queue_times.append(0.0)
+            self.queue_wait.observe(0.0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_key, deque()).append(waiter)
+        self.queued += 1
+
+        try:
+            await waiter
+
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._remove(user_key, waiter)
+            raise
+
+        self._queue_times.append(time.monotonic() - started)
+        self.queue_wait.observe(self._queue_times[-1])
+
+    def _remove(self, user_key: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(user_key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self._queues[user_key]
+
+    def release(self) -> None:
+        """Hand the slot to the next user in round-robin order, or free it."""
+        while self._queues:
+            user_key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+
+            if queue:
+                self._queues.move_to_end(user_key)
+            else:
+                del self._queues[user_key]
+
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, user_key: Hashable):
+        """Hold a generation slot for the duration of the block."""
+        with span("model.queue"):
+            await self.acquire(user_key)
+        started = time.monotonic()
+
+        try:
+            yield
+
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self.completed += 1
+            self.release()
+
+    def stats(self) -> dict:
+        """Get load and queue-time metrics of the model.
+
+        Returns:
+            dict: active/queued/completed/rejected counts and queue times in seconds
+        """
+        queue_times = sorted(self._queue_times)
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_generation_time": self._service_time,
+            "queue_time_avg": sum(queue_times) / len(queue_times) if queue_times else 0.0,
+            "queue_time_p95": queue_times[math.ceil(len(queue_times) * 0.95) - 1] if queue_times else 0.0,
+            "queue_time_max": queue_times[-1] if queue_times else 0.0
+        }
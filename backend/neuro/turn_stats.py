@@ -0,0 +1,113 @@
+from collections import deque
+from typing import Any, Optional
+
+from database.cache import LRUCache
+from utils.metrics import Histogram, LLM_LATENCY_BUCKETS, TOKEN_RATE_BUCKETS
+
+import math
+
+
+class TurnStats:
+    """Ollama prompt-eval timings of every turn, per chat and per model.
+
+    Ollama reports in `prompt_eval_count` only the prompt tokens it actually
+    evaluated; tokens served from the KV cache of a shared prefix are not
+    counted. Comparing it with the estimated prompt size shows how much
+    re-evaluation the prefix cache avoids.
+
+    Per-model histograms of time to first token, load, prompt-eval and eval
+    durations and generation speed are kept for the /metrics endpoint.
+
+    Args:
+        max_chats: Chats whose recent turns are kept
+        turns_per_chat: Turns kept per chat
+        chars_per_token: Characters per token for the prompt size estimate
+    """
+
+    def __init__(self, max_chats: int = 1024, turns_per_chat: int = 20, chars_per_token: float = 4) -> None:
+        self.chats = LRUCache(max_size=max_chats)
+        self.turns_per_chat = turns_per_chat
+        self.chars_per_token = chars_per_token
+        self.totals = {}
+        self.histograms = {}
+
+    def record(self, model_name: str, chat_id: Optional[str], host: str, messages: list, response: Any) -> dict:
+        """Record the timings of a finished generation (final chat response or stream chunk).
+
+        Returns:
+            dict: The turn record
+        """
+        prompt_tokens = sum(math.ceil(len(msg["content"]) / self.chars_per_token) + 4 for msg in messages)
+        turn = {
+            "model": model_name,
+            "host": host,
+            "messages": len(messages),
+            "estimated_prompt_tokens": prompt_tokens,
+            "prompt_eval_count": response.prompt_eval_count or 0,
+            "prompt_eval_duration": (response.prompt_eval_duration or 0) / 1e9,
+            "eval_count": response.eval_count or 0,
+            "eval_duration": (response.eval_duration or 0) / 1e9,
+            "load_duration": (response.load_duration or 0) / 1e9
+        }
+
+        totals = self.totals.setdefault(model_name, {
+            "turns": 0,
+            "estimated_prompt_tokens": 0,
+            "prompt_eval_count": 0,
+            "prompt_eval_duration": 0.0,
+            "eval_count": 0,
+            "eval_duration": 0.0,
+            "load_duration": 0.0
+        })
+        totals["turns"] += 1
+        for key in totals:
+            if key != "turns":
+                totals[key] += turn[key]
+
+        histograms = self._histograms(model_name)
+        histograms["load_duration"].observe(turn["load_duration"])
+        histograms["prompt_eval_duration"].observe(turn["prompt_eval_duration"])
+        histograms["eval_duration"].observe(turn["eval_duration"])
+        if turn["eval_duration"] > 0:
+            histograms["tokens_per_second"].observe(turn["eval_count"] / turn["eval_duration"])
+
+        if chat_id is not None:
+            turns = self.chats.get(str(chat_id))
+            if turns is None:
+                turns = deque(maxlen=self.turns_per_chat)
+                self.chats.set(str(chat_id), turns)
+            turns.append(turn)
+
+        return turn
+
+    def observe_first_token(self, model_name: str, seconds: float) -> None:
+        """Record the time from the request to the first generated token."""
+        self._histograms(model_name)["time_to_first_token"].observe(seconds)
+
+    def _histograms(self, model_name: str) -> dict:
+        histograms = self.histograms.get(model_name)
+        if histograms is None:
+            histograms = self.histograms[model_name] = {
+                "time_to_first_token": Histogram(LLM_LATENCY_BUCKETS),
+                "load_duration": Histogram(LLM_LATENCY_BUCKETS),
+                "prompt_eval_duration": Histogram(LLM_LATENCY_BUCKETS),
+                "eval_duration": Histogram(LLM_LATENCY_BUCKETS),
+                "tokens_per_second": Histogram(TOKEN_RATE_BUCKETS)
+            }
+        return histograms
+
+    def chat(self, chat_id: str) -> list:
+        """Recorded turns of a chat, oldest first."""
+        return list(self.chats.get(str(chat_id)) or ())
+
+    def stats(self) -> dict:
+        """Per-model totals and the share of prompt tokens not re-evaluated."""
+        return {
+            model_name: {
+                **totals,
+                "prompt_reuse_ratio": max(
+                    0.0, 1 - totals["prompt_eval_count"] / totals["estimated_prompt_tokens"]
+                ) if totals["estimated_prompt_tokens"] else 0.0
+            }
+            for model_name, totals in self.totals.items()
+        }
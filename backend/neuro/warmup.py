@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+from typing import List, Union
+
+from .backends import BackendPool, OllamaBackend
+
+import asyncio
+import time
+
+
+class ModelWarmer:
+    """Keep configured models pulled and loaded on every Ollama backend.
+
+    On start each model is pulled where it is missing and preloaded with
+    `keep_alive`, then a background loop reads /api/ps and reloads models that
+    were evicted or expire within `margin` seconds, so users never pay the
+    cold load. `warmed` is set once every model is loaded on some backend;
+    a pass where pulls or preloads failed leaves it unset until a later pass
+    succeeds.
+
+    Args:
+        pool: Ollama backends to warm
+        models: Model names to keep loaded
+        keep_alive: Ollama keep_alive for the preload (duration string, seconds or -1 to pin)
+        interval: Seconds between load-state checks
+        margin: Reload a model this many seconds before it expires
+        pull: Pull models that are missing on a backend
+    """
+
+    def __init__(self, pool: BackendPool, models: List[str], keep_alive: Union[str, int] = "30m",
+                 interval: float = 60.0, margin: float = 120.0, pull: bool = True) -> None:
+        self.pool = pool
+        self.models = models
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.margin = margin
+        self.pull = pull
+        self.state = {}
+        self.warmed = asyncio.Event()
+        self._task = None
+
+    async def start(self) -> None:
+        """Start warming in the background; startup does not wait for pulls."""
+        if self.models:
+            self._task = asyncio.create_task(self._run())
+        else:
+            self.warmed.set()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.warm_all()
+            if self.is_warm():
+                self.warmed.set()
+            await asyncio.sleep(self.interval)
+
+    async def warm_all(self) -> None:
+        """Pull, load or refresh every configured model on every healthy backend."""
+        await asyncio.gather(*(
+            self._warm_backend(backend)
+            for backend in self.pool.backends
+            if backend.healthy
+        ))
+
+    async def _warm_backend(self, backend: OllamaBackend) -> None:
+        try:
+            running = await backend.client.ps()
+        except Exception as e:
+            backend.mark_failed(e)
+            return
+
+        expires = {model.model: model.expires_at for model in running.models}
+        for model_name in self.models:
+            expires_at = expires.get(model_name) or expires.get(f"{model_name}:latest")
+            if expires_at is not None and self._seconds_left(expires_at) > self.margin:
+                self._set_state(backend, model_name, "loaded", expires_at=expires_at)
+                continue
+
+            await self._warm(backend, model_name)
+
+    async def _warm(self, backend: OllamaBackend, model_name: str) -> None:
+        try:
+            if model_name not in backend.models:
+                if not self.pull:
+                    self._set_state(backend, model_name, "missing")
+                    return
+
+                self._set_state(backend, model_name, "pulling")
+                await backend.client.pull(model_name)
+                backend.models.add(model_name)
+
+            self._set_state(backend, model_name, "loading")
+            started = time.monotonic()
+            await backend.client.generate(model=model_name, prompt="", keep_alive=self.keep_alive)
+
+        except Exception as e:
+            self._set_state(backend, model_name, "error", error=str(e))
+            return
+
+        backend.loaded.add(model_name)
+        self._set_state(backend, model_name, "loaded", load_seconds=time.monotonic() - started,
+                        warmed_at=time.time())
+
+    @staticmethod
+    def _seconds_left(expires_at: datetime) -> float:
+        return (expires_at - datetime.now(timezone.utc)).total_seconds()
+
+    def _set_state(self, backend: OllamaBackend, model_name: str, state: str, **details) -> None:
+        entry = self.state.setdefault(model_name, {}).setdefault(backend.host, {})
+        if state != "loaded":
+            entry.pop("expires_at", None)
+        entry.pop("error", None)
+        entry.update(state=state, **details)
+        if isinstance(entry.get("expires_at"), datetime):
+            entry["expires_at"] = entry["expires_at"].isoformat()
+
+    def cold_models(self) -> dict:
+        """Per-backend state of the configured models that are not loaded on any backend."""
+        return {
+            model_name: self.state.get(model_name, {})
+            for model_name in self.models
+            if not any(entry["state"] == "loaded" for entry in self.state.get(model_name, {}).values())
+        }
+
+    def is_warm(self) -> bool:
+        """Whether every configured model is loaded on at least one backend."""
+        return not self.cold_models()
+
+    def stats(self) -> dict:
+        """Per-model, per-backend load state (pulling/loading/loaded/missing/error)."""
+        return self.state
@@ -1,2 +1,25 @@
-import ollama
-ollama.pull(model="deepseek-r1:14b")
\ No newline at end of file
+"""Pull and preload the warm-up models on every configured Ollama host, then exit.
+
+Usage (from backend/):
+    python ollama_pulls.py
+"""
+from neuro.backends import BackendPool
+from neuro.warmup import ModelWarmer
+from config import Config
+
+import asyncio
+import json
+
+
+async def main() -> None:
+    cfg = Config()
+    pool = BackendPool(**cfg.OLLAMA)
+    await pool.check()
+
+    warmer = ModelWarmer(pool=pool, keep_alive=cfg.MODELS["keep_alive"], **cfg.WARMUP)
+    await warmer.warm_all()
+    print(json.dumps(warmer.stats(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
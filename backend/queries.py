@@ -30,6 +30,76 @@ CREATE_TABLES = """
 
 """
 
+# Versioned schema changes applied at startup by Database.migrate_schema,
+# in order, each version exactly once. The steps of a version run one by one
+# outside a transaction, so none holds a long lock on the large tables, and
+# each is idempotent: a version interrupted halfway re-runs from its start.
+#   ("sql", query): a single statement
+#   ("batch", query): an UPDATE of at most N rows, repeated until it changes none
+#   ("index", name, query): CREATE INDEX CONCURRENTLY; an invalid index left by
+#       an interrupted build is dropped first
+# NOT NULL is added through a NOT VALID check constraint: VALIDATE scans the
+# table without blocking writes, and SET NOT NULL then skips its own scan.
+SCHEMA_MIGRATIONS = [
+    (1, [
+        ("batch", """
+            UPDATE messages SET created_at = NOW()
+            WHERE message_id IN (SELECT message_id FROM messages WHERE created_at IS NULL LIMIT 10000)
+        """),
+        ("sql", "ALTER TABLE messages ALTER COLUMN created_at SET DEFAULT clock_timestamp()"),
+        ("sql", """
+            DO $$ BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'messages'::regclass
+                               AND conname = 'messages_created_at_not_null') THEN
+                    ALTER TABLE messages ADD CONSTRAINT messages_created_at_not_null
+                        CHECK (created_at IS NOT NULL) NOT VALID;
+                END IF;
+            END $$
+        """),
+        ("sql", "ALTER TABLE messages VALIDATE CONSTRAINT messages_created_at_not_null"),
+        ("sql", "ALTER TABLE messages ALTER COLUMN created_at SET NOT NULL"),
+        ("sql", "ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_created_at_not_null"),
+
+        ("batch", """
+            UPDATE chats SET created_at = NOW()
+            WHERE chat_id IN (SELECT chat_id FROM chats WHERE created_at IS NULL LIMIT 10000)
+        """),
+        ("sql", """
+            DO $$ BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'chats'::regclass
+                               AND conname = 'chats_created_at_not_null') THEN
+                    ALTER TABLE chats ADD CONSTRAINT chats_created_at_not_null
+                        CHECK (created_at IS NOT NULL) NOT VALID;
+                END IF;
+            END $$
+        """),
+        ("sql", "ALTER TABLE chats VALIDATE CONSTRAINT chats_created_at_not_null"),
+        ("sql", "ALTER TABLE chats ALTER COLUMN created_at SET NOT NULL"),
+        ("sql", "ALTER TABLE chats DROP CONSTRAINT IF EXISTS chats_created_at_not_null"),
+
+        ("index", "idx_messages_chat_id_created_at", """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_chat_id_created_at
+                ON messages (chat_id, created_at, message_id)
+        """),
+        ("index", "idx_chats_user_id_created_at", """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chats_user_id_created_at
+                ON chats (user_id, created_at, chat_id)
+        """),
+    ]),
+]
+
+QUERY_CREATE_SCHEMA_VERSION = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+    )
+"""
+QUERY_GET_SCHEMA_VERSION = """SELECT COALESCE(MAX(version), 0) FROM schema_version"""
+QUERY_SET_SCHEMA_VERSION = """INSERT INTO schema_version (version) VALUES ($1)"""
+QUERY_TRY_LOCK_SCHEMA = """SELECT pg_try_advisory_lock(hashtext('genai_schema_migrations'))"""
+QUERY_UNLOCK_SCHEMA = """SELECT pg_advisory_unlock(hashtext('genai_schema_migrations'))"""
+QUERY_INDEX_VALID = """SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)"""
+
 COLD_STORAGE_CREATE_TABLES = """
     CREATE TABLE IF NOT EXISTS cold_storage_chats (
         chat_id UUID PRIMARY KEY,
@@ -47,17 +117,80 @@ COLD_STORAGE_CREATE_TABLES = """
         content_compressed BYTEA NOT NULL,
         created_at TIMESTAMP WITH TIME ZONE NOT NULL
     );
+
+    CREATE INDEX IF NOT EXISTS idx_cold_storage_messages_chat_id_created_at
+        ON cold_storage_messages (chat_id, created_at, message_id);
+
+    CREATE TABLE IF NOT EXISTS cold_storage_checkpoints (
+        job TEXT PRIMARY KEY,
+        cutoff TIMESTAMP WITH TIME ZONE NOT NULL,
+        last_chat_id UUID,
+        pending_chat_ids UUID[] NOT NULL DEFAULT '{}',
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+    );
 """
 
 
 
 
-QUERY_ADD_USER =  """INSERT INTO users (telegram_id_hash) VALUES ($1)"""
+QUERY_ADD_USER = """
+    WITH inserted AS (
+        INSERT INTO users (telegram_id_hash) VALUES ($1)
+        ON CONFLICT (telegram_id_hash) DO NOTHING
+        RETURNING id
+    )
+    SELECT id, TRUE AS created FROM inserted
+    UNION ALL
+    SELECT id, FALSE AS created FROM users WHERE telegram_id_hash = $1
+    LIMIT 1
+"""
 QUERY_GET_USER = """SELECT id FROM users WHERE telegram_id_hash = $1"""
+QUERY_GET_RECENT_USERS = """SELECT id, telegram_id_hash FROM users ORDER BY id DESC LIMIT $1"""
+QUERY_BOOTSTRAP = """
+    WITH app_user AS (
+        SELECT id FROM users WHERE telegram_id_hash = $1
+    ),
+    chats_page AS (
+        SELECT chat_id, title, model, created_at FROM chats
+        WHERE user_id = (SELECT id FROM app_user)
+        ORDER BY created_at DESC, chat_id DESC
+        LIMIT $2
+    ),
+    active_chat AS (
+        SELECT chat_id FROM chats
+        WHERE chat_id = $4::uuid AND user_id = (SELECT id FROM app_user)
+        UNION ALL
+        (SELECT chat_id FROM chats_page ORDER BY created_at DESC, chat_id DESC LIMIT 1)
+        LIMIT 1
+    ),
+    tail AS (
+        SELECT message_id, role, content, created_at FROM messages
+        WHERE chat_id = (SELECT chat_id FROM active_chat)
+        ORDER BY created_at DESC, message_id DESC
+        LIMIT $3
+    )
+    SELECT
+        (SELECT id FROM app_user) AS user_id,
+        (SELECT chat_id FROM active_chat) AS active_chat_id,
+        (SELECT json_agg(chats_page ORDER BY created_at DESC, chat_id DESC) FROM chats_page) AS chats,
+        (SELECT json_agg(tail ORDER BY created_at DESC, message_id DESC) FROM tail) AS messages
+"""
 
 QUERY_ADD_CHAT = """INSERT INTO chats (chat_id, user_id, title, model) VALUES ($1, $2, $3, $4)"""
 QUERY_GET_CHAT_TITLE = """SELECT title FROM chats WHERE chat_id = $1"""
-QUERY_GET_ALL_CHATS = """SELECT chat_id, title FROM chats WHERE user_id = $1"""
+QUERY_GET_ALL_CHATS = """SELECT chat_id, title FROM chats WHERE user_id = $1 ORDER BY created_at DESC, chat_id DESC"""
+QUERY_GET_CHATS_PAGE = """
+    SELECT chat_id, title, model, created_at FROM chats
+    WHERE user_id = $1
+    ORDER BY created_at DESC, chat_id DESC
+    LIMIT $2
+"""
+QUERY_GET_CHATS_PAGE_BEFORE = """
+    SELECT chat_id, title, model, created_at FROM chats
+    WHERE user_id = $1 AND (created_at, chat_id) < ($2, $3)
+    ORDER BY created_at DESC, chat_id DESC
+    LIMIT $4
+"""
 QUERY_DELETE_CHAT = """
     WITH deleted_messages AS (
         DELETE FROM messages WHERE chat_id = $1
@@ -65,17 +198,114 @@ QUERY_DELETE_CHAT = """
     DELETE FROM chats WHERE chat_id = $1
 """
 QUERY_GET_CHAT_BY_ID = """SELECT * FROM chats WHERE chat_id = $1"""
+QUERY_CHAT_EXISTS = """SELECT EXISTS (SELECT 1 FROM chats WHERE chat_id = $1)"""
 
 QUERY_ADD_MESSAGE = """INSERT INTO messages (message_id, chat_id, role, content) VALUES ($1, $2, $3, $4)"""
-QUERY_GET_ALL_MESSAGES = """SELECT message_id, role, content FROM messages WHERE chat_id = $1"""
+QUERY_GET_ALL_MESSAGES = """SELECT message_id, role, content FROM messages WHERE chat_id = $1 ORDER BY created_at, message_id"""
+QUERY_GET_RECENT_MESSAGES = """
+    SELECT message_id, role, content, created_at FROM (
+        SELECT message_id, role, content, created_at FROM messages
+        WHERE chat_id = $1
+        ORDER BY created_at DESC, message_id DESC
+        LIMIT $2
+    ) AS recent
+    UNION
+    SELECT message_id, role, content, created_at FROM messages
+    WHERE chat_id = $1 AND role = 'system'
+    ORDER BY created_at, message_id
+"""
+QUERY_GET_MESSAGES_PAGE = """
+    SELECT message_id, role, content, created_at FROM messages
+    WHERE chat_id = $1
+    ORDER BY created_at DESC, message_id DESC
+    LIMIT $2
+"""
+QUERY_GET_MESSAGES_PAGE_BEFORE = """
+    SELECT message_id, role, content, created_at FROM messages
+    WHERE chat_id = $1 AND (created_at, message_id) < ($2, $3)
+    ORDER BY created_at DESC, message_id DESC
+    LIMIT $4
+"""
+QUERY_GET_MESSAGES_FOR_CHATS = """
+    SELECT message_id, chat_id, role, content, created_at FROM messages
+    WHERE chat_id = ANY($1::uuid[])
+    ORDER BY chat_id, created_at, message_id
+"""
 QUERY_EDIT_MESSAGE = """UPDATE messages SET content = $1 WHERE message_id = $2 AND chat_id = $3"""
 QUERY_DELETE_MESSAGE = """DELETE FROM messages WHERE message_id = $1 AND chat_id = $2"""
 
+QUERY_NOTIFY_INVALIDATION = """SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload"""
+
 
 COLD_STORAGE_MIGRATE_CHATS = """INSERT INTO cold_storage_chats (chat_id, user_id, title, created_at, model, is_active) 
-                            VALUES ($1, $2, $3, $4, $5, $6)"""
+                            VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (chat_id) DO NOTHING"""
 
 СOLD_STORAGE_MIGRATE_MESSAGES = """INSERT INTO cold_storage_messages (message_id, chat_id, role_compressed, content_compressed, created_at)
-                            VALUES ($1, $2, $3, $4, $5)"""
+                            VALUES ($1, $2, $3, $4, $5) ON CONFLICT (message_id) DO NOTHING"""
 
+# Archival of inactive chats (hot side)
+QUERY_GET_INACTIVE_CHATS = """
+    SELECT c.chat_id, c.user_id, c.title, c.created_at, c.model, c.is_active
+    FROM chats c
+    WHERE c.chat_id > $2
+      AND c.created_at < $1
+      AND NOT EXISTS (
+          SELECT 1 FROM messages m WHERE m.chat_id = c.chat_id AND m.created_at >= $1
+      )
+    ORDER BY c.chat_id
+"""
+QUERY_DELETE_ARCHIVED_CHATS = """
+    DELETE FROM chats c
+    WHERE c.chat_id = ANY($1::uuid[])
+      AND NOT EXISTS (
+          SELECT 1 FROM messages m WHERE m.chat_id = c.chat_id AND m.created_at >= $2
+      )
+    RETURNING c.chat_id
+"""
+QUERY_GET_CHATS_IN_HOT = """SELECT chat_id FROM chats WHERE chat_id = ANY($1::uuid[])"""
 
+# Archival of inactive chats (cold side)
+COLD_STORAGE_CREATE_STAGING = """
+    CREATE TEMP TABLE IF NOT EXISTS cold_storage_chats_staging
+        (LIKE cold_storage_chats) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS cold_storage_messages_staging
+        (LIKE cold_storage_messages) ON COMMIT DELETE ROWS;
+"""
+COLD_STORAGE_MERGE_STAGING_CHATS = """
+    INSERT INTO cold_storage_chats SELECT * FROM cold_storage_chats_staging
+        ON CONFLICT (chat_id) DO NOTHING
+"""
+COLD_STORAGE_MERGE_STAGING_MESSAGES = """
+    INSERT INTO cold_storage_messages SELECT * FROM cold_storage_messages_staging
+        ON CONFLICT (message_id) DO NOTHING
+"""
+COLD_STORAGE_GET_CHECKPOINT = """SELECT cutoff, last_chat_id, pending_chat_ids FROM cold_storage_checkpoints WHERE job = $1"""
+COLD_STORAGE_START_CHECKPOINT = """
+    INSERT INTO cold_storage_checkpoints (job, cutoff) VALUES ($1, $2)
+    RETURNING cutoff, last_chat_id, pending_chat_ids
+"""
+COLD_STORAGE_SAVE_CHECKPOINT = """
+    UPDATE cold_storage_checkpoints
+    SET last_chat_id = $2, pending_chat_ids = $3::uuid[], updated_at = NOW()
+    WHERE job = $1
+"""
+COLD_STORAGE_CLEAR_PENDING = """UPDATE cold_storage_checkpoints SET pending_chat_ids = '{}', updated_at = NOW() WHERE job = $1"""
+COLD_STORAGE_DELETE_CHECKPOINT = """DELETE FROM cold_storage_checkpoints WHERE job = $1"""
+
+# Reading archived chats back
+COLD_STORAGE_GET_CHAT = """SELECT chat_id, user_id, title, created_at, model, is_active FROM cold_storage_chats WHERE chat_id = $1"""
+COLD_STORAGE_GET_MESSAGES = """
+    SELECT message_id, role_compressed, content_compressed, created_at FROM cold_storage_messages
+    WHERE chat_id = $1
+    ORDER BY created_at, message_id
+"""
+COLD_STORAGE_DELETE_CHAT = """DELETE FROM cold_storage_chats WHERE chat_id = $1"""
+COLD_STORAGE_DELETE_CHATS = """DELETE FROM cold_storage_chats WHERE chat_id = ANY($1::uuid[])"""
+QUERY_RESTORE_CHAT = """
+    INSERT INTO chats (chat_id, user_id, title, created_at, model, is_active)
+    VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (chat_id) DO NOTHING
+"""
+QUERY_RESTORE_MESSAGE = """
+    INSERT INTO messages (message_id, chat_id, role, content, created_at)
+    VALUES ($1, $2, $3, $4, $5) ON CONFLICT (message_id) DO NOTHING
+"""
@@ -0,0 +1,100 @@
+"""Production entry point: run the API in one uvicorn worker process per core.
+
+Usage (from backend/):
+    python serve.py
+    SERVER_WORKERS=4 DB_MAX_CONNECTIONS=80 python serve.py
+
+SERVER_WORKERS defaults to the number of CPU cores: JSON encoding, request
+validation and response compression are CPU-bound and one process uses
+one core. Every worker opens its own asyncpg pools; with DB_MAX_CONNECTIONS
+and COLD_STORAGE_MAX_CONNECTIONS set, Config caps each worker's pool at its
+share of the budget, so workers * max_size stays within Postgres limits.
+With several workers, SERVER_MULTI_WORKER=1 is set for them, which turns
+on cross-worker cache invalidation under CACHE_INVALIDATION=auto; other
+ways of running the app (a single uvicorn process, tests) leave it off.
+uvloop and httptools are used when installed.
+
+On SIGTERM (or Ctrl+C) a worker reports 503 on /health/ready, stops
+accepting connections and gives in-flight requests, streamed generations
+included, up to SERVER_GRACEFUL_TIMEOUT seconds. It then waits for
+generations that outlived their request, flushes the write-behind queue
+and closes its pools.
+"""
+from uvicorn.supervisors import Multiprocess
+
+import config
+import importlib.util
+import logging
+import os
+import uvicorn
+
+APP = "app.api.v1.api:root"
+
+logger = logging.getLogger("serve")
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn Server that turns readiness off as soon as a stop signal arrives."""
+
+    def handle_exit(self, sig, frame) -> None:
+        from app.api.v1 import api
+
+        api.start_draining()
+        super().handle_exit(sig, frame)
+
+
+def build_config(cfg: config.Config) -> uvicorn.Config:
+    server = cfg.SERVER
+    return uvicorn.Config(
+        APP,
+        host=server["host"],
+        port=server["port"],
+        workers=server["workers"],
+        loop="uvloop" if _installed("uvloop") else "asyncio",
+        http="httptools" if _installed("httptools") else "h11",
+        backlog=server["backlog"],
+        timeout_keep_alive=server["keep_alive"],
+        timeout_graceful_shutdown=server["graceful_timeout"],
+        limit_concurrency=server["limit_concurrency"],
+        proxy_headers=True,
+        forwarded_allow_ips=server["forwarded_allow_ips"],
+        access_log=server["access_log"],
+        log_level=server["log_level"],
+        lifespan="on"
+    )
+
+
+def main() -> None:
+    cfg = config.Config()
+    if cfg.SERVER["workers"] > 1:
+        # Inherited by the spawned workers; reloading applies it to the settings logged below
+        os.environ["SERVER_MULTI_WORKER"] = "1"
+        cfg = importlib.reload(config).Config()
+
+    uvicorn_config = build_config(cfg)
+    server = DrainingServer(uvicorn_config)
+
+    logging.basicConfig(level=cfg.SERVER["log_level"].upper())
+    workers = uvicorn_config.workers
+    logger.info(
+        "Starting %d worker(s), loop=%s, http=%s, cache invalidation %s; "
+        "per-worker pools hot=%d cold=%d, at most %d + %d connections",
+        workers, uvicorn_config.loop, uvicorn_config.http,
+        "on" if cfg.CACHE_INVALIDATION["enabled"] else "off",
+        cfg.DB_POOL["max_size"], cfg.COLD_STORAGE_POOL["max_size"],
+        workers * cfg.DB_POOL["max_size"], workers * cfg.COLD_STORAGE_POOL["max_size"]
+    )
+
+    if workers > 1:
+        sock = uvicorn_config.bind_socket()
+        Multiprocess(uvicorn_config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,159 +1,491 @@
 from utils.utils import Utils
 from database.database import Database
+from database.cache import LRUCache
+from database.statements import StatementRegistry, named_queries
+from utils.metrics import Histogram
+from utils.tracing import trace_methods
 from queries import COLD_STORAGE_CREATE_TABLES, \
-    COLD_STORAGE_MIGRATE_CHATS, СOLD_STORAGE_MIGRATE_MESSAGES
+    СOLD_STORAGE_MIGRATE_MESSAGES, COLD_STORAGE_CREATE_STAGING, COLD_STORAGE_MERGE_STAGING_CHATS, \
+    COLD_STORAGE_MERGE_STAGING_MESSAGES, \
+    COLD_STORAGE_GET_CHECKPOINT, COLD_STORAGE_START_CHECKPOINT, COLD_STORAGE_SAVE_CHECKPOINT, COLD_STORAGE_CLEAR_PENDING, \
+    COLD_STORAGE_DELETE_CHECKPOINT, QUERY_GET_CHAT_BY_ID, QUERY_GET_MESSAGES_FOR_CHATS, QUERY_GET_INACTIVE_CHATS, \
+    QUERY_DELETE_ARCHIVED_CHATS, COLD_STORAGE_GET_CHAT, COLD_STORAGE_GET_MESSAGES, COLD_STORAGE_DELETE_CHAT, \
+    COLD_STORAGE_DELETE_CHATS, QUERY_GET_CHATS_IN_HOT, \
+    QUERY_RESTORE_CHAT, QUERY_RESTORE_MESSAGE
 
 from config import Config
 
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
 import asyncpg
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
 
 cfg = Config()
-db = Database(
-    host=cfg.DB_INFO["host"],
-    user=cfg.DB_INFO["user"],
-    password=cfg.DB_INFO["password"],
-    database=cfg.DB_INFO["database"]
-)
+utils = Utils(**cfg.COMPRESSION)
+
+CHAT_COLUMNS = ("chat_id", "user_id", "title", "created_at", "model", "is_active")
+MESSAGE_COLUMNS = ("message_id", "chat_id", "role_compressed", "content_compressed", "created_at")
+
 
+@trace_methods("cold_storage")
 class ColdStorage:
     """Cold storage class for storing."""
 
-    def __init__(self, host: str, user: str, password: str, database: str) -> None:
+    def __init__(self, host: str, user: str, password: str, database: str, db: Database,
+                 min_size: int = 1, max_size: int = 5,
+                 statement_cache_size: int = 100, acquire_timeout: float = 10.0,
+                 archive_cache: LRUCache = None, rewarm_after: int = 0) -> None:
         self.dsn = f"postgresql://{user}:{password}@{host}/{database}"
+        self.db = db
+        self.archive_cache = archive_cache if archive_cache is not None else LRUCache(max_size=256)
+        self.read_counts = LRUCache(max_size=self.archive_cache.max_size * 4)
+        self.rewarm_after = rewarm_after
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.acquire_timeout = acquire_timeout
+        self.statements = StatementRegistry(named_queries("COLD_STORAGE_", "СOLD_STORAGE_"))
+        self.pool_wait = Histogram()
+        self.pool = None
+
+    async def connect(self) -> asyncpg.Pool:
+        """Create the connection pool for the cold storage database.
 
-    async def connect(self) -> asyncpg.Connection:
-        """Connect to the PostgreSQL database.
-        
         Returns:
-            asyncpg.Connection: Active database connection
+            asyncpg.Pool: Active connection pool
         """
-        self.connection = await asyncpg.connect(dsn=self.dsn)
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                dsn=self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statements.cache_size(self.statement_cache_size),
+                connection_class=self.statements.connection_class
+            )
 
-        if not self.connection:
+        if not self.pool:
             raise ConnectionError("Failed to connect to the database")
-        
-        return self.connection
+
+        return self.pool
 
     async def close(self) -> None:
-        """Close the PostgreSQL connection."""
-        if self.connection:
-            await self.connection.close()
-            self.connection = None
+        """Close the cold storage connection pool and compression workers."""
+        utils.shutdown()
+
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Acquire a connection from the cold storage pool, recording the wait in `pool_wait`.
+
+        Raises:
+            ConnectionError: If the pool was not created with connect()
+        """
+        if self.pool is None:
+            raise ConnectionError("Cold storage pool is not initialized")
+
+        started = time.perf_counter()
+        async with self.pool.acquire(timeout=self.acquire_timeout) as connection:
+            self.pool_wait.observe(time.perf_counter() - started)
+            yield connection
 
     async def init_tables(self) -> bool:
         """Initialize the database (create tables)."""
         await self.connect()
 
         try:
-            await self.connection.execute(COLD_STORAGE_CREATE_TABLES)
+            async with self.acquire() as connection:
+                await connection.execute(COLD_STORAGE_CREATE_TABLES)
 
             return True
-        
+
         except asyncpg.exceptions.DuplicateTableError as e:
             raise ValueError("Table already exists") from e
-        
+
         except Exception as e:
             raise RuntimeError(f"Database error: {e}") from e
-        
-        finally:
-            await self.close()
 
 
     async def migrate_chats(self, chat_id: str) -> bool:
         """
-        Migrate chat data to cold storage.
-        
+        Migrate a chat and its messages to cold storage.
+
+        Queued write-behind messages of the chat are committed first, so
+        they are copied too. The chat is deleted from hot storage only after
+        the cold storage transaction has committed, and only if no message
+        was added since the copy started; otherwise it stays hot and the
+        copy is dropped.
+
         Args:
-            chats_data (str): Chat ID
-            
+            chat_id (str): Chat ID
+
         Returns:
-            bool: True if migration succeeded
+            bool: True if migration succeeded, False if the chat got new messages meanwhile
         """
-        await self.connect()
-        data = await db.get_chat_by_id(chat_id = chat_id)
-        print(data)
-
         try:
-            result = await db.delete_chat(chat_id = chat_id)
+            await self.db.wait_writes(chat_id)
+            cutoff = datetime.now(timezone.utc)
+
+            async with self.db.acquire() as hot:
+                chat = await hot.fetchrow(QUERY_GET_CHAT_BY_ID, chat_id)
+                if chat is None:
+                    raise ValueError("Chat not found in the database")
+
+                async with hot.transaction(readonly=True):
+                    await self._copy_batch(hot, [chat])
+
+            return bool(await self._delete_from_hot([chat["chat_id"]], cutoff))
 
-            if result:
-                return await self._execute_migration(
-                    data = data,
-                    query = COLD_STORAGE_MIGRATE_CHATS
-                )
-            else:
-                raise ValueError("Chat not found in the database")
-            
         except Exception as e:
             raise RuntimeError(f"Migration error: {e}") from e
-    
+
     async def migrate_messages(self, messages_data: dict) -> bool:
         """
         Migrate message data to cold storage.
-        
+
+        The message is deleted from hot storage only after it was written
+        to cold storage.
+
         Args:
             messages_data (dict): Message data in specific format
-            
+
         Returns:
             bool: True if migration succeeded
         """
-        await self.connect()
-
         try:
-            result = await db.delete_message(message_id=messages_data["message_id"])
+            role_compressed, content_compressed = await utils.async_compress_batch([
+                messages_data["role_compressed"],
+                messages_data["content_compressed"]
+            ])
 
-            if result:
-                return await self._execute_migration_with_compress(
-                    data=messages_data,
-                    query=СOLD_STORAGE_MIGRATE_MESSAGES
+            async with self.acquire() as connection:
+                await connection.execute(
+                    СOLD_STORAGE_MIGRATE_MESSAGES,
+                    messages_data["message_id"],
+                    messages_data["chat_id"],
+                    role_compressed,
+                    content_compressed,
+                    datetime.fromtimestamp(messages_data["created_at"], tz=timezone.utc)
                 )
-            else:
-                raise ValueError("Message not found in the database")
-            
+
+            return await self.db.delete_message(
+                message_id=messages_data["message_id"],
+                chat_id=messages_data["chat_id"]
+            )
+
         except Exception as e:
             raise RuntimeError(f"Migration error: {e}") from e
 
+    async def archive_inactive_chats(self, inactive_days: float = 30, batch_size: int = 500,
+                                     max_chats: int = None, job: str = "archive_inactive_chats") -> dict:
+        """
+        Move chats inactive for longer than a threshold (with their messages) to cold storage.
 
-    async def _execute_migration(self, data: dict, query: str) -> bool:
-        await self.connect()
+        Chats are streamed from hot storage with a server-side cursor in
+        batches; each batch is written to cold storage with COPY and merged in
+        one transaction together with the job checkpoint, and only then
+        deleted from hot storage. Queued write-behind messages of a batch are
+        committed before it is copied and again before it is deleted; a chat
+        that got a message newer than the cutoff meanwhile stays in hot
+        storage. An interrupted or limited run resumes from its checkpoint
+        (with the original cutoff) on the next call.
+
+        Args:
+            inactive_days (float): Inactivity threshold in days (ignored when resuming)
+            batch_size (int): Chats per batch
+            max_chats (int): Stop after this many chats and keep the checkpoint
+            job (str): Checkpoint name
+
+        Returns:
+            dict: Moved chats/messages, batches, elapsed seconds and rows_per_sec
+        """
+        started = time.perf_counter()
+        report = {"chats": 0, "messages": 0, "batches": 0}
 
         try:
-            print(list(data.values()))
-            result = await self.connection.execute(query, *list(data.values()))
+            checkpoint = await self._load_checkpoint(job, inactive_days)
+            if checkpoint["pending_chat_ids"]:
+                await self._delete_from_hot(checkpoint["pending_chat_ids"], checkpoint["cutoff"], job)
+
+            finished = True
+            last_chat_id = checkpoint["last_chat_id"] or uuid.UUID(int=0)
+
+            async with self.db.acquire() as hot:
+                async with hot.transaction(readonly=True):
+                    cursor = await hot.cursor(QUERY_GET_INACTIVE_CHATS, checkpoint["cutoff"], last_chat_id)
+
+                    while True:
+                        size = batch_size
+                        if max_chats is not None:
+                            size = min(size, max_chats - report["chats"])
+                            if size <= 0:
+                                finished = False
+                                break
+
+                        chats = await cursor.fetch(size)
+                        if not chats:
+                            break
+
+                        chat_ids = [chat["chat_id"] for chat in chats]
+                        await self._wait_writes(chat_ids)
+                        report["messages"] += await self._copy_batch(hot, chats, job=job,
+                                                                     cutoff=checkpoint["cutoff"])
+                        deleted = await self._delete_from_hot(chat_ids, checkpoint["cutoff"], job)
+
+                        report["chats"] += len(deleted)
+                        report["batches"] += 1
+
+            if finished:
+                async with self.acquire() as connection:
+                    await connection.execute(COLD_STORAGE_DELETE_CHECKPOINT, job)
 
-            return bool(result)
-        
         except Exception as e:
-            raise RuntimeError(f"Migration error: {e}") from e
-        
-        finally:
-            await self.close()
+            raise RuntimeError(f"Archive error: {e}") from e
+
+        elapsed = time.perf_counter() - started
+        report["finished"] = finished
+        report["elapsed"] = elapsed
+        report["rows_per_sec"] = (report["chats"] + report["messages"]) / elapsed if elapsed else 0.0
+        logger.info("Archived %d chats / %d messages in %.1fs (%.0f rows/sec)",
+                    report["chats"], report["messages"], elapsed, report["rows_per_sec"])
+
+        return report
 
-    async def _execute_migration_with_compress(self, data: dict, query: str) -> bool:
+    async def _load_checkpoint(self, job: str, inactive_days: float) -> asyncpg.Record:
+        """Get the checkpoint of a job, starting a new one if there is none."""
+        async with self.acquire() as connection:
+            checkpoint = await connection.fetchrow(COLD_STORAGE_GET_CHECKPOINT, job)
+            if checkpoint is None:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=inactive_days)
+                checkpoint = await connection.fetchrow(COLD_STORAGE_START_CHECKPOINT, job, cutoff)
+
+            return checkpoint
+
+    async def _copy_batch(self, hot: asyncpg.Connection, chats: list, job: str = None,
+                          cutoff: datetime = None, chunk_size: int = 2000) -> int:
         """
-        Shared migration logic
-        
+        COPY a batch of chats and their messages into cold storage in one transaction.
+
+        Messages are streamed from hot storage with a server-side cursor (the
+        caller holds a transaction on `hot`) and compressed chunk by chunk.
+        When a job is given, its checkpoint is advanced in the same transaction.
+
+        Returns:
+            int: Number of messages copied
+        """
+        chat_ids = [chat["chat_id"] for chat in chats]
+        copied = 0
+
+        async with self.acquire() as cold:
+            async with cold.transaction():
+                await cold.execute(COLD_STORAGE_CREATE_STAGING)
+                await cold.copy_records_to_table(
+                    "cold_storage_chats_staging",
+                    records=[tuple(chat[column] for column in CHAT_COLUMNS) for chat in chats],
+                    columns=CHAT_COLUMNS
+                )
+
+                chunk = []
+                async for message in hot.cursor(QUERY_GET_MESSAGES_FOR_CHATS, chat_ids, prefetch=chunk_size):
+                    chunk.append(message)
+                    if len(chunk) >= chunk_size:
+                        copied += await self._copy_messages(cold, chunk)
+                        chunk = []
+
+                if chunk:
+                    copied += await self._copy_messages(cold, chunk)
+
+                await cold.execute(COLD_STORAGE_MERGE_STAGING_CHATS)
+                await cold.execute(COLD_STORAGE_MERGE_STAGING_MESSAGES)
+
+                if job is not None:
+                    await cold.execute(COLD_STORAGE_SAVE_CHECKPOINT, job, chat_ids[-1], chat_ids)
+
+        return copied
+
+    async def _copy_messages(self, cold: asyncpg.Connection, messages: list) -> int:
+        """Compress a chunk of messages and COPY it into the staging table."""
+        compressed = await utils.async_compress_batch([
+            value for message in messages for value in (message["role"], message["content"])
+        ])
+
+        await cold.copy_records_to_table(
+            "cold_storage_messages_staging",
+            records=[
+                (message["message_id"], message["chat_id"],
+                 compressed[2 * index], compressed[2 * index + 1], message["created_at"])
+                for index, message in enumerate(messages)
+            ],
+            columns=MESSAGE_COLUMNS
+        )
+
+        return len(messages)
+
+    async def _wait_writes(self, chat_ids: list) -> None:
+        """Wait until the queued write-behind messages of these chats are committed."""
+        for chat_id in chat_ids:
+            await self.db.wait_writes(chat_id)
+
+    async def _delete_from_hot(self, chat_ids: list, cutoff: datetime, job: str = None) -> list:
+        """
+        Delete copied chats (messages cascade) from hot storage unless they have messages since `cutoff`.
+
+        Chats that stay in hot storage have their cold copy dropped, so a
+        later archive run copies their current messages (chats deleted by an
+        earlier, interrupted call keep theirs). The pending chats of the
+        job's checkpoint are cleared.
+
+        Returns:
+            list: IDs of the deleted chats
+        """
+        await self._wait_writes(chat_ids)
+        async with self.db.acquire() as connection:
+            rows = await connection.fetch(QUERY_DELETE_ARCHIVED_CHATS, chat_ids, cutoff)
+            deleted = [row["chat_id"] for row in rows]
+            await self.db.publish_invalidation("messages", [str(chat_id) for chat_id in deleted], connection)
+
+            kept = []
+            if len(deleted) < len(chat_ids):
+                kept = [row["chat_id"] for row in await connection.fetch(QUERY_GET_CHATS_IN_HOT, chat_ids)]
+
+        for chat_id in deleted:
+            self.db.message_cache.invalidate(str(chat_id))
+
+        async with self.acquire() as connection:
+            if kept:
+                await connection.execute(COLD_STORAGE_DELETE_CHATS, kept)
+            if job is not None:
+                await connection.execute(COLD_STORAGE_CLEAR_PENDING, job)
+
+        return deleted
+
+    async def get_archived_chat(self, chat_id: str) -> dict:
+        """
+        Read an archived chat with its decompressed messages.
+
+        Messages are decompressed in parallel on the compression workers and
+        the result is kept in an LRU cache. Once a chat was read
+        `rewarm_after` times it is moved back to hot storage (0 disables this).
+
         Args:
-            data: Data to migrate
-            query: SQL query to execute
-        
+            chat_id (str): Chat ID
+
         Returns:
-            bool: Migration status
+            dict: {"chat": chat fields, "messages": messages in chronological order},
+                or None if the chat is not archived
         """
-        await self.connect()
-        utils = Utils()
-        
-        try:            
-            compressed_data = await utils.async_compress(data)
-            result = await self.connection.execute(query, compressed_data.items())
-
-            return bool(result)
-        
-        except Exception as e:
-            raise RuntimeError(f"Migration error: {e}") from e
-        
+        archived = await self._read_archive(chat_id)
+
+        if archived is not None and self.rewarm_after:
+            key = str(chat_id)
+            reads = self.read_counts.get(key, 0) + 1
+            self.read_counts.set(key, reads)
+
+            if reads >= self.rewarm_after:
+                await self.rewarm_chat(chat_id)
+
+        return archived
+
+    async def _read_archive(self, chat_id: str) -> dict:
+        """Fetch and decompress an archived chat, through the archive cache."""
+        key = str(chat_id)
+        archived = self.archive_cache.get(key)
+        if archived is not None:
+            return archived
+
+        token = self.archive_cache.reserve(key)
+        try:
+            archived = await self._fetch_archive(chat_id)
+            if archived is not None:
+                self.archive_cache.fill(key, archived, token)
+            return archived
+
         finally:
-            await self.close()
+            self.archive_cache.release(key, token)
+
+    async def _fetch_archive(self, chat_id: str) -> dict:
+        """Read an archived chat and its decompressed messages from cold storage (None if not archived)."""
+        try:
+            async with self.acquire() as connection:
+                chat = await connection.fetchrow(COLD_STORAGE_GET_CHAT, chat_id)
+                if chat is None:
+                    return None
+
+                rows = await connection.fetch(COLD_STORAGE_GET_MESSAGES, chat_id)
+
+            values = await utils.async_decompress_batch([
+                blob for row in rows for blob in (row["role_compressed"], row["content_compressed"])
+            ])
+
+        except Exception as e:
+            raise RuntimeError(f"Cold storage read error: {e}") from e
+
+        return {
+            "chat": dict(chat),
+            "messages": [
+                {"message_id": row["message_id"], "role": values[2 * index],
+                 "content": values[2 * index + 1], "created_at": row["created_at"]}
+                for index, row in enumerate(rows)
+            ]
+        }
 
+    async def get_archived_messages(self, chat_id: str) -> list:
+        """Get the decompressed messages of an archived chat ([] if it is not archived)."""
+        archived = await self.get_archived_chat(chat_id)
+        return archived["messages"] if archived else []
+
+    async def rewarm_chat(self, chat_id: str) -> bool:
+        """
+        Move an archived chat and its messages back to hot storage.
+
+        The chat is deleted from cold storage only after the hot storage
+        transaction has committed.
+
+        Args:
+            chat_id (str): Chat ID
+
+        Returns:
+            bool: True if the chat was moved, False if it is not archived
+        """
+        key = str(chat_id)
+
+        try:
+            archived = await self._read_archive(chat_id)
+            if archived is None:
+                return False
+
+            chat = archived["chat"]
+            async with self.db.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute(
+                        QUERY_RESTORE_CHAT,
+                        *[chat[column] for column in CHAT_COLUMNS]
+                    )
+                    await connection.executemany(
+                        QUERY_RESTORE_MESSAGE,
+                        [
+                            (message["message_id"], chat["chat_id"], message["role"],
+                             message["content"], message["created_at"])
+                            for message in archived["messages"]
+                        ]
+                    )
+                await self.db.publish_invalidation("messages", [key], connection)
+
+            async with self.acquire() as connection:
+                await connection.execute(COLD_STORAGE_DELETE_CHAT, chat_id)
+            await self.db.publish_invalidation("archive", [key])
+
+        except Exception as e:
+            raise RuntimeError(f"Rewarm error: {e}") from e
 
-        
\ No newline at end of file
+        self.archive_cache.invalidate(key)
+        self.read_counts.invalidate(key)
+        self.db.message_cache.invalidate(key)
+        return True
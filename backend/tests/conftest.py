@@ -0,0 +1,35 @@
+from database.database import Database
+from database.write_behind import WriteBehindQueue
+from storage.storage import ColdStorage
+from fakes import FakePostgres
+
+import pytest
+
+
+@pytest.fixture
+def postgres():
+    return FakePostgres()
+
+
+@pytest.fixture
+def db(postgres):
+    db = Database(host="fake", user="fake", password="fake", database="fake")
+    db.pool = postgres.pool()
+    return db
+
+
+@pytest.fixture
+def storage(postgres, db):
+    storage = ColdStorage(host="fake", user="fake", password="fake", database="fake", db=db)
+    storage.pool = postgres.pool()
+    db.cold_storage = storage
+    return storage
+
+
+@pytest.fixture
+async def writes(db):
+    writes = WriteBehindQueue(db)
+    db.write_queue = writes
+    await writes.start()
+    yield writes
+    await writes.close()
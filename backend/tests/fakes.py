@@ -0,0 +1,296 @@
+"""In-memory Postgres double for the Database, WriteBehindQueue and ColdStorage tests.
+
+FakePostgres answers the queries of queries.py these classes send, looked
+up by their text, and keeps the constraints the code relies on (foreign
+keys, unique message ids), so tests run the real control flow: cache fill
+tokens, write-behind batches, hot/cold fallthrough. A query it does not
+know fails the test. `calls` lists the query names in order, and `hooks`
+runs a coroutine right before the next call of a query, to interleave a
+concurrent write with a read.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+import queries
+
+NAMES = {value: name for name, value in vars(queries).items() if name.isupper() and isinstance(value, str)}
+
+
+class FakePostgres:
+    """Hot (chats, messages) and cold (cold_storage_*) tables of one test."""
+
+    def __init__(self) -> None:
+        self.chats = {}
+        self.messages = {}
+        self.cold_chats = {}
+        self.cold_messages = {}
+        self.staging_chats = []
+        self.staging_messages = []
+        self.checkpoints = {}
+        self.calls = []
+        self.hooks = {}
+        self._last_now = datetime.now(timezone.utc)
+
+    def now(self) -> datetime:
+        """clock_timestamp(), strictly increasing so rows keep their insert order."""
+        self._last_now = max(datetime.now(timezone.utc), self._last_now + timedelta(microseconds=1))
+        return self._last_now
+
+    def add_chat(self, chat_id: str, user_id: int = 1, created_at: datetime = None) -> None:
+        self.chats[str(chat_id)] = {
+            "chat_id": str(chat_id), "user_id": user_id, "title": "chat", "created_at": created_at or self.now(),
+            "model": "llama3.1", "is_active": True
+        }
+
+    def add_message(self, message_id: str, chat_id: str, role: str, content: str,
+                    created_at: datetime = None) -> None:
+        if str(chat_id) not in self.chats:
+            raise asyncpg.ForeignKeyViolationError(f'chat {chat_id} is not present in table "chats"')
+        if str(message_id) in self.messages:
+            raise asyncpg.UniqueViolationError(f"message {message_id} already exists")
+
+        self.messages[str(message_id)] = {
+            "message_id": str(message_id), "chat_id": str(chat_id), "role": role, "content": content,
+            "created_at": created_at or self.now()
+        }
+
+    def chat_messages(self, chat_id: str) -> list:
+        return sorted(
+            (row for row in self.messages.values() if row["chat_id"] == str(chat_id)),
+            key=lambda row: (row["created_at"], row["message_id"])
+        )
+
+    def pool(self) -> "FakePool":
+        return FakePool(self)
+
+    # Queries, by constant name: rows (a list of dicts) or a status string
+
+    def QUERY_GET_ALL_MESSAGES(self, chat_id):
+        return [
+            {"message_id": row["message_id"], "role": row["role"], "content": row["content"]}
+            for row in self.chat_messages(chat_id)
+        ]
+
+    def QUERY_ADD_MESSAGE(self, message_id, chat_id, role, content):
+        self.add_message(message_id, chat_id, role, content)
+        return "INSERT 0 1"
+
+    def QUERY_CHAT_EXISTS(self, chat_id):
+        return [{"exists": str(chat_id) in self.chats}]
+
+    def QUERY_GET_CHAT_BY_ID(self, chat_id):
+        chat = self.chats.get(str(chat_id))
+        return [dict(chat)] if chat else []
+
+    def QUERY_DELETE_CHAT(self, chat_id):
+        self._delete_hot_chats([str(chat_id)])
+        return "DELETE 1"
+
+    def QUERY_DELETE_ARCHIVED_CHATS(self, chat_ids, cutoff):
+        chat_ids = [
+            str(chat_id) for chat_id in chat_ids
+            if not any(row["created_at"] >= cutoff for row in self.chat_messages(chat_id))
+        ]
+        return [{"chat_id": chat_id} for chat_id in chat_ids if self._delete_hot_chats([chat_id])]
+
+    def QUERY_GET_CHATS_IN_HOT(self, chat_ids):
+        return [{"chat_id": str(chat_id)} for chat_id in chat_ids if str(chat_id) in self.chats]
+
+    def QUERY_GET_INACTIVE_CHATS(self, cutoff, last_chat_id):
+        return [
+            dict(chat) for chat_id, chat in sorted(self.chats.items())
+            if chat_id > str(last_chat_id) and chat["created_at"] < cutoff
+            and not any(row["created_at"] >= cutoff for row in self.chat_messages(chat_id))
+        ]
+
+    def _delete_hot_chats(self, chat_ids: list) -> int:
+        deleted = [chat_id for chat_id in chat_ids if self.chats.pop(chat_id, None) is not None]
+        self.messages = {key: row for key, row in self.messages.items() if row["chat_id"] not in chat_ids}
+        return len(deleted)
+
+    def QUERY_GET_MESSAGES_PAGE(self, chat_id, limit):
+        return self.QUERY_GET_MESSAGES_PAGE_BEFORE(chat_id, None, None, limit)
+
+    def QUERY_GET_MESSAGES_PAGE_BEFORE(self, chat_id, created_at, message_id, limit):
+        rows = [
+            {key: row[key] for key in ("message_id", "role", "content", "created_at")}
+            for row in reversed(self.chat_messages(chat_id))
+            if created_at is None or (row["created_at"], row["message_id"]) < (created_at, message_id)
+        ]
+        return rows[:limit]
+
+    def QUERY_GET_MESSAGES_FOR_CHATS(self, chat_ids):
+        chat_ids = [str(chat_id) for chat_id in chat_ids]
+        return [row for chat_id in sorted(chat_ids) for row in self.chat_messages(chat_id)]
+
+    def QUERY_RESTORE_CHAT(self, chat_id, user_id, title, created_at, model, is_active):
+        if str(chat_id) not in self.chats:
+            self.add_chat(chat_id, user_id, created_at)
+        return "INSERT 0 1"
+
+    def QUERY_RESTORE_MESSAGE(self, message_id, chat_id, role, content, created_at):
+        if str(message_id) not in self.messages:
+            self.add_message(message_id, chat_id, role, content, created_at)
+        return "INSERT 0 1"
+
+    def COLD_STORAGE_CREATE_STAGING(self):
+        return "CREATE TABLE"
+
+    def copy_cold_storage_chats_staging(self, records, columns):
+        self.staging_chats += [dict(zip(columns, record)) for record in records]
+        return f"COPY {len(records)}"
+
+    def copy_cold_storage_messages_staging(self, records, columns):
+        self.staging_messages += [dict(zip(columns, record)) for record in records]
+        return f"COPY {len(records)}"
+
+    def COLD_STORAGE_MERGE_STAGING_CHATS(self):
+        for row in self.staging_chats:
+            self.cold_chats.setdefault(str(row["chat_id"]), row)
+        self.staging_chats = []
+        return "INSERT 0"
+
+    def COLD_STORAGE_MERGE_STAGING_MESSAGES(self):
+        for row in self.staging_messages:
+            assert str(row["chat_id"]) in self.cold_chats, "cold_storage_messages_chat_id_fkey"
+            self.cold_messages.setdefault(str(row["message_id"]), row)
+        self.staging_messages = []
+        return "INSERT 0"
+
+    def COLD_STORAGE_GET_CHECKPOINT(self, job):
+        checkpoint = self.checkpoints.get(job)
+        return [dict(checkpoint)] if checkpoint else []
+
+    def COLD_STORAGE_START_CHECKPOINT(self, job, cutoff):
+        self.checkpoints[job] = {"cutoff": cutoff, "last_chat_id": None, "pending_chat_ids": []}
+        return [dict(self.checkpoints[job])]
+
+    def COLD_STORAGE_SAVE_CHECKPOINT(self, job, last_chat_id, pending_chat_ids):
+        self.checkpoints[job].update(last_chat_id=last_chat_id, pending_chat_ids=list(pending_chat_ids))
+        return "UPDATE 1"
+
+    def COLD_STORAGE_CLEAR_PENDING(self, job):
+        self.checkpoints[job]["pending_chat_ids"] = []
+        return "UPDATE 1"
+
+    def COLD_STORAGE_DELETE_CHECKPOINT(self, job):
+        self.checkpoints.pop(job, None)
+        return "DELETE 1"
+
+    def COLD_STORAGE_DELETE_CHATS(self, chat_ids):
+        for chat_id in chat_ids:
+            self.COLD_STORAGE_DELETE_CHAT(chat_id)
+        return f"DELETE {len(chat_ids)}"
+
+    def COLD_STORAGE_GET_CHAT(self, chat_id):
+        chat = self.cold_chats.get(str(chat_id))
+        return [dict(chat)] if chat else []
+
+    def COLD_STORAGE_GET_MESSAGES(self, chat_id):
+        return sorted(
+            (row for row in self.cold_messages.values() if str(row["chat_id"]) == str(chat_id)),
+            key=lambda row: (row["created_at"], str(row["message_id"]))
+        )
+
+    def COLD_STORAGE_DELETE_CHAT(self, chat_id):
+        self.cold_chats.pop(str(chat_id), None)
+        self.cold_messages = {
+            key: row for key, row in self.cold_messages.items() if str(row["chat_id"]) != str(chat_id)
+        }
+        return "DELETE 1"
+
+    def copy_messages(self, records, columns):
+        rows = [dict(zip(columns, record)) for record in records]
+        for row in rows:
+            if str(row["chat_id"]) not in self.chats:
+                raise asyncpg.ForeignKeyViolationError(f'chat {row["chat_id"]} is not present in table "chats"')
+        for row in rows:
+            self.add_message(**row)
+        return f"COPY {len(rows)}"
+
+
+class FakeConnection:
+    def __init__(self, postgres: FakePostgres) -> None:
+        self.postgres = postgres
+
+    async def _run(self, query: str, *args):
+        name = NAMES.get(query)
+        assert name is not None, f"Unexpected query: {query}"
+        self.postgres.calls.append(name)
+
+        hook = self.postgres.hooks.pop(name, None)
+        if hook is not None:
+            await hook()
+        return getattr(self.postgres, name)(*args)
+
+    async def fetch(self, query: str, *args) -> list:
+        return await self._run(query, *args)
+
+    async def fetchrow(self, query: str, *args):
+        rows = await self._run(query, *args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, query: str, *args):
+        row = await self.fetchrow(query, *args)
+        return next(iter(row.values())) if row else None
+
+    async def execute(self, query: str, *args) -> str:
+        return await self._run(query, *args)
+
+    async def executemany(self, query: str, args: list) -> None:
+        saved = dict(self.postgres.chats), dict(self.postgres.messages)
+        try:
+            for values in args:
+                await self._run(query, *values)
+        except Exception:
+            self.postgres.chats, self.postgres.messages = saved
+            raise
+
+    async def copy_records_to_table(self, table: str, records: list, columns: list) -> str:
+        self.postgres.calls.append(f"COPY {table}")
+        return getattr(self.postgres, f"copy_{table}")(records, columns)
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield
+
+    def cursor(self, query: str, *args, prefetch: int = None) -> "FakeCursor":
+        return FakeCursor(self, query, args)
+
+
+class FakeCursor:
+    """Server-side cursor: `await` it for fetch(n), or iterate it with `async for`."""
+
+    def __init__(self, connection: FakeConnection, query: str, args: tuple) -> None:
+        self.connection = connection
+        self.query = query
+        self.args = args
+        self.rows = None
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def _open(self) -> "FakeCursor":
+        self.rows = await self.connection._run(self.query, *self.args)
+        return self
+
+    async def __aiter__(self):
+        for row in await self.connection._run(self.query, *self.args):
+            yield row
+
+    async def fetch(self, size: int) -> list:
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+class FakePool:
+    def __init__(self, postgres: FakePostgres) -> None:
+        self.postgres = postgres
+
+    @asynccontextmanager
+    async def acquire(self, timeout: float = None):
+        yield FakeConnection(self.postgres)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+from database.write_behind import WriteBehindQueue
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CHAT_ID = "8c1e5a7b-2d4f-4a6c-9e8b-0d2f4a6c8e05"
+OTHER_CHAT_ID = "9d2f6b8c-3e5a-4b7d-8f9c-1e3a5b7d9f06"
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=60)
+
+
+@pytest.fixture
+async def queued_writes(db):
+    # Rows wait for their batch long enough to still be queued when the archive starts
+    writes = WriteBehindQueue(db, durability="async", max_latency=0.2)
+    db.write_queue = writes
+    await writes.start()
+    yield writes
+    await writes.close()
+
+
+def cold_message_ids(postgres, chat_id: str) -> list:
+    return [str(row["message_id"]) for row in postgres.COLD_STORAGE_GET_MESSAGES(chat_id)]
+
+
+async def test_migrate_copies_queued_messages_first(postgres, storage, queued_writes):
+    postgres.add_chat(CHAT_ID)
+    postgres.add_message("m1", CHAT_ID, "user", "hi")
+    await queued_writes.add_message("m2", CHAT_ID, "assistant", "queued")
+
+    assert await storage.migrate_chats(CHAT_ID)
+
+    assert CHAT_ID not in postgres.chats
+    assert cold_message_ids(postgres, CHAT_ID) == ["m1", "m2"]
+    assert queued_writes.failed_rows == 0
+
+
+async def test_migrate_keeps_a_chat_that_got_a_message_during_the_copy(postgres, storage):
+    postgres.add_chat(CHAT_ID)
+    postgres.add_message("m1", CHAT_ID, "user", "hi")
+
+    async def concurrent_message():
+        postgres.add_message("m2", CHAT_ID, "user", "written by another worker")
+
+    postgres.hooks["QUERY_DELETE_ARCHIVED_CHATS"] = concurrent_message
+
+    assert not await storage.migrate_chats(CHAT_ID)
+    assert [row["message_id"] for row in postgres.chat_messages(CHAT_ID)] == ["m1", "m2"]
+    assert CHAT_ID not in postgres.cold_chats
+
+
+async def test_archive_keeps_an_inactive_chat_with_queued_messages(postgres, storage, queued_writes):
+    for chat_id in (CHAT_ID, OTHER_CHAT_ID):
+        postgres.add_chat(chat_id, created_at=LONG_AGO)
+        postgres.add_message(f"{chat_id}-m1", chat_id, "user", "hi", created_at=LONG_AGO)
+    await queued_writes.add_message("m2", CHAT_ID, "user", "back again")
+
+    report = await storage.archive_inactive_chats(inactive_days=30)
+
+    assert report["chats"] == 1 and report["finished"]
+    assert [row["message_id"] for row in postgres.chat_messages(CHAT_ID)] == [f"{CHAT_ID}-m1", "m2"]
+    assert CHAT_ID not in postgres.cold_chats
+    assert OTHER_CHAT_ID not in postgres.chats
+    assert cold_message_ids(postgres, OTHER_CHAT_ID) == [f"{OTHER_CHAT_ID}-m1"]
+    assert queued_writes.failed_rows == 0
+    assert postgres.checkpoints == {}
+
+
+async def test_resumed_archive_keeps_copies_of_chats_deleted_before_the_interruption(postgres, storage):
+    postgres.add_chat(CHAT_ID, created_at=LONG_AGO)
+    postgres.add_message("m1", CHAT_ID, "user", "hi", created_at=LONG_AGO)
+    assert await storage.migrate_chats(CHAT_ID)
+    postgres.checkpoints["archive_inactive_chats"] = {
+        "cutoff": datetime.now(timezone.utc) - timedelta(days=30),
+        "last_chat_id": CHAT_ID,
+        "pending_chat_ids": [CHAT_ID]
+    }
+
+    await storage.archive_inactive_chats(inactive_days=30)
+
+    assert cold_message_ids(postgres, CHAT_ID) == ["m1"]
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from neuro.backends import BackendPool, BackendUnavailableError
+from neuro.model_stream import ModelRegistry
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+MODEL = "llama3.1"
+
+
+class FakeClient:
+    """Ollama client of a host that is down until `up` is set."""
+
+    def __init__(self, up: bool = False) -> None:
+        self.up = up
+
+    async def _answer(self, response):
+        if not self.up:
+            raise ConnectionError("connection refused")
+        return response
+
+    def list(self):
+        return self._answer(SimpleNamespace(models=[SimpleNamespace(model=f"{MODEL}:latest")]))
+
+    def ps(self):
+        return self._answer(SimpleNamespace(models=[]))
+
+    def chat(self, **kwargs):
+        return self._answer(SimpleNamespace(message=SimpleNamespace(content="hi"), eval_duration=0))
+
+
+@pytest.fixture
+def pool():
+    pool = BackendPool(["http://ollama-1:11434", "http://ollama-2:11434"])
+    for backend in pool.backends:
+        backend.client = FakeClient()
+    return pool
+
+
+async def test_all_hosts_down_is_unavailable_not_unsupported(pool):
+    await pool.check()
+
+    assert not pool.discovered
+    model = ModelRegistry(pool).get(MODEL)
+    with pytest.raises(BackendUnavailableError):
+        await model.generate_answer([{"role": "user", "content": "hi"}])
+
+
+async def test_models_are_known_once_a_host_answered(pool):
+    pool.backends[1].client.up = True
+    await pool.check()
+
+    assert pool.discovered
+    assert pool.supports(MODEL) and not pool.supports("mistral")
+    assert await ModelRegistry(pool).get(MODEL).generate_answer([{"role": "user", "content": "hi"}]) == "hi"
+
+    pool.backends[1].client.up = False
+    await pool.check()
+
+    assert pool.supports(MODEL)
+    with pytest.raises(BackendUnavailableError):
+        pool.pick(MODEL)
@@ -0,0 +1,53 @@
+from database.database import ChatNotFoundError, utils
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CHAT_ID = "0b7d3c8e-51a4-4f0e-8e38-6c2b9a7d1e02"
+
+
+@pytest.fixture
+async def archived_chat(postgres, storage):
+    postgres.add_chat(CHAT_ID)
+    postgres.add_message("m1", CHAT_ID, "user", "hi")
+    postgres.add_message("m2", CHAT_ID, "assistant", "hello")
+    await storage.migrate_chats(CHAT_ID)
+    assert CHAT_ID not in postgres.chats
+
+
+async def test_chat_turn_on_an_archived_chat_moves_it_back_to_hot(postgres, db, storage, writes, archived_chat):
+    history = await db.get_recent_messages(CHAT_ID, limit=50)
+    await writes.add_message("m3", CHAT_ID, "user", "still there?")
+    await writes.wait(CHAT_ID)
+
+    assert [msg["content"] for msg in history] == ["hi", "hello"]
+    assert CHAT_ID in postgres.chats and CHAT_ID not in postgres.cold_chats
+    assert [row["message_id"] for row in postgres.chat_messages(CHAT_ID)] == ["m1", "m2", "m3"]
+    assert writes.failed_rows == 0
+
+
+async def test_chat_turn_on_an_unknown_chat_is_not_found(postgres, db, storage):
+    with pytest.raises(ChatNotFoundError):
+        await db.get_recent_messages(CHAT_ID, limit=50)
+
+
+async def test_archived_chat_pages_come_from_cold_storage(postgres, db, storage, archived_chat):
+    page, next_cursor = await db.get_messages_page(CHAT_ID, limit=1)
+    older, last_cursor = await db.get_messages_page(CHAT_ID, limit=1, cursor=next_cursor)
+
+    assert [msg["content"] for msg in page + older] == ["hello", "hi"]
+    assert last_cursor is None
+    assert CHAT_ID in postgres.cold_chats
+
+
+async def test_empty_pages_of_a_live_chat_do_not_read_cold_storage(postgres, db, storage):
+    postgres.add_chat(CHAT_ID)
+    assert await db.get_messages_page(CHAT_ID, limit=10) == ([], None)
+
+    postgres.add_message("m1", CHAT_ID, "user", "hi")
+    oldest = postgres.chat_messages(CHAT_ID)[0]
+    cursor = utils.encode_cursor(oldest["created_at"], oldest["message_id"])
+    assert await db.get_messages_page(CHAT_ID, limit=10, cursor=cursor) == ([], None)
+
+    assert "COLD_STORAGE_GET_CHAT" not in postgres.calls
@@ -0,0 +1,36 @@
+from os import cpu_count
+
+import config
+import importlib
+import pytest
+
+
+@pytest.fixture
+def load_config(monkeypatch):
+    def load(**env) -> config.Config:
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(config).Config
+
+    yield load
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+def test_single_process_gets_the_whole_budget(load_config, monkeypatch):
+    monkeypatch.delenv("SERVER_MULTI_WORKER", raising=False)
+    cfg = load_config(SERVER_WORKERS="4", DB_MAX_CONNECTIONS="40", DB_POOL_MAX_SIZE="100",
+                      CACHE_INVALIDATION="false", COMPRESSION_WORKERS="0")
+
+    assert cfg.PROCESSES == 1
+    assert cfg.DB_POOL["max_size"] == 40
+    assert cfg.COMPRESSION["workers"] == (cpu_count() or 1)
+
+
+def test_serve_workers_share_the_budget_and_the_cores(load_config):
+    cfg = load_config(SERVER_WORKERS="4", SERVER_MULTI_WORKER="1", DB_MAX_CONNECTIONS="40",
+                      DB_POOL_MAX_SIZE="100", CACHE_INVALIDATION="false", COMPRESSION_WORKERS="0")
+
+    assert cfg.PROCESSES == 4
+    assert cfg.DB_POOL["max_size"] == 10
+    assert cfg.COMPRESSION["workers"] == max(1, (cpu_count() or 1) // 4)
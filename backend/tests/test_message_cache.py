@@ -0,0 +1,57 @@
+from database.invalidation import InvalidationBus
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CHAT_ID = "6f1c9a52-8a5e-4c59-9d0e-2f1d1b7c0a01"
+
+
+@pytest.fixture(autouse=True)
+def chat(postgres):
+    postgres.add_chat(CHAT_ID)
+    postgres.add_message("m1", CHAT_ID, "system", "be brief")
+    postgres.add_message("m2", CHAT_ID, "user", "hi")
+    postgres.add_message("m3", CHAT_ID, "assistant", "hello")
+
+
+async def test_second_chat_turn_is_served_from_the_cache(postgres, db, writes):
+    first = await db.get_recent_messages(CHAT_ID, limit=50)
+    await writes.add_messages(CHAT_ID, [{"message_id": "m4", "role": "user", "content": "how are you?"}])
+    await writes.add_message("m5", CHAT_ID, "assistant", "fine")
+    second = await db.get_recent_messages(CHAT_ID, limit=50)
+    await writes.wait()
+
+    assert [msg["message_id"] for msg in first] == ["m1", "m2", "m3"]
+    assert [msg["message_id"] for msg in second] == ["m1", "m2", "m3", "m4", "m5"]
+    assert postgres.calls.count("QUERY_GET_ALL_MESSAGES") == 1
+    assert db.message_cache.stats()["hits"] == 1
+    assert [row["message_id"] for row in postgres.chat_messages(CHAT_ID)] == ["m1", "m2", "m3", "m4", "m5"]
+
+
+async def test_recent_messages_keep_system_messages_outside_the_limit(db):
+    recent = await db.get_recent_messages(CHAT_ID, limit=1)
+
+    assert [msg["message_id"] for msg in recent] == ["m1", "m3"]
+
+
+async def test_write_during_a_miss_cancels_the_fill(postgres, db):
+    async def concurrent_write():
+        db.message_cache.invalidate(CHAT_ID)
+
+    postgres.hooks["QUERY_GET_ALL_MESSAGES"] = concurrent_write
+    await db.get_recent_messages(CHAT_ID, limit=50)
+
+    assert len(db.message_cache) == 0
+    await db.get_recent_messages(CHAT_ID, limit=50)
+    assert len(db.message_cache) == 1
+
+
+async def test_remote_invalidation_evicts_the_cached_history(postgres, db):
+    bus = InvalidationBus(db, caches={"messages": db.message_cache})
+    await db.get_recent_messages(CHAT_ID, limit=50)
+
+    bus._on_notify(None, 0, bus.channel, f"other-worker:1:messages:{CHAT_ID}")
+    await db.get_recent_messages(CHAT_ID, limit=50)
+
+    assert postgres.calls.count("QUERY_GET_ALL_MESSAGES") == 2
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from neuro.backends import BackendPool
+from neuro.warmup import ModelWarmer
+
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+MODEL = "llama3.1"
+
+
+class FakeClient:
+    """Ollama client whose preloads fail until `up` is set."""
+
+    def __init__(self, up: bool = True) -> None:
+        self.up = up
+
+    async def ps(self):
+        return SimpleNamespace(models=[])
+
+    async def pull(self, model: str) -> None:
+        if not self.up:
+            raise ConnectionError("pull failed")
+
+    async def generate(self, **kwargs) -> None:
+        if not self.up:
+            raise ConnectionError("preload failed")
+
+
+@pytest.fixture
+def pool():
+    pool = BackendPool(["http://ollama-1:11434", "http://ollama-2:11434"])
+    for backend in pool.backends:
+        backend.client = FakeClient(up=False)
+        backend.healthy = True
+    return pool
+
+
+async def let_warmer_run(passes: int = 1) -> None:
+    """Give the warm-up loop (interval 0) time for a few passes against the fake clients."""
+    for _ in range(passes * 10):
+        await asyncio.sleep(0)
+
+
+async def test_failed_warmup_pass_does_not_report_warm(pool):
+    warmer = ModelWarmer(pool, [MODEL], interval=0)
+    await warmer.start()
+    await let_warmer_run()
+
+    assert not warmer.warmed.is_set()
+    cold = warmer.cold_models()
+    assert set(cold) == {MODEL}
+    assert {entry["state"] for entry in cold[MODEL].values()} == {"error"}
+    assert cold[MODEL]["http://ollama-1:11434"]["error"] == "pull failed"
+
+    pool.backends[1].client.up = True
+    await let_warmer_run(passes=2)
+    await warmer.close()
+
+    assert warmer.warmed.is_set()
+    assert warmer.cold_models() == {}
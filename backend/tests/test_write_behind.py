@@ -0,0 +1,70 @@
+from database.write_behind import WriteBehindQueue
+
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CHAT_ID = "3e0f6b1a-9c2d-4d7e-a5b8-1f4c6e9a2d03"
+GONE_CHAT_ID = "d2a4c6e8-0b1d-4f3a-8c5e-7a9b1d3f5e04"
+
+
+@pytest.fixture(autouse=True)
+def chat(postgres):
+    postgres.add_chat(CHAT_ID)
+
+
+async def test_concurrent_writes_commit_in_queue_order(postgres, db):
+    writes = WriteBehindQueue(db, durability="async", max_batch=3, max_depth=2)
+    db.write_queue = writes
+    await writes.start()
+
+    await asyncio.gather(*(writes.add_message(f"m{index:02}", CHAT_ID, "user", str(index)) for index in range(20)))
+    await writes.wait()
+    await writes.close()
+
+    assert [row["message_id"] for row in postgres.chat_messages(CHAT_ID)] == [f"m{index:02}" for index in range(20)]
+    assert writes.blocked > 0
+    assert not writes.pending(CHAT_ID)
+
+
+async def test_sync_write_to_a_missing_chat_fails_without_dropping_its_batch(postgres, db, writes):
+    results = await asyncio.gather(
+        writes.add_message("m1", CHAT_ID, "user", "kept"),
+        writes.add_message("m2", GONE_CHAT_ID, "user", "rejected"),
+        return_exceptions=True
+    )
+
+    assert results[0] is None
+    assert isinstance(results[1], RuntimeError)
+    assert [row["message_id"] for row in postgres.chat_messages(CHAT_ID)] == ["m1"]
+    assert writes.failed_rows == 1
+
+
+async def test_async_write_failure_evicts_the_optimistic_cache_entry(postgres, db):
+    writes = WriteBehindQueue(db, durability="async")
+    db.write_queue = writes
+    await writes.start()
+    db.message_cache.set(GONE_CHAT_ID, [])
+
+    await writes.add_message("m1", GONE_CHAT_ID, "user", "rejected")
+    assert db.message_cache.get(GONE_CHAT_ID) == [{"message_id": "m1", "role": "user", "content": "rejected"}]
+
+    await writes.wait()
+    await writes.close()
+
+    assert db.message_cache.get(GONE_CHAT_ID) is None
+    assert writes.failed_rows == 1
+
+
+async def test_writes_fail_once_the_flush_task_died(db):
+    writes = WriteBehindQueue(db, durability="async", max_latency=10)
+    await writes.start()
+    await writes.add_message("m1", CHAT_ID, "user", "queued")
+    writes._task.cancel()
+    await asyncio.sleep(0)
+
+    with pytest.raises(RuntimeError, match="not running"):
+        await writes.wait(CHAT_ID)
+    with pytest.raises(RuntimeError, match="not running"):
+        await writes.add_message("m2", CHAT_ID, "user", "hi")
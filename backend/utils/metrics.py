@@ -0,0 +1,117 @@
+from typing import Dict, Iterable, Sequence
+
+import bisect
+import math
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Upper bounds (seconds) for model-side phases: queueing, loading, prompt eval, first token
+LLM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Upper bounds (tokens/s) of the generation speed histogram
+TOKEN_RATE_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 50.0, 75.0, 100.0, 150.0, 250.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and three additions.
+
+    Args:
+        bounds: Sorted bucket upper bounds; an implicit +Inf bucket follows
+    """
+
+    __slots__ = ("bounds", "buckets", "count", "sum")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    """Builder of a Prometheus text-format (0.0.4) scrape.
+
+    Metrics are collected from the components' own counters at scrape time,
+    so request paths pay nothing for the exposition.
+
+    Usage:
+        out = Exposition()
+        out.metric("genai_queue_depth", "gauge", "Queued writes", [({}, queue.qsize())])
+        text = out.render()
+    """
+
+    def __init__(self, prefix: str = "genai_") -> None:
+        self.prefix = prefix
+        self._lines = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples: Iterable[tuple]) -> None:
+        """Add a counter or gauge family.
+
+        Args:
+            name: Metric name without the prefix
+            kind: 'counter' or 'gauge'
+            help_text: HELP line
+            samples: (labels dict, value) pairs
+        """
+        name = self.prefix + name
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self._lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, help_text: str, series: Iterable[tuple]) -> None:
+        """Add a histogram family.
+
+        Args:
+            name: Metric name without the prefix
+            help_text: HELP line
+            series: (labels dict, bounds, per-bucket counts, sum, count) tuples;
+                the counts are per bucket (not cumulative) with a trailing +Inf bucket
+        """
+        name = self.prefix + name
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} histogram")
+        for labels, bounds, buckets, total, count in series:
+            cumulative = 0
+            for bound, bucket in zip(tuple(bounds) + (math.inf,), buckets):
+                cumulative += bucket
+                bucket_labels = _labels({**labels, "le": _number(float(bound))})
+                self._lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {_number(float(total))}")
+            self._lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    def histograms(self, name: str, help_text: str, histograms: Iterable[tuple]) -> None:
+        """Add a histogram family from (labels dict, Histogram) pairs."""
+        self.histogram(name, help_text, (
+            (labels, histogram.bounds, histogram.buckets, histogram.sum, histogram.count)
+            for labels, histogram in histograms
+        ))
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,436 @@
+from contextvars import ContextVar
+from typing import Optional
+
+import asyncio
+import collections
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("trace", default=None)
+_current_span = ContextVar("span", default=None)
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict) -> None:
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start,
+            "duration_ms": (self.end - self.start) / 1e6 if self.end else None,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class Trace:
+    """Spans of one request; only sampled traces record spans.
+
+    Args:
+        trace_id: 32 hex characters (W3C trace-context format)
+        sampled: Record spans and export the trace
+        max_spans: Spans kept per trace; later ones are counted as dropped
+    """
+
+    __slots__ = ("trace_id", "sampled", "spans", "max_spans", "dropped", "profile", "attributes")
+
+    def __init__(self, trace_id: str = None, sampled: bool = False, max_spans: int = 512) -> None:
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.sampled = sampled
+        self.spans = []
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.profile = None
+        self.attributes = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "attributes": self.attributes,
+            "spans": [span.to_dict() for span in self.spans],
+            "dropped_spans": self.dropped,
+            "profile": self.profile
+        }
+
+
+class _SpanScope:
+    """Sync and async context manager recording a span on the active sampled trace.
+
+    The open span is kept in a context variable, so concurrent tasks of one
+    request each nest their spans under the span that spawned them.
+    """
+
+    __slots__ = ("trace", "span", "token", "name", "attributes")
+
+    def __init__(self, trace: Trace, name: str, attributes: dict) -> None:
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+        self.token = None
+
+    def __enter__(self) -> Optional[Span]:
+        trace = self.trace
+        if len(trace.spans) >= trace.max_spans:
+            trace.dropped += 1
+            return None
+        parent = _current_span.get()
+        self.span = Span(self.name, parent.span_id if parent else None, self.attributes)
+        trace.spans.append(self.span)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is None:
+            return
+        self.span.end = time.time_ns()
+        if exc is not None:
+            self.span.error = f"{type(exc).__name__}: {exc}"
+        try:
+            _current_span.reset(self.token)
+        except ValueError:
+            # Left in another context (an async generator finished by a different task)
+            _current_span.set(None)
+
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def span(name: str, **attributes):
+    """Context manager timing a block as a span of the request's trace (no-op when not sampled).
+
+    Usage:
+        with span("db.get_user", telegram_id=telegram_id):
+            ...
+    """
+    trace = _current.get()
+    if trace is None or not trace.sampled:
+        return _NOOP
+    return _SpanScope(trace, name, attributes)
+
+
+def set_attribute(key: str, value) -> None:
+    """Attach an attribute to the innermost open span of a sampled trace."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopScope()
+
+
+def traced(name: str):
+    """Decorate a coroutine function or async generator function to run inside a span."""
+
+    def decorator(function):
+        if inspect.isasyncgenfunction(function):
+            @functools.wraps(function)
+            async def generator_wrapper(*args, **kwargs):
+                trace = _current.get()
+                if trace is None or not trace.sampled:
+                    async for item in function(*args, **kwargs):
+                        yield item
+                    return
+                with _SpanScope(trace, name, {}):
+                    async for item in function(*args, **kwargs):
+                        yield item
+            return generator_wrapper
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None or not trace.sampled:
+                return await function(*args, **kwargs)
+            with _SpanScope(trace, name, {}):
+                return await function(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def trace_methods(prefix: str):
+    """Class decorator wrapping every public coroutine method in a `prefix.method` span."""
+
+    def decorator(cls):
+        for attr, function in list(vars(cls).items()):
+            if not attr.startswith("_") and inspect.iscoroutinefunction(function):
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(function))
+        return cls
+
+    return decorator
+
+
+class SamplingProfiler:
+    """Statistical CPU profiler of the event loop thread.
+
+    A daemon thread reads the loop thread's stack every `interval` seconds
+    and counts collapsed stacks ("module:function;module:function" ->
+    samples). The loop is shared, so samples of concurrent requests are
+    included; use it on a quiet instance or look at the hottest frames.
+
+    Args:
+        interval: Seconds between samples
+        max_depth: Innermost frames kept per stack
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 40) -> None:
+        self.interval = interval
+        self.max_depth = max_depth
+        self.thread_id = threading.get_ident()
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self, top: int = 50) -> dict:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return {
+            "interval": self.interval,
+            "samples": sum(self.samples.values()),
+            "stacks": [{"stack": stack, "samples": count} for stack, count in self.samples.most_common(top)]
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class JsonlExporter:
+    """Append finished traces to a JSON Lines file, one trace per line.
+
+    Each batch is appended with a single write, so workers sharing the file
+    do not interleave their lines.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def write(self, traces: list) -> None:
+        data = "".join(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n" for trace in traces)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+class OtlpExporter:
+    """Send finished traces to an OTLP/HTTP collector (JSON encoding, POST /v1/traces)."""
+
+    def __init__(self, endpoint: str, service_name: str = "genai-api", timeout: float = 5.0) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    @staticmethod
+    def _attributes(attributes: dict) -> list:
+        result = []
+        for key, value in attributes.items():
+            if isinstance(value, bool):
+                result.append({"key": key, "value": {"boolValue": value}})
+            elif isinstance(value, int):
+                result.append({"key": key, "value": {"intValue": str(value)}})
+            elif isinstance(value, float):
+                result.append({"key": key, "value": {"doubleValue": value}})
+            else:
+                result.append({"key": key, "value": {"stringValue": str(value)}})
+        return result
+
+    def payload(self, traces: list) -> dict:
+        spans = []
+        for trace in traces:
+            for item in trace.spans:
+                spans.append({
+                    "traceId": trace.trace_id,
+                    "spanId": item.span_id,
+                    "parentSpanId": item.parent_id or "",
+                    "name": item.name,
+                    "kind": 2 if item.parent_id is None else 1,
+                    "startTimeUnixNano": str(item.start),
+                    "endTimeUnixNano": str(item.end or item.start),
+                    "attributes": self._attributes(
+                        {**trace.attributes, **item.attributes} if item.parent_id is None else item.attributes
+                    ),
+                    "status": {"code": 2, "message": item.error} if item.error else {"code": 1}
+                })
+        return {"resourceSpans": [{
+            "resource": {"attributes": self._attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "genai.tracing"}, "spans": spans}]
+        }]}
+
+    def write(self, traces: list) -> None:
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(self.payload(traces), default=str).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """Head-sampled request tracing with buffered export.
+
+    Every request gets a trace ID; `sample_rate` of them (plus those that
+    arrive with a sampled W3C `traceparent` or ask for a profile) record
+    spans. Finished traces are buffered and written by a background task
+    every `flush_interval` seconds in a worker thread, so exporting never
+    blocks the event loop.
+
+    Args:
+        sample_rate: Share of requests whose spans are recorded (0..1)
+        exporter: 'jsonl', 'otlp' or 'none'
+        path: JSONL file for the 'jsonl' exporter
+        otlp_endpoint: Collector URL for the 'otlp' exporter
+        service_name: service.name resource attribute (OTLP)
+        profiling: Allow per-request CPU profiles (X-Profile: 1)
+        profile_interval: Seconds between profiler samples
+        max_spans: Spans kept per trace
+        flush_interval: Seconds between exports
+        max_buffer: Finished traces kept while the exporter is behind
+    """
+
+    def __init__(self, sample_rate: float = 0.01, exporter: str = "jsonl", path: str = "traces.jsonl",
+                 otlp_endpoint: str = "http://localhost:4318/v1/traces", service_name: str = "genai-api",
+                 profiling: bool = False, profile_interval: float = 0.005, max_spans: int = 512,
+                 flush_interval: float = 2.0, max_buffer: int = 10000) -> None:
+        if exporter not in ("jsonl", "otlp", "none"):
+            raise ValueError(f"Unknown trace exporter: {exporter}")
+
+        self.sample_rate = sample_rate
+        self.exporter = {
+            "jsonl": lambda: JsonlExporter(path),
+            "otlp": lambda: OtlpExporter(otlp_endpoint, service_name),
+            "none": lambda: None
+        }[exporter]()
+        self.profiling = profiling
+        self.profile_interval = profile_interval
+        self.max_spans = max_spans
+        self.flush_interval = flush_interval
+        self._buffer = collections.deque(maxlen=max_buffer)
+        self._task = None
+        self.exported = 0
+        self.failed = 0
+
+    def start_trace(self, traceparent: str = None, force: bool = False) -> Trace:
+        """Create the trace of a request, continuing a W3C `traceparent` when given."""
+        trace_id, sampled = None, force or random.random() < self.sample_rate
+        if traceparent:
+            parts = traceparent.split("-")
+            if len(parts) == 4 and len(parts[1]) == 32:
+                trace_id = parts[1]
+                sampled = sampled or parts[3][-1:] in ("1", "3", "5", "7", "9", "b", "d", "f")
+        return Trace(trace_id, sampled, self.max_spans)
+
+    def activate(self, trace: Trace):
+        """Make `trace` the trace of the running request; returns a token for deactivate()."""
+        return _current.set(trace), _current_span.set(None)
+
+    def deactivate(self, tokens) -> None:
+        _current.reset(tokens[0])
+        _current_span.reset(tokens[1])
+
+    def finish(self, trace: Trace) -> None:
+        if trace.sampled and self.exporter is not None:
+            self._buffer.append(trace)
+
+    async def start(self) -> None:
+        if self.exporter is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer or self.exporter is None:
+            return
+
+        traces = list(self._buffer)
+        self._buffer.clear()
+        try:
+            await asyncio.to_thread(self.exporter.write, traces)
+            self.exported += len(traces)
+        except Exception as e:
+            self.failed += len(traces)
+            logger.warning("Could not export %d traces: %s", len(traces), e)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "buffered": len(self._buffer),
+            "exported": self.exported,
+            "failed": self.failed
+        }
@@ -1,10 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import base64
 import hashlib
 import asyncio
 import lzma
 import json
+import multiprocessing
+import os
+import threading
+import zlib
+
+from utils.tracing import set_attribute, traced
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every compressed blob starts with one byte naming the codec that wrote it.
+CODEC_LZMA = 1
+CODEC_ZLIB = 2
+CODEC_ZSTD = 3
+CODEC_ZSTD_DICT = 4
+
+CODECS = {"lzma": CODEC_LZMA, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+DEFAULT_LEVELS = {"lzma": 9, "zlib": 6, "zstd": 3}
+
+# Blobs written before the codec byte existed are raw .xz streams.
+XZ_MAGIC = b"\xfd7zXZ"
 
 class Utils:
     """ Utils class """
+    def __init__(self, codec: str = "lzma", level: int = None, zstd_dict: bytes = None,
+                 zstd_dict_path: str = None, workers: int = None, min_parallel_batch: int = 512) -> None:
+        """
+        Args:
+            codec (str): Codec for new blobs: 'lzma', 'zlib' or 'zstd'.
+            level (int): Codec level/preset (codec default if None).
+            zstd_dict (bytes): Trained zstd dictionary (see train_zstd_dictionary).
+            zstd_dict_path (str): File to load the zstd dictionary from.
+            workers (int): Processes used for batch (de)compression (CPU count if None).
+            min_parallel_batch (int): Smaller batches are handled in a thread instead.
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("Codec 'zstd' requires the 'zstandard' package")
+
+        if zstd_dict_path:
+            with open(zstd_dict_path, "rb") as file:
+                zstd_dict = file.read()
+
+        self.codec = codec
+        self.level = level if level is not None else DEFAULT_LEVELS[codec]
+        self.zstd_dict = zstd_dict
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_batch = min_parallel_batch
+        self._local = threading.local()
+        self._executor = None
+
     def hash_value(self, value: str) -> str:
         """Hash a value using SHA-256.
         
@@ -17,18 +73,180 @@ class Utils:
         return hashlib.sha256(value.encode()).hexdigest()
 
 
+    def encode_cursor(self, created_at: datetime, key: str) -> str:
+        """Encode a keyset pagination position as an opaque cursor.
+        
+        Args:
+            created_at (datetime): Timestamp of the last row on the page.
+            key (str): Primary key of the last row on the page.
+        
+        Returns:
+            str: URL-safe cursor string.
+        """
+        raw = json.dumps([created_at.isoformat(), str(key)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        """Decode a cursor produced by encode_cursor.
+        
+        Args:
+            cursor (str): Cursor string.
+        
+        Returns:
+            tuple: (created_at, key) of the last row of the previous page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, key = json.loads(base64.urlsafe_b64decode(padded))
+            return datetime.fromisoformat(created_at), key
+
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+
+
+    def _zstd(self) -> tuple:
+        """Get this thread's zstd compressor and decompressor (they are not thread-safe)."""
+        codecs = getattr(self._local, "zstd", None)
+        if codecs is None:
+            if self.zstd_dict is not None:
+                dictionary = zstandard.ZstdCompressionDict(self.zstd_dict)
+                codecs = (
+                    zstandard.ZstdCompressor(level=self.level, dict_data=dictionary),
+                    zstandard.ZstdDecompressor(dict_data=dictionary)
+                )
+            else:
+                codecs = (zstandard.ZstdCompressor(level=self.level), zstandard.ZstdDecompressor())
+            self._local.zstd = codecs
+
+        return codecs
+
+    def _encode(self, raw: bytes) -> bytes:
+        """Compress bytes with the configured codec and prefix the codec byte."""
+        if self.codec == "lzma":
+            return bytes([CODEC_LZMA]) + lzma.compress(raw, preset=self.level)
+
+        if self.codec == "zlib":
+            return bytes([CODEC_ZLIB]) + zlib.compress(raw, self.level)
+
+        codec_id = CODEC_ZSTD_DICT if self.zstd_dict is not None else CODEC_ZSTD
+        return bytes([codec_id]) + self._zstd()[0].compress(raw)
+
+    def _decode(self, blob: bytes) -> bytes:
+        """Decompress a blob written by any codec (or a legacy raw LZMA blob)."""
+        blob = bytes(blob)
+        if blob.startswith(XZ_MAGIC):
+            return lzma.decompress(blob)
+
+        codec_id, payload = blob[0], blob[1:]
+        if codec_id == CODEC_LZMA:
+            return lzma.decompress(payload)
+
+        if codec_id == CODEC_ZLIB:
+            return zlib.decompress(payload)
+
+        if codec_id in (CODEC_ZSTD, CODEC_ZSTD_DICT):
+            if zstandard is None:
+                raise ValueError("Blob is zstd-compressed but 'zstandard' is not installed")
+
+            if codec_id == CODEC_ZSTD_DICT and self.zstd_dict is None:
+                raise ValueError("Blob needs the zstd dictionary it was compressed with")
+
+            return self._zstd()[1].decompress(payload)
+
+        raise ValueError(f"Unknown codec id: {codec_id}")
+
     def _compress_data(self, data: dict) -> bytes:
-        """Compress dictionary using LZMA."""
-        return lzma.compress(json.dumps(data).encode('utf-8'), preset=9)
+        """Compress a JSON-serializable value with the configured codec."""
+        return self._encode(json.dumps(data).encode('utf-8'))
 
     def _decompress_data(self, blob: bytes) -> dict:
-        """Decompress LZMA-compressed bytes to dictionary."""
-        return json.loads(lzma.decompress(blob).decode('utf-8'))
+        """Decompress a blob back to the JSON value."""
+        return json.loads(self._decode(blob).decode('utf-8'))
+
+    def train_zstd_dictionary(self, samples: list, size: int = 112640) -> bytes:
+        """Train a zstd dictionary on sample values (e.g. chat messages).
+        
+        Args:
+            samples (list): JSON-serializable values, encoded as _compress_data does.
+            size (int): Dictionary size in bytes.
+        
+        Returns:
+            bytes: Dictionary to pass as zstd_dict / save to zstd_dict_path.
+        """
+        if zstandard is None:
+            raise ValueError("Training a dictionary requires the 'zstandard' package")
+
+        encoded = [json.dumps(sample).encode('utf-8') for sample in samples]
+        return zstandard.train_dictionary(size, encoded).as_bytes()
 
+    @traced("utils.async_compress")
     async def async_compress(self, data: dict) -> bytes:
         """Asynchronously compress a dictionary."""
         return await asyncio.to_thread(self._compress_data, data)
 
+    @traced("utils.async_decompress")
     async def async_decompress(self, blob: bytes) -> dict:
-        """Asynchronously decompress LZMA-compressed bytes."""
+        """Asynchronously decompress a blob."""
         return await asyncio.to_thread(self._decompress_data, blob)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.codec, self.level, self.zstd_dict)
+            )
+
+        return self._executor
+
+    async def _run_batch(self, compress: bool, items: list) -> list:
+        """Run a batch job in chunks on the process pool (small batches in a thread)."""
+        set_attribute("items", len(items))
+        if len(items) < self.min_parallel_batch or self.workers < 2:
+            method = self._compress_data if compress else self._decompress_data
+            return await asyncio.to_thread(lambda: [method(item) for item in items])
+
+        func = _compress_chunk if compress else _decompress_chunk
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        chunk_size = -(-len(items) // self.workers)
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(executor, func, items[start:start + chunk_size])
+            for start in range(0, len(items), chunk_size)
+        ])
+
+        return [result for chunk in chunks for result in chunk]
+
+    @traced("utils.async_compress_batch")
+    async def async_compress_batch(self, items: list) -> list:
+        """Asynchronously compress a batch of values on all cores."""
+        return await self._run_batch(True, items)
+
+    @traced("utils.async_decompress_batch")
+    async def async_decompress_batch(self, blobs: list) -> list:
+        """Asynchronously decompress a batch of blobs on all cores."""
+        return await self._run_batch(False, [bytes(blob) for blob in blobs])
+
+    def shutdown(self) -> None:
+        """Stop the batch worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+# Batch workers run in separate processes with their own Utils instance.
+_worker_utils = None
+
+def _init_worker(codec: str, level: int, zstd_dict: bytes) -> None:
+    global _worker_utils
+    _worker_utils = Utils(codec=codec, level=level, zstd_dict=zstd_dict, workers=1)
+
+def _compress_chunk(items: list) -> list:
+    return [_worker_utils._compress_data(item) for item in items]
+
+def _decompress_chunk(blobs: list) -> list:
+    return [_worker_utils._decompress_data(blob) for blob in blobs]
@@ -46,20 +46,17 @@ export async function POST(req: NextRequest) {
       chatId = chats[0].chat_id;
     }
 
-    await fetch(`${API}/messages/add`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ chat_id: chatId, role: 'user', content }),
-    });
-
-    const msgHistoryRes = await fetch(`${API}/messages/get_all_messages?chat_id=${chatId}`);
-    if (!msgHistoryRes.ok) throw new Error('Не удалось получить историю сообщений');
-    const messages = await msgHistoryRes.json();
-
+    // /neuro/chat reads the history itself and stores both the user message
+    // and the answer, so only the new message is sent and nothing is added here
     const aiRes = await fetch(`${API}/neuro/chat`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ chat_id: chatId, messages, model }),
+      body: JSON.stringify({
+        chat_id: chatId,
+        messages: [{ role: 'user', context: content }],
+        model,
+        user_id: userId,
+      }),
     });
 
     if (!aiRes.ok) {
@@ -69,17 +66,7 @@ export async function POST(req: NextRequest) {
     }
     const aiData = await aiRes.json();
 
-    await fetch(`${API}/messages/add`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({
-        chat_id: chatId,
-        role: 'assistant',
-        content: aiData.reply,
-      }),
-    });
-
-    return NextResponse.json(aiData);
+    return NextResponse.json({ reply: aiData.data });
   } catch (err: any) {
     console.error(err);
     return NextResponse.json({ error: err.message }, { status: 500 });